@@ -0,0 +1,128 @@
+"""
+Microbenchmark: parsing the movetext of Chess.com monthly archives.
+
+Usage:
+    python benchmarks/bench_pgn_movetext.py [archive.json ...]
+
+Archives are the JSON documents served by
+https://api.chess.com/pub/player/<username>/games/<yyyy>/<mm>; save a few for a titled
+player (thousands of games per month) to benchmark on real data. Without arguments a
+synthetic 5k-game archive in the same format is generated.
+"""
+
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from platforms.pgn_movetext import parse_movetexts, parse_time_control, time_deltas  # noqa: E402
+
+REPEATS = 5
+
+
+def legacy_parse(pgn: str) -> tuple[list, list]:
+    """The per-game parser ChessComWrapper used before pgn_movetext, kept for comparison."""
+    moves_section = pgn.split("\n\n", 1)[1].replace("\n", " ")
+    move_pattern = re.compile(
+        r'(?P<number>\d+)\.(?P<dots>\.\.)?\s*(?P<move>\S+)(?:\s*\{\[%clk (?P<clk>[^\]]+)\]\})?'
+    )
+
+    def parse_clock(clk):
+        if not clk:
+            return None
+        parts = clk.split(":")
+        if len(parts) == 3:
+            h, m, s = int(parts[0]), int(parts[1]), float(parts[2])
+        elif len(parts) == 2:
+            h, m, s = 0, int(parts[0]), float(parts[1])
+        else:
+            return None
+        return h * 3600 + m * 60 + s
+
+    moves, time_spent = [], []
+    prev_white_clock = prev_black_clock = None
+    for match in move_pattern.finditer(moves_section):
+        is_black = match.group("dots") == ".."
+        clock = parse_clock(match.group("clk"))
+        moves.append(match.group("move"))
+        previous = prev_black_clock if is_black else prev_white_clock
+        time_spent.append(previous - clock if clock is not None and previous is not None else None)
+        if clock is not None:
+            if is_black:
+                prev_black_clock = clock
+            else:
+                prev_white_clock = clock
+    return moves, time_spent
+
+
+def current_parse(games: list[dict]) -> list[tuple]:
+    """What ChessComWrapper does per month: one batch for the archive, then per-game clocks."""
+    parsed = parse_movetexts([game["pgn"].partition("\n\n")[2] for game in games])
+    results = []
+    for index, game in enumerate(games):
+        movetext = parsed.game(index)
+        initial, increment = parse_time_control(game.get("time_control", ""))
+        results.append((movetext.moves, time_deltas(movetext.clocks, initial, increment)))
+    return results
+
+
+def synthetic_archive(games: int = 5000, seed: int = 1) -> dict:
+    import chess
+
+    rng = random.Random(seed)
+    archive = []
+    for _ in range(games):
+        board = chess.Board()
+        clocks = [180.0, 180.0]
+        parts = []
+        for ply in range(rng.randint(40, 140)):
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            san = board.san(move)
+            board.push(move)
+            clocks[ply % 2] = max(0.1, clocks[ply % 2] - rng.uniform(0.1, 5) + 1)
+            minutes, seconds = divmod(clocks[ply % 2], 60)
+            number = f"{ply // 2 + 1}." if ply % 2 == 0 else f"{ply // 2 + 1}..."
+            parts.append(f"{number} {san} {{[%clk 0:{int(minutes):02d}:{seconds:04.1f}]}}")
+        pgn = '[Event "Live Chess"]\n[Site "Chess.com"]\n[TimeControl "180+1"]\n\n' + " ".join(parts) + " 1-0\n"
+        archive.append({"pgn": pgn, "time_control": "180+1"})
+    return {"games": archive}
+
+
+def best_of(fn, games) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn(games)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(paths: list[str]) -> None:
+    if paths:
+        archives = {path: json.loads(Path(path).read_text()) for path in paths}
+    else:
+        print("[BENCH] No archives given, generating a synthetic 5k-game archive...")
+        archives = {"synthetic": synthetic_archive()}
+
+    for name, archive in archives.items():
+        games = [game for game in archive.get("games", []) if game.get("pgn")]
+        plies = sum(len(moves) for moves, _ in current_parse(games))
+        legacy = best_of(lambda batch: [legacy_parse(game["pgn"]) for game in batch], games)
+        current = best_of(current_parse, games)
+        print(
+            f"[BENCH] {name}: {len(games)} games, {plies} plies | "
+            f"legacy {legacy * 1000:.1f} ms | pgn_movetext {current * 1000:.1f} ms "
+            f"({plies / current / 1e6:.2f}M plies/s, {legacy / current:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
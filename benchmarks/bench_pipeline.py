@@ -0,0 +1,413 @@
+"""
+End-to-end benchmark: every stage of the analysis pipeline on recorded fixtures, offline.
+
+Usage:
+    python benchmarks/bench_pipeline.py run [--sizes 100 10k 1m] [--stages lichess_parse ...]
+                                            [--engine-plies 2000] [--engine CMD] [--repeat 3]
+                                            [--output results.json] [--no-tracemalloc]
+    python benchmarks/bench_pipeline.py compare base.json new.json [--threshold 0.1]
+
+Fixtures come from benchmarks/fixtures.py: the 100 and 10k ply sizes run by default,
+1m is opt-in. Engine-bound stages talk to benchmarks/fake_uci.py unless --engine names a
+real engine, and only take the first --engine-plies plies of a fixture.
+
+Every (stage, size) runs in a fresh process and reports wall time, plies per second, peak
+RSS and, from a separate tracemalloc pass, peak Python allocations. Results are written as
+JSON to benchmarks/results/; `compare` prints the change between two runs and exits with
+status 1 when a stage got slower by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+import fixtures  # noqa: E402
+
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+FAKE_ENGINE = [sys.executable, str(PROJECT_ROOT / "benchmarks" / "fake_uci.py")]
+DEFAULT_SIZES = ["100", "10k"]
+ENGINE_DEPTH = 10
+
+
+class Stage(NamedTuple):
+    # prepare(label, options) -> (state, plies) is not timed; run(state) is
+    prepare: Callable[[str, dict], tuple[Any, int]]
+    run: Callable[[Any], Any]
+    engine: bool = False
+
+
+def _lichess_games(label: str) -> list:
+    from platforms.lichess import LichessWrapper
+
+    wrapper = LichessWrapper({"name": "lichess", "url": "https://lichess.org/api", "token": None})
+    return list(wrapper._iter_parsed_games(fixtures.load_lichess(label), fixtures.USERNAME))
+
+
+def _plies(games: list) -> int:
+    return sum(len(game.move_codes) for game in games)
+
+
+def _capped(games: list, max_plies: int) -> list:
+    """The leading games of a fixture that fit in `max_plies` (at least one)."""
+    kept, plies = [], 0
+    for game in games:
+        if kept and plies + len(game.move_codes) > max_plies:
+            break
+        kept.append(game)
+        plies += len(game.move_codes)
+    return kept
+
+
+def _engine_command(options: dict) -> Any:
+    return options.get("engine") or FAKE_ENGINE
+
+
+# --- fetch: platform payloads to Games
+
+def _prepare_lichess_parse(label: str, options: dict) -> tuple[Any, int]:
+    from platforms.lichess import LichessWrapper
+
+    lines = fixtures.load_lichess(label)
+    wrapper = LichessWrapper({"name": "lichess", "url": "https://lichess.org/api", "token": None})
+    return (wrapper, lines), _plies(_lichess_games(label))
+
+
+def _run_lichess_parse(state: Any) -> Any:
+    wrapper, lines = state
+    return wrapper._parse_games(lines, fixtures.USERNAME)
+
+
+def _prepare_chesscom_parse(label: str, options: dict) -> tuple[Any, int]:
+    from platforms.chesscom import ChessComWrapper
+
+    archive = fixtures.load_chesscom(label)
+    wrapper = ChessComWrapper({"name": "chesscom", "url": "https://api.chess.com/pub"})
+    plies = _plies(list(wrapper._iter_parsed_games(archive, fixtures.USERNAME)))
+    return (wrapper, archive), plies
+
+
+def _run_chesscom_parse(state: Any) -> Any:
+    wrapper, archive = state
+    return list(wrapper._iter_parsed_games(archive, fixtures.USERNAME))
+
+
+def _prepare_offline_import(label: str, options: dict) -> tuple[Any, int]:
+    from platforms.offline_importer import ImportFilter, OfflineImporter
+
+    path, _ = fixtures.ensure(label)
+    importer = OfflineImporter(str(path), processes=options.get("processes") or 1)
+    return (importer, ImportFilter(usernames=[fixtures.USERNAME])), _plies(_lichess_games(label))
+
+
+def _run_offline_import(state: Any) -> Any:
+    importer, game_filter = state
+    return importer.import_table(game_filter)
+
+
+# --- the analysis pipeline's stages, per game as DispatcherApp runs them
+
+def _prepare_games(label: str, options: dict) -> tuple[Any, int]:
+    games = _lichess_games(label)
+    return games, _plies(games)
+
+
+def _prepare_analyses(label: str, options: dict) -> tuple[Any, int]:
+    from ml.game_analysis import GameAnalysis
+
+    games = _lichess_games(label)
+    return [GameAnalysis(game, index).replay() for index, game in enumerate(games)], _plies(games)
+
+
+def _run_replay(games: list) -> Any:
+    from ml.game_analysis import GameAnalysis
+
+    return [GameAnalysis(game, index).replay() for index, game in enumerate(games)]
+
+
+def _run_move_table(games: list) -> Any:
+    from common.move_table import MoveTable
+
+    return MoveTable(games).to_dataframe()
+
+
+def _run_detect(analyses: list) -> Any:
+    from ml.helper_functions.evaluation_drop_detector import EvaluationDropDetector
+
+    detector = EvaluationDropDetector()
+    for analysis in analyses:
+        evaluations = analysis.evaluations_cp()
+        analysis.drops = detector.find_drops_batch(evaluations, [0, len(evaluations)])
+    return analyses
+
+
+def _run_cluster(analyses: list) -> Any:
+    import pandas as pd
+
+    from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+
+    frame = pd.concat([analysis.feature_frame() for analysis in analyses], ignore_index=True)
+    return ClusterAnalyser(n_clusters=5).fit(frame)
+
+
+def _prepare_evaluate(label: str, options: dict) -> tuple[Any, int]:
+    from engines.stockfish import StockfishWrapper
+
+    games = _capped(_lichess_games(label), options["engine_plies"])
+    engine = StockfishWrapper(_engine_command(options), depth=ENGINE_DEPTH, pool_size=1)
+    return (engine, games), _plies(games)
+
+
+def _run_evaluate(state: Any) -> Any:
+    engine, games = state
+    try:
+        return [engine.evaluate_moves(game.moves) for game in games]
+    finally:
+        engine.close()
+
+
+def _prepare_classify(label: str, options: dict) -> tuple[Any, int]:
+    from ml.game_analysis import GameAnalysis
+    from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+
+    games = _capped(_lichess_games(label), options["engine_plies"])
+    analyses = [GameAnalysis(game, index).replay() for index, game in enumerate(games)]
+    return (MistakeIdentifier(_engine_command(options), depth=ENGINE_DEPTH), analyses), _plies(games)
+
+
+def _run_classify(state: Any) -> Any:
+    identifier, analyses = state
+    try:
+        return [identifier.analyze_game(analysis.moves_uci, analysis.game.time_spent) for analysis in analyses]
+    finally:
+        identifier.close()
+
+
+# --- everything at once: DispatcherApp over an offline dump of the fixture
+
+def _prepare_end_to_end(label: str, options: dict) -> tuple[Any, int]:
+    from engines.stockfish import StockfishWrapper
+    from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+    from ml.dispatcher_app import DispatcherApp
+    from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+    from platforms.offline import OfflineWrapper
+
+    path, _ = fixtures.ensure(label)
+    # The offline platform hands out the newest games first
+    newest_first = sorted(_lichess_games(label), key=lambda game: game.start_dt_utc, reverse=True)
+    games = _capped(newest_first, options["engine_plies"])
+    engine = _engine_command(options)
+    platform_wrapper = OfflineWrapper({"name": "Bench", "path": str(path), "processes": 1, "index": False})
+    app = DispatcherApp(
+        [platform_wrapper],
+        StockfishWrapper(engine, depth=ENGINE_DEPTH, pool_size=2),
+        mistake_identifiers=[MistakeIdentifier(engine, depth=ENGINE_DEPTH) for _ in range(2)],
+        cluster_analyser=ClusterAnalyser(n_clusters=5, incremental=True),
+        tiered_config={"enabled": True, "shallow_depth": 8},
+    )
+    return (app, len(games)), _plies(games)
+
+
+def _run_end_to_end(state: Any) -> Any:
+    app, number_of_games = state
+    try:
+        return app.analyse(fixtures.USERNAME, "Bench", number_of_games=number_of_games)
+    finally:
+        app.close()
+
+
+STAGES = {
+    "lichess_parse": Stage(_prepare_lichess_parse, _run_lichess_parse),
+    "chesscom_parse": Stage(_prepare_chesscom_parse, _run_chesscom_parse),
+    "offline_import": Stage(_prepare_offline_import, _run_offline_import),
+    "replay": Stage(_prepare_games, _run_replay),
+    "move_table": Stage(_prepare_games, _run_move_table),
+    "detect": Stage(_prepare_analyses, _run_detect),
+    "cluster": Stage(_prepare_analyses, _run_cluster),
+    "evaluate": Stage(_prepare_evaluate, _run_evaluate, engine=True),
+    "classify": Stage(_prepare_classify, _run_classify, engine=True),
+    "end_to_end": Stage(_prepare_end_to_end, _run_end_to_end, engine=True),
+}
+
+
+class RssSampler:
+    """Peak resident set size while running, sampled from /proc; ru_maxrss elsewhere."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.peak = self.current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def _measure(stage_name: str, label: str, options: dict) -> dict[str, Any]:
+    """Runs in a fresh process, so one stage's caches and heap don't flatter the next."""
+    stage = STAGES[stage_name]
+    best_seconds, peak_rss, rss_before, plies = float("inf"), 0, 0, 0
+    for _ in range(options["repeat"]):
+        state, plies = stage.prepare(label, options)
+        rss_before = RssSampler.current()
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            stage.run(state)
+            best_seconds = min(best_seconds, time.perf_counter() - start)
+        peak_rss = max(peak_rss, sampler.peak)
+        del state
+
+    alloc_peak = None
+    if options["tracemalloc"]:
+        state, _ = stage.prepare(label, options)
+        tracemalloc.start()
+        stage.run(state)
+        alloc_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    megabyte = 1024 * 1024
+    return {
+        "stage": stage_name,
+        "size": label,
+        "plies": plies,
+        "engine_bound": stage.engine,
+        "seconds": round(best_seconds, 6),
+        "plies_per_second": round(plies / best_seconds, 1) if best_seconds > 0 else None,
+        "rss_before_mb": round(rss_before / megabyte, 1),
+        "peak_rss_mb": round(peak_rss / megabyte, 1),
+        "alloc_peak_mb": None if alloc_peak is None else round(alloc_peak / megabyte, 1),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> None:
+    options = {
+        "engine_plies": args.engine_plies,
+        "engine": args.engine.split() if args.engine else None,
+        "repeat": args.repeat,
+        "tracemalloc": not args.no_tracemalloc,
+        "processes": args.processes,
+    }
+    # Generate missing fixtures once, here, rather than in every child
+    for label in args.sizes:
+        fixtures.ensure(label)
+
+    results = []
+    context = get_context("spawn")
+    for label in args.sizes:
+        for stage_name in args.stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(_measure, stage_name, label, options).result()
+            results.append(result)
+            alloc = "-" if result["alloc_peak_mb"] is None else f"{result['alloc_peak_mb']:.1f}"
+            print(
+                f"[BENCH] {stage_name:<15} {label:>4}: {result['plies']:>8} plies in {result['seconds']:8.3f}s"
+                f" ({result['plies_per_second']:>10.0f} plies/s), peak RSS {result['peak_rss_mb']:7.1f} MB"
+                f" (+{result['peak_rss_mb'] - result['rss_before_mb']:.1f}), allocations {alloc} MB"
+            )
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "metadata": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": {**options, "sizes": args.sizes, "stages": args.stages},
+        },
+        "results": results,
+    }, indent=2))
+    print(f"[BENCH] Results written to {output}")
+
+
+def compare(args: argparse.Namespace) -> int:
+    base, new = (json.loads(Path(path).read_text()) for path in (args.base, args.new))
+    print(f"[BENCH] {base['metadata']['commit']} -> {new['metadata']['commit']}")
+    base_results = {(result["stage"], result["size"]): result for result in base["results"]}
+    regressions = 0
+    for result in new["results"]:
+        before = base_results.get((result["stage"], result["size"]))
+        if before is None or not before["seconds"]:
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        rss_change = result["peak_rss_mb"] - before["peak_rss_mb"]
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(
+            f"[BENCH] {result['stage']:<15} {result['size']:>4}: {before['seconds']:8.3f}s -> {result['seconds']:8.3f}s"
+            f" ({change:+7.1%}), peak RSS {rss_change:+7.1f} MB{flag}"
+        )
+    return 1 if regressions else 0
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    run_parser.add_argument("--engine-plies", type=int, default=2000)
+    run_parser.add_argument("--engine", help="UCI engine command; the fake engine by default")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--processes", type=int, help="importer processes for offline_import (default 1)")
+    run_parser.add_argument("--output")
+    run_parser.add_argument("--no-tracemalloc", action="store_true")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,89 @@
+"""
+Startup benchmark: how long a fresh interpreter takes to import the web app, which is what a
+new gunicorn worker (without preloading) or a scaled-up instance pays before its first request.
+
+Usage:
+    python benchmarks/bench_startup.py [--module app] [--repeat 7] [--budget-ms 300] [--importtime 15]
+
+Each run imports the module in a new process and times the import alone, not interpreter
+start. The median is checked against --budget-ms and the script exits with status 1 when
+it is over. --importtime prints the modules with the largest cumulative import time,
+from python -X importtime, to show what to make lazy next.
+
+This is a manual benchmark and is not run by the test suite: most of the time is Flask's
+own import, which varies with the machine, so a fixed budget would fail at random on CI.
+tests/test_startup.py only checks which modules the import leaves unloaded.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIR = PROJECT_ROOT / "src"
+
+_TIMED_IMPORT = (
+    "import importlib, time\n"
+    "began = time.perf_counter()\n"
+    "importlib.import_module({module!r})\n"
+    "print(time.perf_counter() - began)\n"
+)
+
+
+def _environment() -> dict[str, str]:
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(SOURCE_DIR), os.environ.get("PYTHONPATH")]))}
+
+
+def time_import(module: str) -> float:
+    """Milliseconds to import `module` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMED_IMPORT.format(module=module)],
+        cwd=PROJECT_ROOT, env=_environment(), capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def slowest_imports(module: str, top_n: int) -> list[tuple[float, str]]:
+    """(cumulative milliseconds, module) of the slowest imports under `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=_environment(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]) / 1000, parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top_n]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=300)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N")
+    args = parser.parse_args(argv)
+
+    times = [time_import(args.module) for _ in range(args.repeat)]
+    median = statistics.median(times)
+    print(f"[BENCH] import {args.module}: median {median:.1f} ms, min {min(times):.1f} ms, max {max(times):.1f} ms ({args.repeat} runs)")
+
+    if args.importtime:
+        print("[BENCH] Slowest imports (cumulative):")
+        for milliseconds, name in slowest_imports(args.module, args.importtime):
+            print(f"[BENCH] {milliseconds:9.1f} ms  {name}")
+
+    if median > args.budget_ms:
+        print(f"[BENCH] Over budget: {median:.1f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    print(f"[BENCH] Within budget of {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
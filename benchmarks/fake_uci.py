@@ -0,0 +1,56 @@
+"""
+A stand-in UCI engine for benchmarks: answers every search at once with a score derived
+from the position, so engine-bound stages measure our side of the protocol, not Stockfish.
+
+Usage (as an engine command):
+    python benchmarks/fake_uci.py
+"""
+
+import sys
+import zlib
+
+import chess
+
+
+def score(board: chess.Board) -> int:
+    """A deterministic pseudo-evaluation between -150 and +150 centipawns."""
+    return zlib.crc32(board.board_fen().encode()) % 301 - 150
+
+
+def main() -> None:
+    board = chess.Board()
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            continue
+        command = parts[0]
+        if command == "uci":
+            print("id name FakeUCI")
+            print("option name Threads type spin default 1 min 1 max 512")
+            print("option name Hash type spin default 16 min 1 max 33554432")
+            print("option name MultiPV type spin default 1 min 1 max 500")
+            print("uciok")
+        elif command == "isready":
+            print("readyok")
+        elif command == "position":
+            moves_at = parts.index("moves") if "moves" in parts else len(parts)
+            board = chess.Board() if parts[1] == "startpos" else chess.Board(" ".join(parts[2:moves_at]))
+            for move in parts[moves_at + 1:]:
+                board.push_uci(move)
+        elif command == "go":
+            depth = int(parts[parts.index("depth") + 1]) if "depth" in parts else 10
+            legal = list(board.legal_moves)
+            if not legal:
+                print(f"info depth 0 score {'mate 0' if board.is_checkmate() else 'cp 0'}")
+                print("bestmove (none)")
+            else:
+                best = min(legal, key=lambda move: move.uci())
+                print(f"info depth {depth} seldepth {depth} multipv 1 score cp {score(board)} nodes 1000 nps 1000000 pv {best.uci()}")
+                print(f"bestmove {best.uci()}")
+        elif command == "quit":
+            break
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
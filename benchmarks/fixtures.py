@@ -0,0 +1,232 @@
+"""
+Benchmark fixtures: Lichess NDJSON exports and Chess.com monthly archives on disk.
+
+Fixtures are written once to benchmarks/fixtures/ and read back on every run, so the
+benchmarks never touch the network. The standard sizes are generated deterministically:
+random legal games with clocks and evaluations in the exact formats the platform APIs
+serve. Real data can be recorded instead, under its own label:
+
+    python benchmarks/fixtures.py generate [100 10k 1m]
+    python benchmarks/fixtures.py record <label> --lichess <user> [--max-games 500]
+    python benchmarks/fixtures.py record <label> --chesscom <user> --month 2024-05
+
+Recorded games have the player renamed to USERNAME, so every fixture is read the same way.
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = PROJECT_ROOT / "benchmarks" / "fixtures"
+
+# Label -> number of plies
+SIZES = {"100": 100, "10k": 10_000, "1m": 1_000_000}
+USERNAME = "bench_player"
+OPPONENT = "bench_opponent"
+
+POOL_GAMES = 300  # distinct move sequences; bigger fixtures cycle through them
+START_TS = 1_704_067_200  # 2024-01-01
+TIME_CONTROLS = [("bullet", 60, 0), ("blitz", 180, 2), ("rapid", 600, 5)]
+
+
+def lichess_path(label: str) -> Path:
+    return FIXTURE_DIR / f"lichess_{label}.ndjson"
+
+
+def chesscom_path(label: str) -> Path:
+    return FIXTURE_DIR / f"chesscom_{label}.json"
+
+
+def ensure(label: str) -> tuple[Path, Path]:
+    """Paths of a label's fixtures, generating a standard size on first use."""
+    if not (lichess_path(label).exists() and chesscom_path(label).exists()):
+        if label not in SIZES:
+            raise FileNotFoundError(f"No recorded fixtures for '{label}' in {FIXTURE_DIR}")
+        generate(label)
+    return lichess_path(label), chesscom_path(label)
+
+
+def load_lichess(label: str) -> list[bytes]:
+    """The NDJSON lines of a fixture, as LichessWrapper reads them from the HTTP stream."""
+    return ensure(label)[0].read_bytes().splitlines()
+
+
+def load_chesscom(label: str) -> list[dict]:
+    return json.loads(ensure(label)[1].read_text())["games"]
+
+
+def _game_pool(count: int, seed: int) -> list[list[str]]:
+    import chess
+
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(count):
+        board, moves = chess.Board(), []
+        for _ in range(rng.randint(20, 160)):
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            moves.append(board.san(move))
+            board.push(move)
+        pool.append(moves)
+    return pool
+
+
+def _simulate(rng: random.Random, plies: int, initial: int, increment: int) -> tuple[list[float], list[int]]:
+    """Clock left after every ply, and a white-POV evaluation random walk with the odd blunder."""
+    clocks, left, evaluation, evals = [], [float(initial), float(initial)], 20, []
+    for ply in range(plies):
+        left[ply % 2] = max(0.1, left[ply % 2] - rng.uniform(0.2, initial / 40) + increment)
+        clocks.append(round(left[ply % 2], 1))
+        evaluation += rng.randint(-40, 40)
+        if rng.random() < 0.04:
+            evaluation += rng.choice((-1, 1)) * rng.randint(150, 600)
+        evaluation = max(-2500, min(2500, evaluation))
+        evals.append(evaluation)
+    return clocks, evals
+
+
+def _games(target_plies: int, seed: int = 1):
+    """(index, moves, clocks, evals, speed, initial, increment, player is white) until target_plies are covered."""
+    pool = _game_pool(POOL_GAMES, seed)
+    rng = random.Random(seed + 1)
+    total, index = 0, 0
+    while total < target_plies:
+        moves = pool[index % len(pool)][:target_plies - total]
+        speed, initial, increment = rng.choice(TIME_CONTROLS)
+        clocks, evals = _simulate(rng, len(moves), initial, increment)
+        yield index, moves, clocks, evals, speed, initial, increment, rng.random() < 0.5
+        total += len(moves)
+        index += 1
+
+
+def _clock_text(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours}:{minutes:02d}:{seconds:04.1f}"
+
+
+def generate(label: str) -> None:
+    """Writes the Lichess and Chess.com fixtures of a standard size."""
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"[BENCH] Generating {label} fixtures ({SIZES[label]} plies)...")
+    lichess_lines, chesscom_games = [], []
+    for index, moves, clocks, evals, speed, initial, increment, is_white in _games(SIZES[label]):
+        white, black = (USERNAME, OPPONENT) if is_white else (OPPONENT, USERNAME)
+        winner = "white" if evals and evals[-1] > 0 else "black"
+        created = START_TS + index * 600
+
+        lichess_lines.append(json.dumps({
+            "id": f"bench{index:07d}",
+            "rated": True,
+            "variant": "standard",
+            "speed": speed,
+            "perf": speed,
+            "createdAt": created * 1000,
+            "lastMoveAt": (created + 300) * 1000,
+            "status": "resign",
+            "players": {"white": {"user": {"name": white}, "rating": 1500}, "black": {"user": {"name": black}, "rating": 1500}},
+            "winner": winner,
+            "opening": {"eco": "A00", "name": "Bench Opening", "ply": 2},
+            "moves": " ".join(moves),
+            "clocks": [int(clock * 100) for clock in clocks],
+            "analysis": [{"eval": evaluation} for evaluation in evals],
+            "clock": {"initial": initial, "increment": increment, "totalTime": initial + 40 * increment},
+        }))
+
+        movetext = []
+        for ply, (san, clock) in enumerate(zip(moves, clocks)):
+            number = f"{ply // 2 + 1}." if ply % 2 == 0 else f"{ply // 2 + 1}..."
+            movetext.append(f"{number} {san} {{[%clk {_clock_text(clock)}]}}")
+        result = "1-0" if winner == "white" else "0-1"
+        pgn = "\n".join([
+            '[Event "Live Chess"]', '[Site "Chess.com"]', f'[White "{white}"]', f'[Black "{black}"]',
+            f'[Result "{result}"]', f'[TimeControl "{initial}+{increment}" ]'.replace('" ]', '"]'),
+        ]) + "\n\n" + " ".join(movetext) + f" {result}\n"
+        chesscom_games.append({
+            "url": f"https://www.chess.com/game/live/{index}",
+            "pgn": pgn,
+            "time_control": f"{initial}+{increment}" if increment else str(initial),
+            "end_time": created + 300,
+            "rated": True,
+            "time_class": speed,
+            "rules": "chess",
+            "eco": "https://www.chess.com/openings/Bench-Opening",
+            "white": {"username": white, "rating": 1500, "result": "win" if winner == "white" else "resigned"},
+            "black": {"username": black, "rating": 1500, "result": "win" if winner == "black" else "resigned"},
+        })
+
+    lichess_path(label).write_text("\n".join(lichess_lines) + "\n")
+    chesscom_path(label).write_text(json.dumps({"games": chesscom_games}))
+
+
+def record(label: str, lichess_user: Optional[str], chesscom_user: Optional[str], month: Optional[str], max_games: int) -> None:
+    """Downloads real games into fixtures under `label`, with the player renamed to USERNAME."""
+    import requests
+
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    if lichess_user:
+        response = requests.get(
+            f"https://lichess.org/api/games/user/{lichess_user}",
+            params={"max": max_games, "evals": "true", "clocks": "true", "opening": "true"},
+            headers={"Accept": "application/x-ndjson"},
+            timeout=60,
+        )
+        response.raise_for_status()
+        lines = []
+        for line in response.text.splitlines():
+            game = json.loads(line)
+            for side in game.get("players", {}).values():
+                user = side.get("user", {})
+                if user.get("name", "").lower() == lichess_user.lower():
+                    user["name"] = USERNAME
+            lines.append(json.dumps(game))
+        lichess_path(label).write_text("\n".join(lines) + "\n")
+        print(f"[BENCH] Recorded {len(lines)} Lichess games to {lichess_path(label)}")
+
+    if chesscom_user:
+        if not month:
+            raise ValueError("--month YYYY-MM is required to record a Chess.com archive")
+        year, month_number = month.split("-")
+        response = requests.get(
+            f"https://api.chess.com/pub/player/{chesscom_user.lower()}/games/{year}/{int(month_number):02d}",
+            headers={"User-Agent": "chessmate-benchmarks"},
+            timeout=60,
+        )
+        response.raise_for_status()
+        games = response.json().get("games", [])
+        for game in games:
+            for side in ("white", "black"):
+                if game.get(side, {}).get("username", "").lower() == chesscom_user.lower():
+                    game[side]["username"] = USERNAME
+        chesscom_path(label).write_text(json.dumps({"games": games}))
+        print(f"[BENCH] Recorded {len(games)} Chess.com games to {chesscom_path(label)}")
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate")
+    generate_parser.add_argument("labels", nargs="*", default=list(SIZES), choices=list(SIZES))
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("label")
+    record_parser.add_argument("--lichess")
+    record_parser.add_argument("--chesscom")
+    record_parser.add_argument("--month")
+    record_parser.add_argument("--max-games", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        for label in args.labels:
+            generate(label)
+    else:
+        record(args.label, args.lichess, args.chesscom, args.month, args.max_games)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
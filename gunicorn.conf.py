@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for the web app: gunicorn -c gunicorn.conf.py app:app
+
+The app module imports only Flask at load time. With preloading (the default, CHESSMATE_PRELOAD=0
+turns it off) the master also imports the analysis modules once, before forking, so workers
+share that code instead of each importing it. Nothing that holds a thread, a database
+connection or an engine process is created before the fork: every worker starts its own in a
+background thread right after it, while it is already accepting requests.
+"""
+
+import os
+import threading
+
+pythonpath = "src"
+bind = f":{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("CHESSMATE_THREADS", "4"))
+# Analyses are long requests; jobs run in the background, but /analyse/stream holds its connection
+timeout = 300
+preload_app = os.environ.get("CHESSMATE_PRELOAD", "1").lower() not in ("0", "false", "no")
+
+
+def on_starting(server):
+    if preload_app:
+        import app
+
+        app.preload()
+
+
+def post_fork(server, worker):
+    import app
+
+    threading.Thread(target=app.warm_up, name="warmup", daemon=True).start()
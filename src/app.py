@@ -1,18 +1,84 @@
-from flask import Flask, request, jsonify, render_template
+import json
+import logging
+import threading
+from typing import Optional
+
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, url_for
 from flask_cors import CORS
 from data.helper_functions import load_config
-from ml.dispatcher_app import DispatcherApp
+from jobs.job_queue import JobQueue
+from utils.logger import setup_logger
+from utils.metrics import render_prometheus
 
 app = Flask(__name__)
 CORS(app)  # Allows cross-origin requests (useful for frontend dev)
 
-# Initialize once
-try:
-    config = load_config()
-    dispatcher_app = DispatcherApp.start(config)
-except Exception as e:
-    dispatcher_app = None
-    print(f"Error initializing dispatcher: {e}")
+logger = logging.getLogger("chessmate")
+
+# Initialized once per process, on the first request that needs them (or by `warm_up`), so
+# importing this module stays cheap and a preloading server forks before any thread,
+# database connection or engine process exists
+dispatcher_app = None
+job_queue = None
+_services_lock = threading.Lock()
+_services_started = False
+
+
+def start_services() -> bool:
+    """Loads the config, logger, dispatcher and job queue once; False if that failed."""
+    global dispatcher_app, job_queue, _services_started
+    with _services_lock:
+        if not _services_started:
+            _services_started = True
+            try:
+                from ml.dispatcher_app import DispatcherApp
+
+                config = load_config()
+                setup_logger(config.get("paths", {}).get("logs", "logs/chessmate.log"))
+                dispatcher_app = DispatcherApp.start(config)
+                job_queue = JobQueue.from_config(config.get("jobs", {}))
+            except Exception as e:
+                dispatcher_app = None
+                job_queue = None
+                logger.error(f"Error initializing dispatcher: {e}")
+    return dispatcher_app is not None and job_queue is not None
+
+
+def preload() -> None:
+    """
+    Imports the analysis modules without starting anything, for a server that loads the
+    app once and forks its workers from it: they then share the imported code.
+    """
+    import chess.engine  # noqa: F401
+    import ml.cluster_analysis.cluster_analysis  # noqa: F401
+    import ml.dispatcher_app  # noqa: F401
+    import ml.mistake_identifier.mistake_identifier  # noqa: F401
+
+
+def warm_up() -> None:
+    """Starts the services and everything the dispatcher loads lazily, ahead of the first request."""
+    if start_services():
+        dispatcher_app.warm_up()
+
+
+def _number_of_games(value) -> Optional[int]:
+    """The requested number of games as a positive int, or None if it is not one."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+# Replay columns only the pipeline uses: a packed board (bytes) and a Zobrist hash mean nothing to a client
+INTERNAL_COLUMNS = ("zobrist", "board")
+
+
+def _to_records(df) -> list[dict]:
+    df = df.drop(columns=[column for column in INTERNAL_COLUMNS if column in df])
+    # Missing values (NaN/<NA>) are not valid JSON, send them as null
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
 
 @app.route("/")
 def home():
@@ -20,7 +86,7 @@ def home():
 
 @app.route("/analyse", methods=["POST"])
 def analyse():
-    if dispatcher_app is None:
+    if not start_services():
         return jsonify({"error": "Server not initialized"}), 500
 
     data = request.get_json()
@@ -34,13 +100,93 @@ def analyse():
     if not username or not platform_name:
         return jsonify({"error": "Missing required parameters"}), 400
 
-    try:
-        df = dispatcher_app.analyse(username, platform_name, number_of_games=int(number_of_games))
-        return jsonify(df.to_dict(orient="records"))  # JSON expected by JS
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    number_of_games = _number_of_games(number_of_games)
+    if number_of_games is None:
+        return jsonify({"error": "number_of_games must be a positive integer"}), 400
+    cache_key = f"{platform_name}:{username.lower()}:{number_of_games}"
+    # Opt-in per request; a profiled run is never served from another job's result
+    profile = request.headers.get("X-Chessmate-Profile", "").lower() in ("1", "true", "yes")
+    if profile:
+        cache_key += ":profile"
+
+    def run(progress):
+        df = dispatcher_app.analyse(
+            username, platform_name, number_of_games=number_of_games, progress=progress, profile=profile or None
+        )
+        return _to_records(df)
+
+    job_id = job_queue.submit(cache_key, run)
+    return jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    if not start_services():
+        return jsonify({"error": "Server not initialized"}), 500
+
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+
+    response = {key: job[key] for key in ("id", "status", "progress", "message")}
+    if job["status"] == "done":
+        response["result"] = job["result"]  # JSON expected by JS
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return jsonify(response)
+
+
+@app.route("/metrics")
+def metrics():
+    """Fetch latency, parse and engine throughput, cache hits and queue depths of this process, for Prometheus."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/results")
+def results():
+    return render_template(
+        "results.html",
+        username=request.args.get("username", ""),
+        platform_name=request.args.get("platform_name", ""),
+        number_of_games=request.args.get("number_of_games", 10),
+    )
+
+
+@app.route("/analyse/stream")
+def analyse_stream():
+    """
+    Server-sent events: one 'game' event with that game's rows as soon as it is ready, then a
+    'done' event listing the games that could not be analysed.
+    """
+    if not start_services():
+        return jsonify({"error": "Server not initialized"}), 500
+
+    username = request.args.get("username")
+    platform_name = request.args.get("platform_name")
+    number_of_games = _number_of_games(request.args.get("number_of_games", 10))
+
+    if not username or not platform_name:
+        return jsonify({"error": "Missing required parameters"}), 400
+    if number_of_games is None:
+        return jsonify({"error": "number_of_games must be a positive integer"}), 400
+
+    def events():
+        failures = []
+        try:
+            for df in dispatcher_app.iter_analyse(username, platform_name, number_of_games=number_of_games, failures=failures):
+                yield f"event: game\ndata: {json.dumps(_to_records(df), default=str)}\n\n"
+            yield f"event: done\ndata: {json.dumps({'failed': failures})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
-    print("Starting Flask server...")
+    start_services()
+    logger.info("Starting Flask server...")
     app.run(debug=True)
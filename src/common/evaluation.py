@@ -0,0 +1,44 @@
+from typing import Any, Optional, Union
+
+# Mate scores are folded into centipawns so every evaluation fits one numeric column
+MATE_SCORE_CP = 3000
+# Stands for a missing evaluation in int16 arrays
+EVAL_MISSING = -32768
+
+
+def mate_to_cp(moves: int) -> int:
+    """Mate in `moves` (negative: the other side mates) as centipawns; a faster mate scores higher."""
+    return MATE_SCORE_CP - moves if moves > 0 else -MATE_SCORE_CP - moves
+
+
+def score_to_cp(score: Any) -> int:
+    """A python-chess `Score` (from one side's point of view) as centipawns, mates through `mate_to_cp`."""
+    mate = score.mate()
+    return mate_to_cp(mate) if mate is not None else score.score()
+
+
+def eval_to_cp(value: Union[str, int, float, None]) -> Optional[int]:
+    """
+    Converts an evaluation in any of the formats the platforms produce to centipawns
+    from white's point of view. Numbers are centipawns, as in the Lichess API; strings are
+    written the way PGN annotations and chess GUIs write them, in pawns ("+0.53", "-1.5").
+    Mates ("mate in 3", "mated in 2", "+M3"/"-M3", "#3"/"#-3") go through `mate_to_cp`.
+    Returns None for missing or unparseable values.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else int(round(value))  # NaN check
+
+    text = value.strip()
+    words = text.lower().split()
+    try:
+        if len(words) == 3 and words[0] in ("mate", "mated") and words[1] == "in":
+            return mate_to_cp(int(words[2]) if words[0] == "mate" else -int(words[2]))
+        unsigned = text.lstrip("+-")
+        if unsigned.startswith(("M", "#")):
+            moves = int(unsigned[1:])
+            return mate_to_cp(-moves if text.startswith("-") else moves)
+        return int(round(float(text) * 100))
+    except ValueError:
+        return None
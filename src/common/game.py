@@ -1,44 +1,137 @@
+import logging
 from datetime import datetime
-import pandas as pd
+from typing import TYPE_CHECKING, Any, Optional
+import numpy as np
+
+from common.evaluation import EVAL_MISSING, eval_to_cp
+from common.move_codes import decode_moves, encode_moves
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from common.positions import Positions
+
+logger = logging.getLogger("chessmate")
 
 class Game:
-    def __init__(self, id, start_dt_utc, platform, speed, opening, winner, moves, evaluations, time_spent, player_color):
+    """
+    A single game. The per-ply data is held in compact arrays: moves as uint16 codes of
+    their SAN (see common.move_codes), evaluations as int16 white-POV centipawns and time
+    spent as float32 seconds. `moves`, `evaluations` and `time_spent` read and write them
+    as the plain lists the rest of the code works with.
+    """
+
+    __slots__ = (
+        "id", "start_dt_utc", "platform", "speed", "opening", "winner", "player_color",
+        "eval_source", "eval_depth", "move_codes", "evals_cp", "seconds_spent", "_positions",
+    )
+
+    def __init__(self, id, start_dt_utc, platform, speed, opening, winner, moves, evaluations, time_spent, player_color,
+                 eval_source: Optional[str] = None, eval_depth: Optional[int] = None):
         self.id = id
         self.start_dt_utc = start_dt_utc
         self.platform = platform
         self.speed = speed
         self.opening = opening
         self.winner = winner
+        self._positions: Optional["Positions"] = None
         self.moves = moves
         self.evaluations = evaluations
         self.time_spent = time_spent
         self.player_color: str = player_color  # 'white' or 'black'
+        # Evaluations are white-POV centipawns (None where missing); who produced them and how deep
+        self.eval_source = eval_source
+        self.eval_depth = eval_depth
+
+    @property
+    def moves(self) -> list[str]:
+        return decode_moves(self.move_codes)
+
+    @moves.setter
+    def moves(self, moves: list[str]) -> None:
+        self.move_codes = encode_moves(moves)
+        self._positions = None
+
+    @property
+    def evaluations(self) -> list[Optional[int]]:
+        """Empty when the game has no evaluations at all; otherwise None where one is missing."""
+        return [None if value == EVAL_MISSING else value for value in self.evals_cp.tolist()]
+
+    @evaluations.setter
+    def evaluations(self, evaluations) -> None:
+        # A list in any format eval_to_cp reads, or a float array with NaN where missing
+        if isinstance(evaluations, np.ndarray):
+            values = np.clip(np.round(evaluations), -32767, 32767)
+            self.evals_cp = np.where(np.isnan(values), EVAL_MISSING, values).astype(np.int16)
+            return
+        values = [eval_to_cp(value) for value in evaluations or []]
+        self.evals_cp = np.array(
+            [EVAL_MISSING if value is None else max(-32767, min(32767, value)) for value in values], dtype=np.int16
+        )
+
+    @property
+    def time_spent(self) -> list[Optional[float]]:
+        return [None if value != value else value for value in self.seconds_spent.tolist()]
+
+    @time_spent.setter
+    def time_spent(self, time_spent) -> None:
+        # A list with None where missing, or a float array with NaN
+        if isinstance(time_spent, np.ndarray):
+            self.seconds_spent = time_spent.astype(np.float32)
+            return
+        self.seconds_spent = np.array(
+            [np.nan if value is None else value for value in time_spent or []], dtype=np.float32
+        )
+
+    def replay(self) -> "Positions":
+        """Per-ply FENs, UCI moves, Zobrist hashes and packed boards, from one replay that is then kept."""
+        if self._positions is None:
+            from common.positions import replay
+
+            moves = self.moves
+            self._positions = replay(moves)
+            if len(self._positions.fens) < len(moves):
+                logger.warning(f"Game {self.id}: stopping replay at illegal move {moves[len(self._positions.fens)]}")
+        return self._positions
+
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        from common.move_table import MoveTable
+
+        return MoveTable([self]).to_dataframe()
+
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "start_dt_utc": self.start_dt_utc.isoformat(),
+            "platform": self.platform,
+            "speed": self.speed,
+            "opening": self.opening,
+            "winner": self.winner,
+            "moves": self.moves,
+            "evaluations": self.evaluations,
+            "time_spent": self.time_spent,
+            "player_color": self.player_color,
+            "eval_source": self.eval_source,
+            "eval_depth": self.eval_depth,
+        }
 
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Game":
+        return cls(**{**data, "start_dt_utc": datetime.fromisoformat(data["start_dt_utc"])})
 
-    def to_dataframe(self) -> pd.DataFrame:
-        move_count = len(self.moves)
-
-        def pad_or_trim(lst):
-            if not lst:
-                return [None] * move_count
-            elif len(lst) < move_count:
-                return lst + [None] * (move_count - len(lst))
-            else:
-                return lst[:move_count]
-
-        return pd.DataFrame({
-            "game_id": [self.id] * move_count,
-            "move_number": list(range(1, move_count + 1)),
-            "move": self.moves,
-            "evaluation": pad_or_trim(self.evaluations),
-            "time_spent": pad_or_trim(self.time_spent),
-            "speed": [self.speed] * move_count,
-            "platform": [self.platform] * move_count,
-            "opening": [self.opening] * move_count,
-            "winner": [self.winner] * move_count,
-            "start_dt_utc": [self.start_dt_utc] * move_count,
-        })
+    def __getstate__(self) -> dict[str, Any]:
+        # Move codes only mean something in this process, so games travel with their SAN
+        state = {name: getattr(self, name) for name in self.__slots__ if name != "move_codes"}
+        state["moves"] = self.moves
+        return state
 
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        state = dict(state)
+        self.move_codes = encode_moves(state.pop("moves"))
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __repr__(self):
         return f"<Game {self.id} [{self.speed}] {self.start_dt_utc.date()} on {self.platform}>"
@@ -0,0 +1,98 @@
+import re
+import threading
+from typing import Sequence
+
+import chess
+import numpy as np
+
+# Every distinct SAN string seen by this process gets a uint16 code. Only strings that are
+# SAN for some move on some board are admitted, and there are about 42,000 of those, so the
+# vocabulary cannot outgrow its codes however many games a long-lived process reads. The
+# codes are process-local, so anything leaving the process (pickles, JSON) carries the SAN
+# strings instead.
+MAX_MOVE_CODES = np.iinfo(np.uint16).max + 1
+
+# Piece move (with any disambiguation), pawn push or capture (with any promotion), castling
+_SAN = re.compile(
+    r"(?:(?P<piece>[NBRQK])(?P<file>[a-h])?(?P<rank>[1-8])?x?(?P<to>[a-h][1-8])"
+    r"|(?P<pawn>[a-h])(?:x(?P<capture>[a-h]))?(?P<pawn_rank>[1-8])(?P<promotion>=[NBRQ])?"
+    r"|[O0]-[O0](?:-[O0])?)"
+    r"[+#]?"
+)
+# Move annotations written onto the SAN ("e4!", "Nf3?!"); they share the plain move's code
+_GLYPHS = ("!!", "??", "!?", "?!", "!", "?")
+
+_codes: dict[str, int] = {}
+_moves: list[str] = []
+_lock = threading.Lock()
+
+
+def _reach(piece: str, square: chess.Square) -> int:
+    """Squares a piece could have come from to land on `square` of an empty board."""
+    if piece == "N":
+        return chess.BB_KNIGHT_ATTACKS[square]
+    if piece == "K":
+        return chess.BB_KING_ATTACKS[square]
+    diagonal = chess.BB_DIAG_ATTACKS[square][0]
+    straight = chess.BB_RANK_ATTACKS[square][0] | chess.BB_FILE_ATTACKS[square][0]
+    return {"B": diagonal, "R": straight, "Q": diagonal | straight}[piece]
+
+
+def is_san(san: str) -> bool:
+    """Whether `san` is SAN for a move on some board, judged by the move's geometry alone."""
+    match = _SAN.fullmatch(san)
+    if match is None:
+        return False
+    if match["piece"]:
+        if match["piece"] == "K" and (match["file"] or match["rank"]):
+            return False
+        origins = _reach(match["piece"], chess.parse_square(match["to"]))
+        if match["file"]:
+            origins &= chess.BB_FILES[chess.FILE_NAMES.index(match["file"])]
+        if match["rank"]:
+            origins &= chess.BB_RANKS[int(match["rank"]) - 1]
+        return bool(origins)
+    if match["pawn"]:
+        if match["capture"] and abs(ord(match["capture"]) - ord(match["pawn"])) != 1:
+            return False
+        return bool(match["promotion"]) == (match["pawn_rank"] in "18")
+    return True
+
+
+def _admit(san: str) -> int:
+    """The code of an unseen SAN string, adding it to the vocabulary; call with `_lock` held."""
+    stripped = next((san[:-len(glyph)] for glyph in _GLYPHS if san.endswith(glyph)), san)
+    if stripped != san:
+        code = _codes.get(stripped)
+        if code is None:
+            code = _admit(stripped)
+        _codes[san] = code
+        return code
+    if not is_san(san):
+        raise ValueError(f"Not a SAN move: {san!r}")
+    if len(_moves) >= MAX_MOVE_CODES:
+        raise ValueError("Move vocabulary is full")
+    code = _codes[san] = len(_moves)
+    _moves.append(san)
+    return code
+
+
+def encode_moves(moves: Sequence[str]) -> np.ndarray:
+    """
+    SAN moves as a uint16 array of their codes, adding unseen moves to the vocabulary.
+    Annotation glyphs are dropped; raises ValueError for a string that is not SAN.
+    """
+    try:
+        return np.fromiter((_codes[san] for san in moves), dtype=np.uint16, count=len(moves))
+    except KeyError:
+        pass
+    with _lock:
+        for san in moves:
+            if san not in _codes:
+                _admit(san)
+    return np.fromiter((_codes[san] for san in moves), dtype=np.uint16, count=len(moves))
+
+
+def decode_moves(codes: np.ndarray) -> list[str]:
+    moves = _moves
+    return [moves[code] for code in codes.tolist()]
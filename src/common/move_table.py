@@ -0,0 +1,189 @@
+from typing import TYPE_CHECKING, Iterable
+
+import numpy as np
+
+from common.evaluation import EVAL_MISSING
+from common.game import Game
+from common.positions import PACKED_BOARD_BYTES, PACKED_BOARD_DTYPE
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Per-game string columns, stored once per game as small integer codes
+CATEGORICAL_COLUMNS = ("platform", "speed", "opening", "winner")
+
+ROW_DTYPES = {
+    "game_index": np.int32,
+    "move_number": np.int16,
+    "move": np.int32,
+    "evaluation": np.int16,
+    "time_spent": np.float32,
+    # From Game.replay: the position before each ply and the move in UCI
+    "move_uci": np.int32,
+    "fen": object,
+    "zobrist": np.uint64,
+    "board": PACKED_BOARD_DTYPE,
+}
+POSITION_COLUMNS = ("move_uci", "fen", "zobrist", "board")
+
+
+class MoveTable:
+    """
+    Columnar store of the moves of many games.
+
+    Games are appended into typed NumPy chunks: integer codes for the game id, SAN and UCI
+    moves and the categorical per-game columns, int16 evaluations, float32 clocks, and the
+    FEN, Zobrist hash and packed board before every ply from the game's replay. Chunks are
+    consolidated on the first read after an append, and `to_dataframe` wraps the
+    consolidated arrays in a single DataFrame without copying them.
+
+    With `positions=False` the replay columns are left out, which keeps tables that only
+    need moves, clocks and evaluations cheap to build.
+    """
+
+    def __init__(self, games: Iterable[Game] = (), positions: bool = True) -> None:
+        self.positions = positions
+        self.game_ids: list[str] = []
+        self._start_ns: list[int] = []
+        self._game_codes: dict[str, list[int]] = {name: [] for name in ("game_id", *CATEGORICAL_COLUMNS)}
+        # A game id can repeat, e.g. a game found in two files, so ids are coded like the other columns
+        self._categories: dict[str, dict[str, int]] = {
+            name: {} for name in ("game_id", *CATEGORICAL_COLUMNS, "move", "move_uci")
+        }
+
+        self._chunks: dict[str, list[np.ndarray]] = {
+            name: [] for name in ROW_DTYPES if positions or name not in POSITION_COLUMNS
+        }
+        self._row_count = 0
+
+        for game in games:
+            self.append(game)
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self._categories[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def append(self, game: Game) -> None:
+        moves = game.moves
+        move_count = len(moves)
+        game_index = len(self.game_ids)
+
+        self.game_ids.append(game.id)
+        self._game_codes["game_id"].append(self._code("game_id", game.id))
+        self._start_ns.append(int(game.start_dt_utc.timestamp() * 1_000_000_000))
+        for column in CATEGORICAL_COLUMNS:
+            self._game_codes[column].append(self._code(column, str(getattr(game, column))))
+
+        evaluations = np.full(move_count, EVAL_MISSING, dtype=np.int16)
+        game_evals = game.evals_cp[:move_count]
+        evaluations[:len(game_evals)] = game_evals
+
+        time_spent = np.full(move_count, np.nan, dtype=np.float32)
+        clocks = game.seconds_spent[:move_count]
+        time_spent[:len(clocks)] = clocks
+
+        self._chunks["game_index"].append(np.full(move_count, game_index, dtype=np.int32))
+        self._chunks["move_number"].append(np.arange(1, move_count + 1, dtype=np.int16))
+        self._chunks["move"].append(np.fromiter((self._code("move", san) for san in moves), dtype=np.int32, count=move_count))
+        self._chunks["evaluation"].append(evaluations)
+        self._chunks["time_spent"].append(time_spent)
+        self._row_count += move_count
+        if not self.positions:
+            return
+
+        # Plies after an illegal move have no position: code -1, None, 0 and an all-zero board
+        positions = game.replay()
+        replayed = len(positions.fens)
+        move_uci = np.full(move_count, -1, dtype=np.int32)
+        move_uci[:replayed] = [self._code("move_uci", uci) for uci in positions.moves_uci]
+        fens = np.full(move_count, None, dtype=object)
+        fens[:replayed] = positions.fens
+        zobrist = np.zeros(move_count, dtype=np.uint64)
+        zobrist[:replayed] = positions.zobrist
+        boards = np.zeros((move_count, PACKED_BOARD_BYTES), dtype=np.uint8)
+        boards[:replayed] = positions.boards
+
+        self._chunks["move_uci"].append(move_uci)
+        self._chunks["fen"].append(fens)
+        self._chunks["zobrist"].append(zobrist)
+        self._chunks["board"].append(boards)
+
+    def extend(self, other: "MoveTable") -> None:
+        """Appends every game of another table, remapping its category codes onto this table's."""
+        if self.positions and not other.positions:
+            raise ValueError("Cannot extend a table with positions by one without them")
+        game_offset = len(self.game_ids)
+        self.game_ids.extend(other.game_ids)
+        self._start_ns.extend(other._start_ns)
+        for column in ("game_id", *CATEGORICAL_COLUMNS):
+            remap = [self._code(column, value) for value in other._categories[column]]
+            self._game_codes[column].extend(remap[code] for code in other._game_codes[column])
+
+        move_remap = np.fromiter((self._code("move", san) for san in other._categories["move"]), dtype=np.int32)
+        # The trailing -1 keeps the code of unreplayed plies
+        uci_remap = np.fromiter((self._code("move_uci", uci) for uci in other._categories["move_uci"]), dtype=np.int32)
+        uci_remap = np.append(uci_remap, np.int32(-1))
+        for name in self._chunks:
+            column = other._column(name)
+            if name == "game_index":
+                column = column + game_offset
+            elif name == "move":
+                column = move_remap[column]
+            elif name == "move_uci":
+                column = uci_remap[column]
+            self._chunks[name].append(column)
+        self._row_count += len(other)
+
+    def _column(self, name: str) -> np.ndarray:
+        chunks = self._chunks[name]
+        if len(chunks) != 1:
+            chunks[:] = [np.concatenate(chunks) if chunks else np.empty(0, dtype=ROW_DTYPES[name])]
+        return chunks[0]
+
+    def _categorical(self, column: str, codes: np.ndarray) -> "pd.Categorical":
+        import pandas as pd
+
+        return pd.Categorical.from_codes(codes, categories=list(self._categories[column]), validate=False)
+
+    def _per_game_codes(self, column: str) -> np.ndarray:
+        return np.asarray(self._game_codes[column], dtype=np.int32)
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """One row per move across all games, with categorical per-game columns."""
+        # pandas is only needed here, so building tables (and importing this module) does not load it
+        import pandas as pd
+
+        game_index = self._column("game_index")
+        evaluations = self._column("evaluation")
+
+        columns = {
+            "game_id": self._categorical("game_id", self._per_game_codes("game_id")[game_index]),
+            "move_number": self._column("move_number"),
+            "move": self._categorical("move", self._column("move")),
+            "evaluation": pd.arrays.IntegerArray(evaluations, evaluations == EVAL_MISSING),
+            "time_spent": self._column("time_spent"),
+        }
+        if self.positions:
+            columns["move_uci"] = self._categorical("move_uci", self._column("move_uci"))
+            columns["fen"] = self._column("fen")
+            columns["zobrist"] = self._column("zobrist")
+            # Fixed-width bytes; the board's last byte is never NUL, so only missing boards come out empty
+            columns["board"] = self._column("board").view(f"S{PACKED_BOARD_BYTES}")[:, 0]
+        for column in CATEGORICAL_COLUMNS:
+            columns[column] = self._categorical(column, self._per_game_codes(column)[game_index])
+        start_ns = np.asarray(self._start_ns, dtype=np.int64)[game_index]
+        columns["start_dt_utc"] = pd.to_datetime(start_ns, unit="ns", utc=True)
+
+        return pd.DataFrame(columns, copy=False)
+
+    def to_arrow(self):
+        """The same table as `to_dataframe`, as a pyarrow Table (requires pyarrow)."""
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(self.to_dataframe(), preserve_index=False)
+
+    def __len__(self) -> int:
+        return self._row_count
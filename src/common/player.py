@@ -1,56 +1,97 @@
-from common.game import Game  
-import pandas as pd
+import logging
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from common.game import Game
+from common.move_table import MoveTable
+from utils.metrics import GAMES_SKIPPED
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SPEEDS = ("ultraBullet", "bullet", "blitz", "rapid", "classical", "correspondence")
+
+logger = logging.getLogger("chessmate")
 
 class Player:
+    """
+    A player's games, held once in insertion order. An id -> index map and one index
+    array per speed make lookups by id or speed direct. The columnar MoveTable behind
+    `get_all_games_df` is only built once a DataFrame is asked for.
+    """
+
     def __init__(self, username: str):
         self.username = username
-        self.ultraBullet: dict[str, Game] = {}
-        self.bullet: dict[str, Game] = {}
-        self.blitz: dict[str, Game] = {}
-        self.rapid: dict[str, Game] = {}
-        self.classical: dict[str, Game] = {}
-        self.correspondence: dict[str, Game] = {}
-
-    def _get_speed_dict(self, speed: str) -> dict[str, Game]:
-        if speed not in {"ultraBullet","bullet", "blitz", "rapid", "classical", "correspondence"}:
+        self._games: list[Game] = []
+        self._by_id: dict[str, int] = {}
+        self._by_speed: dict[str, array] = {speed: array("l") for speed in SPEEDS}
+        self._moves: Optional[MoveTable] = None  # built by get_all_games_df, dropped when a game is replaced
+
+    def _speed_indexes(self, speed: str) -> array:
+        indexes = self._by_speed.get(speed)
+        if indexes is None:
             raise ValueError(f"Unknown speed: {speed}")
-        return getattr(self, speed)
+        return indexes
 
     def add_game(self, game: Game):
         """Add a single Game to the appropriate category based on speed."""
-        speed_dict = self._get_speed_dict(game.speed)
-        speed_dict[game.id] = game
+        speed_indexes = self._speed_indexes(game.speed)
+        index = self._by_id.get(game.id)
+        if index is None:
+            index = self._by_id[game.id] = len(self._games)
+            self._games.append(game)
+            speed_indexes.append(index)
+            if self._moves is not None:
+                self._moves.append(game)
+            return
+
+        previous = self._games[index]
+        self._moves = None  # A replaced game's rows are already in the table
+        self._games[index] = game
+        if previous.speed != game.speed:
+            self._by_speed[previous.speed].remove(index)
+            speed_indexes.append(index)
 
-    def add_games(self, games: list[Game]):
-        """Add multiple games at once."""
+    def add_games(self, games: Iterable[Game]) -> int:
+        """
+        Add multiple games at once. Games of a speed outside SPEEDS, e.g. Chess.com's daily
+        games, are skipped and counted in GAMES_SKIPPED; returns how many were skipped.
+        """
+        skipped: Counter[tuple[str, str]] = Counter()
         for game in games:
+            if game.speed not in self._by_speed:
+                skipped[(game.platform, game.speed)] += 1
+                continue
             self.add_game(game)
 
+        for (platform, speed), count in skipped.items():
+            GAMES_SKIPPED.inc(count, platform=platform)
+            logger.info(f"Skipped {count} {platform} games of {self.username} with unknown speed '{speed}'")
+        return sum(skipped.values())
+
     def get_game_on_id(self, game_id: str) -> Game:
-        """Searches all categories for a game with the given ID."""
-        for speed in ["ultraBullet", "bullet", "blitz", "rapid", "classical", "correspondence"]:
-            speed_dict = getattr(self, speed)
-            if game_id in speed_dict:
-                return speed_dict[game_id]
-        raise KeyError(f"Game ID '{game_id}' not found")
+        """Looks up a game by ID, whatever its speed."""
+        index = self._by_id.get(game_id)
+        if index is None:
+            raise KeyError(f"Game ID '{game_id}' not found")
+        return self._games[index]
 
     def get_games_on_speed(self, speed: str) -> list[Game]:
         """Returns a list of games for a given speed."""
-        return list(self._get_speed_dict(speed).values())
+        games = self._games
+        return [games[index] for index in self._speed_indexes(speed)]
+
+    def get_all_games(self) -> list[Game]:
+        """Returns the games of all speeds in the order they were added; a replaced game keeps its place."""
+        return list(self._games)
 
     def __repr__(self) -> str:
-        return (f"Player(username={self.username}, "
-            f"ultraBullet={len(self.ultraBullet)}, "
-            f"bullet={len(self.bullet)}, "
-            f"blitz={len(self.blitz)}, "
-            f"rapid={len(self.rapid)}, "
-            f"classical={len(self.classical)}, "
-            f"correspondence={len(self.correspondence)})")
-
-    def get_all_games_df(self) -> list[pd.DataFrame]:
-        all_games = []
-        for speed in ["ultraBullet", "bullet", "blitz", "rapid", "classical", "correspondence"]:
-            speed_dict = getattr(self, speed)
-            for game in speed_dict.values():
-                all_games.append(game.to_dataframe())
-        return all_games
\ No newline at end of file
+        counts = ", ".join(f"{speed}={len(self._by_speed[speed])}" for speed in SPEEDS)
+        return f"Player(username={self.username}, {counts})"
+
+    def get_all_games_df(self) -> "pd.DataFrame":
+        """Returns one DataFrame with a row per move across all games, in the order of `get_all_games`."""
+        if self._moves is None:
+            self._moves = MoveTable(self._games, positions=False)
+        return self._moves.to_dataframe()
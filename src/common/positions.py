@@ -0,0 +1,100 @@
+from typing import NamedTuple, Sequence
+
+import chess
+import chess.polyglot
+import numpy as np
+
+# Piece order of the packed nibbles and of bitboard arrays; nibble 0 is an empty square
+PIECES = "PNBRQKpnbrqk"
+# 32 bytes of square nibbles (a1 low nibble of byte 0 ... h8 high nibble of byte 31),
+# the en passant square + 1 (0 for none), then 0x80 | white to move | castling << 1.
+# The high bit keeps a packed board from ending in NUL, so it survives fixed-width bytes.
+PACKED_BOARD_BYTES = 34
+PACKED_BOARD_DTYPE = np.dtype((np.uint8, (PACKED_BOARD_BYTES,)))
+
+_RANDOM = np.array(chess.polyglot.POLYGLOT_RANDOM_ARRAY, dtype=np.uint64)
+# Polyglot numbers its pieces black pawn, white pawn, black knight, ...
+_PIECE_KEYS = np.stack([
+    _RANDOM[64 * ((index % 6) * 2 + (index < 6)):][:64] for index in range(len(PIECES))
+])
+_CASTLING_SQUARES = (chess.H1, chess.A1, chess.H8, chess.A8)  # Polyglot's castling key order
+_CASTLING_KEYS = np.array([np.bitwise_xor.reduce(_RANDOM[768:772][[bit for bit in range(4) if flags >> bit & 1]])
+                           for flags in range(16)], dtype=np.uint64)
+_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+class Positions(NamedTuple):
+    """Every position of a game before each ply, from a single replay of its moves."""
+    fens: list[str]
+    moves_uci: list[str]
+    zobrist: np.ndarray  # uint64 Polyglot hashes
+    boards: np.ndarray   # (plies, PACKED_BOARD_BYTES) uint8
+
+
+def replay(moves_san: Sequence[str], starting_fen: str = chess.STARTING_FEN) -> Positions:
+    """
+    Plays SAN moves through python-chess once. Stops at the first illegal move, so the
+    result can be shorter than the moves.
+    """
+    board = chess.Board(starting_fen)
+    fens, moves_uci, pieces, castling, ep_squares, ep_keys, turns = [], [], [], [], [], [], []
+    for san in moves_san:
+        try:
+            move = board.parse_san(san)
+        except ValueError:
+            break
+        fens.append(board.fen())
+        moves_uci.append(move.uci())
+        black, white = board.occupied_co  # indexed by color, and chess.BLACK is 0
+        pieces.extend((
+            board.pawns & white, board.knights & white, board.bishops & white,
+            board.rooks & white, board.queens & white, board.kings & white,
+            board.pawns & black, board.knights & black, board.bishops & black,
+            board.rooks & black, board.queens & black, board.kings & black,
+        ))
+        castling.append(board.clean_castling_rights())
+        ep_squares.append(0 if board.ep_square is None else board.ep_square + 1)
+        ep_keys.append(_HASHER.hash_ep_square(board))
+        turns.append(board.turn)
+        board.push(move)
+
+    plies = len(fens)
+    bitboards = np.array(pieces, dtype=np.uint64).reshape(plies, len(PIECES))
+    rights = np.array(castling, dtype=np.uint64)
+    flags = np.zeros(plies, dtype=np.uint8)
+    for bit, square in enumerate(_CASTLING_SQUARES):
+        flags |= (((rights >> np.uint64(square)) & np.uint64(1)).astype(np.uint8) << bit)
+    white_to_move = np.array(turns, dtype=bool)
+
+    # Every set bit of a piece bitboard contributes that piece's key for its square
+    squares = np.unpackbits(bitboards.view(np.uint8).reshape(plies, len(PIECES), 8), axis=2, bitorder="little").astype(bool)
+    zobrist = np.bitwise_xor.reduce(np.where(squares, _PIECE_KEYS, np.uint64(0)).reshape(plies, len(PIECES) * 64), axis=1)
+    zobrist ^= _CASTLING_KEYS[flags] ^ np.array(ep_keys, dtype=np.uint64) ^ np.where(white_to_move, _RANDOM[780], np.uint64(0))
+
+    codes = (squares * np.arange(1, len(PIECES) + 1, dtype=np.uint8)[:, None]).sum(axis=1, dtype=np.uint8)
+    boards = np.empty((plies, PACKED_BOARD_BYTES), dtype=np.uint8)
+    boards[:, :32] = codes[:, 0::2] | (codes[:, 1::2] << 4)
+    boards[:, 32] = ep_squares
+    boards[:, 33] = 0x80 | white_to_move | (flags << 1)
+    return Positions(fens, moves_uci, zobrist, boards)
+
+
+def unpack_bitboards(boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packed boards back to a (N, 12) uint64 array of piece bitboards, ordered as PIECES,
+    plus a boolean array that is True where white is to move.
+    """
+    boards = np.asarray(boards, dtype=np.uint8).reshape(-1, PACKED_BOARD_BYTES)
+    codes = np.empty((len(boards), 64), dtype=np.uint8)
+    codes[:, 0::2] = boards[:, :32] & 0x0F
+    codes[:, 1::2] = boards[:, :32] >> 4
+    bitboards = np.empty((len(boards), len(PIECES)), dtype=np.uint64)
+    for index in range(len(PIECES)):
+        # Every position is exactly 64 bits, so packing the flat mask yields one uint64 per row
+        bitboards[:, index] = np.packbits((codes == index + 1).ravel(), bitorder="little").view("<u8")
+    return bitboards, (boards[:, 33] & 1).astype(bool)
+
+
+def packed_boards(values: Sequence[bytes]) -> np.ndarray:
+    """A sequence of packed-board bytes, e.g. a DataFrame column, as one (N, PACKED_BOARD_BYTES) array."""
+    return np.frombuffer(b"".join(values), dtype=np.uint8).reshape(-1, PACKED_BOARD_BYTES)
@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from common.game import Game
+from common.player import Player
+
+
+class Coverage(NamedTuple):
+    """The span of a user's history the store holds without gaps, both ends included."""
+    oldest_dt_utc: datetime
+    newest_dt_utc: datetime
+    complete: bool  # no games older than `oldest_dt_utc` exist on the platform
+
+
+class GameStore:
+    """
+    Local SQLite store of downloaded games, so repeat analyses only fetch what is new.
+
+    Games are kept per (platform, username) together with the newest game timestamp seen,
+    which the platform wrappers use as the starting point of the next download. Monthly
+    archives that were downloaded after the month ended are recorded as closed, in the same
+    transaction that saves their games, and are read from the store from then on.
+
+    Partial downloads are stored too, so the number of stored games says nothing about how
+    much of a history is there. The span that was downloaded without gaps is recorded per
+    user as its coverage, and only that span is ever answered from the store.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS games (
+                platform TEXT NOT NULL,
+                username TEXT NOT NULL,
+                game_id TEXT NOT NULL,
+                start_ts REAL NOT NULL,
+                speed TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (platform, username, game_id)
+            );
+            CREATE INDEX IF NOT EXISTS games_by_time ON games (platform, username, start_ts);
+            CREATE TABLE IF NOT EXISTS closed_months (
+                platform TEXT NOT NULL,
+                username TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                month INTEGER NOT NULL,
+                PRIMARY KEY (platform, username, year, month)
+            );
+            CREATE TABLE IF NOT EXISTS coverage (
+                platform TEXT NOT NULL,
+                username TEXT NOT NULL,
+                oldest_ts REAL NOT NULL,
+                newest_ts REAL NOT NULL,
+                complete INTEGER NOT NULL,
+                PRIMARY KEY (platform, username)
+            );
+            """
+        )
+
+    @classmethod
+    def from_config(cls, store_config: dict) -> "GameStore":
+        return cls(store_config.get("path", "data/games.sqlite"))
+
+    def save_player(self, platform: str, player: Player) -> int:
+        """Insert or refresh every game of the player. Returns the number of games written."""
+        return self.save_games(platform, player.username, player.get_all_games())
+
+    def save_games(
+        self,
+        platform: str,
+        username: str,
+        games: Iterable[Game],
+        closed_month: Optional[tuple[int, int]] = None
+    ) -> int:
+        """
+        Insert or refresh games of one user. With `closed_month` the (year, month) is recorded
+        as closed in the same transaction, so it is never marked closed without its games.
+        Returns the number of games written.
+        """
+        username = username.lower()
+        rows = [
+            (platform, username, game.id, game.start_dt_utc.timestamp(), game.speed, json.dumps(game.to_dict()))
+            for game in games
+        ]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if closed_month is not None:
+                self._db.execute("INSERT OR IGNORE INTO closed_months VALUES (?, ?, ?, ?)", (platform, username, *closed_month))
+        return len(rows)
+
+    def load_player(
+        self,
+        platform: str,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None
+    ) -> Player:
+        """Build a Player from stored games in the date window, optionally limited to the newest N."""
+        player = Player(username)
+        player.add_games(self.load_games(platform, username, start_dt_utc, end_dt_utc, number_of_games))
+        return player
+
+    def load_games(
+        self,
+        platform: str,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None
+    ) -> list[Game]:
+        """Stored games in the date window (both ends included), newest first, optionally only the newest N."""
+        query = "SELECT payload FROM games WHERE platform = ? AND username = ?"
+        params: tuple = (platform, username.lower())
+        if start_dt_utc is not None:
+            query += " AND start_ts >= ?"
+            params += (start_dt_utc.timestamp(),)
+        if end_dt_utc is not None:
+            query += " AND start_ts <= ?"
+            params += (end_dt_utc.timestamp(),)
+        query += " ORDER BY start_ts DESC"
+        if number_of_games is not None:
+            query += " LIMIT ?"
+            params += (number_of_games,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [Game.from_dict(json.loads(payload)) for (payload,) in rows]
+
+    def month_games(self, platform: str, username: str, year: int, month: int) -> list[Game]:
+        """Stored games that started in one calendar month (UTC), newest first."""
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM games WHERE platform = ? AND username = ? AND start_ts >= ? AND start_ts < ?"
+                " ORDER BY start_ts DESC",
+                (platform, username.lower(), start.timestamp(), end.timestamp()),
+            ).fetchall()
+        return [Game.from_dict(json.loads(payload)) for (payload,) in rows]
+
+    def count_games(self, platform: str, username: str) -> int:
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM games WHERE platform = ? AND username = ?", (platform, username.lower())
+            ).fetchone()
+        return count
+
+    def coverage(self, platform: str, username: str) -> Optional[Coverage]:
+        """The span of the user's history stored without gaps, or None before a download from the newest game."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT oldest_ts, newest_ts, complete FROM coverage WHERE platform = ? AND username = ?",
+                (platform, username.lower()),
+            ).fetchone()
+        if row is None:
+            return None
+        oldest, newest, complete = row
+        return Coverage(
+            datetime.fromtimestamp(oldest, tz=timezone.utc), datetime.fromtimestamp(newest, tz=timezone.utc), bool(complete)
+        )
+
+    def set_coverage(self, platform: str, username: str, coverage: Coverage) -> None:
+        """Record the span of the user's history stored without gaps. Its games must already be saved."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)",
+                (
+                    platform, username.lower(), coverage.oldest_dt_utc.timestamp(),
+                    coverage.newest_dt_utc.timestamp(), int(coverage.complete),
+                ),
+            )
+
+    def closed_months(self, platform: str, username: str) -> set[tuple[int, int]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT year, month FROM closed_months WHERE platform = ? AND username = ?", (platform, username.lower())
+            ).fetchall()
+        return {(year, month) for year, month in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
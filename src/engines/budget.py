@@ -0,0 +1,149 @@
+import math
+import threading
+import time
+from typing import Any, Optional
+
+import chess.engine
+
+
+class SearchBudget:
+    """
+    Node and wall-time allowance for the deep analysis of one game.
+
+    Every search is capped at what is left, so a game never overruns its budget by
+    more than one search's worth of engine overhead. With a `parent`, e.g. the budget of
+    the whole request, searches are capped by what is left of either, and charged to both.
+    The clock starts when a search first consults the budget, not when it is created, so
+    a request budget built ahead of the run does not pay for fetching the games.
+    """
+
+    def __init__(
+        self,
+        max_nodes: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        parent: Optional["SearchBudget"] = None
+    ) -> None:
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.parent = parent
+        self.nodes = 0
+        self.searches = 0
+        self._started: Optional[float] = None
+        # Games of one request are analysed concurrently and charge the same parent
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        if self._started is None:
+            with self._lock:
+                if self._started is None:
+                    self._started = time.perf_counter()
+        return time.perf_counter() - self._started
+
+    @property
+    def exhausted(self) -> bool:
+        if self.parent is not None and self.parent.exhausted:
+            return True
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        return self.max_seconds is not None and self.elapsed >= self.max_seconds
+
+    def remaining(self) -> tuple[Optional[int], Optional[float]]:
+        """Nodes and seconds left, of this budget or its parent whichever is less; None if unlimited."""
+        nodes = self.max_nodes - self.nodes if self.max_nodes is not None else None
+        seconds = self.max_seconds - self.elapsed if self.max_seconds is not None else None
+        if self.parent is not None:
+            parent_nodes, parent_seconds = self.parent.remaining()
+            nodes = _least(nodes, parent_nodes)
+            seconds = _least(seconds, parent_seconds)
+        return nodes, seconds
+
+    def limit(self, depth: int) -> chess.engine.Limit:
+        """A search limit of `depth`, cut short by whatever remains of the budget."""
+        nodes, seconds = self.remaining()
+        return chess.engine.Limit(
+            depth=depth,
+            nodes=max(1, nodes) if nodes is not None else None,
+            time=max(0.01, seconds) if seconds is not None else None,
+        )
+
+    def charge(self, info: dict[str, Any]) -> None:
+        with self._lock:
+            self.searches += 1
+            self.nodes += info.get("nodes", 0)
+        if self.parent is not None:
+            self.parent.charge(info)
+
+
+class DepthSchedule:
+    """
+    How deep each position of a game is worth searching, so the engine time goes where
+    mistakes can be found:
+
+    - the first `opening_plies` moves are treated as book and not searched at all; their
+      positions are only taken from the evaluation cache
+    - once the evaluation before and after a move is past `decisive_cp` for the same side,
+      the game is decided and the move gets at most `decisive_depth`
+    - a move other than the one a shallow search preferred gets `verify_extra_depth` more,
+      to settle whether it really was a mistake
+
+    The defaults change nothing: every position gets the depth it is asked for.
+    """
+
+    def __init__(
+        self,
+        opening_plies: int = 0,
+        decisive_cp: Optional[float] = None,
+        decisive_depth: int = 8,
+        verify_extra_depth: int = 0
+    ) -> None:
+        self.opening_plies = opening_plies
+        self.decisive_cp = decisive_cp
+        self.decisive_depth = decisive_depth
+        self.verify_extra_depth = verify_extra_depth
+
+    @classmethod
+    def from_config(cls, budget_config: dict) -> "DepthSchedule":
+        return cls(
+            opening_plies=budget_config.get("opening_plies", 0),
+            decisive_cp=budget_config.get("decisive_cp"),
+            decisive_depth=budget_config.get("decisive_depth", 8),
+            verify_extra_depth=budget_config.get("verify_extra_depth", 0),
+        )
+
+    def in_book(self, ply: int) -> bool:
+        return ply < self.opening_plies
+
+    def is_decisive(self, *evals_cp: Optional[float]) -> bool:
+        """Whether every known evaluation (white's point of view) is past `decisive_cp` for the same side."""
+        known = [value for value in evals_cp if value is not None and not math.isnan(value)]
+        if self.decisive_cp is None or not known:
+            return False
+        return all(value >= self.decisive_cp for value in known) or all(value <= -self.decisive_cp for value in known)
+
+    def depth_for(
+        self,
+        depth: int,
+        ply: int,
+        eval_before_cp: Optional[float] = None,
+        eval_after_cp: Optional[float] = None,
+        played: Optional[str] = None,
+        shallow_best: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        The depth to search move `ply` at instead of `depth`, or None for a book move that is
+        not searched. Evaluations are white's; what is not known yet is left out.
+        """
+        if self.in_book(ply):
+            return None
+        if self.is_decisive(eval_before_cp, eval_after_cp):
+            return min(depth, self.decisive_depth)
+        if self.verify_extra_depth and played is not None and shallow_best is not None and played != shallow_best:
+            return depth + self.verify_extra_depth
+        return depth
+
+
+def _least(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    return a if b is None else min(a, b)
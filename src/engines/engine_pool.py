@@ -0,0 +1,166 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+import chess.engine
+
+T = TypeVar("T")
+
+
+class EnginePool:
+    """
+    A fixed-size pool of long-lived UCI engine processes.
+
+    Engines are started once and lent out to one caller at a time. Work submitted with
+    `submit`/`map` is queued on a thread pool with one worker per engine, so a batch of
+    games keeps every engine busy. An engine that fails its health check, dies in the
+    middle of a search or stops answering is replaced and the work is retried once; an
+    EngineError from a bad request (an illegal position, an unknown option) goes straight
+    to the caller and the engine stays in the pool. An engine that cannot be started keeps
+    its slot empty, and the next caller to take the slot starts it again.
+    """
+
+    def __init__(
+        self,
+        engine_path: str,
+        size: Optional[int] = None,
+        threads: int = 1,
+        hash_mb: int = 16,
+        acquire_timeout: Optional[float] = 600,
+    ) -> None:
+        self.engine_path = engine_path
+        self.threads = max(1, threads)
+        self.hash_mb = hash_mb
+        # Every engine gets `threads` search threads, so size the pool to fill the cores.
+        self.size = size or max(1, (os.cpu_count() or 1) // self.threads)
+        self.acquire_timeout = acquire_timeout
+
+        # None is a slot whose engine still has to be started
+        self._idle: queue.Queue[Optional[chess.engine.SimpleEngine]] = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="engine")
+        self._lock = threading.Lock()
+
+        self.restarts = 0
+        self._positions = 0
+        self._active = 0
+        self._busy_since = 0.0
+        self._busy_seconds = 0.0
+
+        try:
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+        except BaseException:
+            # Don't leave the engines started so far, or the executor, behind
+            self.close()
+            raise
+
+    def _spawn(self) -> chess.engine.SimpleEngine:
+        engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        options = {"Threads": self.threads, "Hash": self.hash_mb}
+        engine.configure({name: value for name, value in options.items() if name in engine.options})
+        return engine
+
+    def _is_healthy(self, engine: chess.engine.SimpleEngine) -> bool:
+        try:
+            engine.ping()
+            return True
+        except (chess.engine.EngineError, chess.engine.EngineTerminatedError, TimeoutError):
+            return False
+
+    def _replace(self, engine: Optional[chess.engine.SimpleEngine]) -> chess.engine.SimpleEngine:
+        if engine is not None:
+            try:
+                engine.close()
+            except Exception:
+                pass
+        with self._lock:
+            self.restarts += 1
+        return self._spawn()
+
+    def _acquire(self) -> chess.engine.SimpleEngine:
+        try:
+            engine = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No engine became free within {self.acquire_timeout}s") from None
+        if engine is None or not self._is_healthy(engine):
+            try:
+                engine = self._replace(engine)
+            except Exception:
+                self._idle.put(None)  # Keep the slot; its next user tries to start an engine again
+                raise
+        with self._lock:
+            if self._active == 0:
+                self._busy_since = time.perf_counter()
+            self._active += 1
+        return engine
+
+    def _release(self, engine: Optional[chess.engine.SimpleEngine]) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._busy_seconds += time.perf_counter() - self._busy_since
+        self._idle.put(engine)
+
+    def run(self, fn: Callable[[chess.engine.SimpleEngine], T]) -> T:
+        """
+        Run `fn` with exclusive use of one engine, restarting it once if it crashes or times
+        out. An EngineError means the request was bad, not the engine, and is raised as is.
+        """
+        engine = self._acquire()
+        try:
+            try:
+                return fn(engine)
+            except (chess.engine.EngineTerminatedError, TimeoutError):
+                # If no engine can be started, the slot goes back empty rather than with the dead one
+                crashed, engine = engine, None
+                engine = self._replace(crashed)
+                return fn(engine)
+        finally:
+            self._release(engine)
+
+    def submit(self, fn: Callable[[chess.engine.SimpleEngine], T]) -> Future:
+        """Queue `fn` to run on the next free engine."""
+        return self._executor.submit(self.run, fn)
+
+    def map(self, fn: Callable[[chess.engine.SimpleEngine, T], object], items: Iterable[T]) -> List[object]:
+        """Apply `fn(engine, item)` to every item concurrently, keeping the input order."""
+        futures = [self.submit(lambda engine, item=item: fn(engine, item)) for item in items]
+        return [future.result() for future in futures]
+
+    def record_positions(self, count: int) -> None:
+        with self._lock:
+            self._positions += count
+
+    @property
+    def positions_per_second(self) -> float:
+        """Positions evaluated per second of wall time during which the pool was busy."""
+        with self._lock:
+            busy = self._busy_seconds
+            if self._active:
+                busy += time.perf_counter() - self._busy_since
+            return self._positions / busy if busy > 0 else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": self.size,
+            "positions": self._positions,
+            "restarts": self.restarts,
+            "positions_per_second": self.positions_per_second,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        while not self._idle.empty():
+            engine = self._idle.get_nowait()
+            if engine is None:
+                continue
+            try:
+                engine.quit()
+            except Exception:
+                pass
+
+    def __repr__(self) -> str:
+        return f"<EnginePool {self.engine_path} size={self.size} threads={self.threads} hash={self.hash_mb}MB>"
@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from utils.metrics import EVAL_CACHE_LOOKUPS
+
+
+class CachedEvaluation(NamedTuple):
+    depth: int
+    score_cp: Optional[float]  # from white's point of view
+    best_move: Optional[str]  # UCI
+
+
+def normalize_fen(fen: str) -> str:
+    """
+    Drop the halfmove clock and fullmove number so transpositions share one key.
+    """
+    return " ".join(fen.split()[:4])
+
+
+class EvaluationCache:
+    """
+    Two-tier cache of engine evaluations keyed by normalized FEN.
+
+    Lookups go to an in-memory LRU first and fall back to an optional SQLite file that
+    survives restarts. A stored result answers any request of equal or lower depth, and
+    a deeper result always replaces a shallower one.
+    """
+
+    def __init__(self, max_entries: int = 100_000, db_path: Optional[str] = None, commit_every: int = 256) -> None:
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self._memory: OrderedDict[str, CachedEvaluation] = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "fen TEXT PRIMARY KEY, depth INTEGER NOT NULL, score_cp REAL, best_move TEXT)"
+            )
+
+    @classmethod
+    def from_config(cls, cache_config: dict) -> "EvaluationCache":
+        return cls(
+            max_entries=cache_config.get("max_entries", 100_000),
+            db_path=cache_config.get("path"),
+        )
+
+    def get(self, fen: str, depth: int) -> Optional[CachedEvaluation]:
+        key = normalize_fen(fen)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry.depth >= depth:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                EVAL_CACHE_LOOKUPS.inc(result="memory")
+                return entry
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT depth, score_cp, best_move FROM evaluations WHERE fen = ?", (key,)
+                ).fetchone()
+                if row is not None and row[0] >= depth:
+                    entry = CachedEvaluation(*row)
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    EVAL_CACHE_LOOKUPS.inc(result="disk")
+                    return entry
+
+            self.misses += 1
+            EVAL_CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+    def put(self, fen: str, depth: int, score_cp: Optional[float], best_move: Optional[str] = None) -> None:
+        key = normalize_fen(fen)
+        entry = CachedEvaluation(depth, score_cp, best_move)
+        with self._lock:
+            current = self._memory.get(key)
+            if current is not None and current.depth > depth:
+                return
+            self._remember(key, entry)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO evaluations (fen, depth, score_cp, best_move) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(fen) DO UPDATE SET depth = excluded.depth, score_cp = excluded.score_cp, "
+                    "best_move = excluded.best_move WHERE excluded.depth >= evaluations.depth",
+                    (key, depth, score_cp, best_move),
+                )
+                self._pending_writes += 1
+                if self._pending_writes >= self.commit_every:
+                    self._db.commit()
+                    self._pending_writes = 0
+
+    def _remember(self, key: str, entry: CachedEvaluation) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
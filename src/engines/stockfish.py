@@ -1,18 +1,198 @@
-from stockfish import Stockfish
+import chess
+import chess.engine
 import chess.pgn
+import time
+from concurrent.futures import Future
 from io import StringIO
-from typing import List, Tuple, Optional
+from typing import Iterable, List, Tuple, Optional, Union
+
+from common.evaluation import MATE_SCORE_CP, score_to_cp
+from engines.budget import DepthSchedule, SearchBudget
+from engines.engine_pool import EnginePool
+from engines.eval_cache import EvaluationCache
+from utils.metrics import record_search
+
 
 class StockfishWrapper:
-    def __init__(self, path_to_engine: str, depth: int = 15, threads: int = 1):
-        self.engine = Stockfish(path=path_to_engine, depth=depth, parameters={"Threads": threads})
+    def __init__(
+        self,
+        path_to_engine: str,
+        depth: int = 15,
+        threads: int = 1,
+        hash_mb: int = 16,
+        pool_size: Optional[int] = None,
+        cache: Optional[EvaluationCache] = None,
+        acquire_timeout: Optional[float] = 600,
+    ):
+        self.depth = depth
+        self.cache = cache
+        self.pool = EnginePool(
+            path_to_engine, size=pool_size, threads=threads, hash_mb=hash_mb, acquire_timeout=acquire_timeout
+        )
+
+    @classmethod
+    def from_config(cls, engine_config: dict, cache: Optional[EvaluationCache] = None) -> "StockfishWrapper":
+        """An engine for the `engine` config. The `cache` stays its creator's to close."""
+        return cls(
+            path_to_engine=engine_config["path"],
+            depth=engine_config.get("depth", 15),
+            threads=engine_config.get("threads", 1),
+            hash_mb=engine_config.get("hash", 16),
+            pool_size=engine_config.get("pool_size"),
+            cache=cache,
+            acquire_timeout=engine_config.get("acquire_timeout", 600),
+        )
 
     def evaluate_game(self, pgn_text: str) -> List[Tuple[str, Optional[float]]]:
         """
         Evaluate PGN game and return (move_san, evaluation_in_centipawns)
         """
-        pass
+        moves_san, starting_fen = self._read_pgn(pgn_text)
+        return self.evaluate_moves(moves_san, starting_fen)
+
+    def evaluate_moves(
+        self,
+        moves_san: List[str],
+        starting_fen: str = chess.STARTING_FEN,
+        depth: Optional[int] = None
+    ) -> List[Tuple[str, Optional[float]]]:
+        """
+        Evaluate the position after every move of a game on a single engine.
+        Evaluations are in centipawns from white's point of view. `depth` overrides the
+        configured depth, e.g. for a quick shallow pass.
+        """
+        return self._without_best(self.evaluate_line(moves_san, starting_fen, depth))
+
+    def evaluate_line(
+        self,
+        moves_san: List[str],
+        starting_fen: str = chess.STARTING_FEN,
+        depth: Optional[int] = None,
+        schedule: Optional[DepthSchedule] = None,
+        budget: Optional[SearchBudget] = None
+    ) -> List[Tuple[str, Optional[float], Optional[str], Optional[int]]]:
+        """
+        Like `evaluate_moves`, with the engine's best reply (UCI) to every position and the
+        depth its evaluation was actually searched to (None if not searched) as well.
+        `schedule` adapts the depth of each search, and positions it does not search are only
+        taken from the cache. Once `budget` runs out, the remaining positions are left unevaluated.
+        """
+        return self.pool.run(lambda engine: self._evaluate_line(engine, moves_san, starting_fen, depth, schedule, budget))
+
+    def evaluate_games(self, games: Iterable[Union[str, List[str]]]) -> List[List[Tuple[str, Optional[float]]]]:
+        """
+        Evaluate a batch of games concurrently across the engine pool.
+        Each game is either PGN text or a list of SAN moves; results keep the input order.
+        """
+        futures = []
+        for game in games:
+            moves_san, starting_fen = self._read_pgn(game) if isinstance(game, str) else (game, chess.STARTING_FEN)
+            futures.append(self.submit_moves(moves_san, starting_fen))
+        return [future.result() for future in futures]
+
+    def submit_moves(self, moves_san: List[str], starting_fen: str = chess.STARTING_FEN) -> Future:
+        """Queue one game on the pool; the future resolves to the `evaluate_moves` result."""
+        return self.pool.submit(lambda engine: self._without_best(self._evaluate_line(engine, moves_san, starting_fen)))
+
+    def evaluate_position(self, fen: str, multipv: int = 1) -> List[Tuple[str, Optional[float]]]:
+        """
+        Return the `multipv` best moves for a position as (move_san, evaluation_in_centipawns).
+        """
+        board = chess.Board(fen)
+        if multipv == 1 and self.cache is not None:
+            cached = self.cache.get(fen, self.depth)
+            if cached is not None and cached.best_move is not None:
+                return [(board.san(chess.Move.from_uci(cached.best_move)), cached.score_cp)]
+
+        def search(engine: chess.engine.SimpleEngine) -> List[Tuple[str, Optional[float]]]:
+            began = time.perf_counter()
+            infos = engine.analyse(board, chess.engine.Limit(depth=self.depth), multipv=multipv)
+            record_search("position", time.perf_counter() - began, infos)
+            self.pool.record_positions(1)
+            if self.cache is not None and infos and infos[0].get("pv"):
+                self.cache.put(fen, self.depth, self._score_to_cp(infos[0]["score"]), infos[0]["pv"][0].uci())
+            return [(board.san(info["pv"][0]), self._score_to_cp(info["score"])) for info in infos if info.get("pv")]
+
+        return self.pool.run(search)
+
+    def _read_pgn(self, pgn_text: str) -> Tuple[List[str], str]:
+        game = chess.pgn.read_game(StringIO(pgn_text))
+        if game is None:
+            return [], chess.STARTING_FEN
+        board = game.board()
+        moves_san = []
+        for move in game.mainline_moves():
+            moves_san.append(board.san(move))
+            board.push(move)
+        return moves_san, game.board().fen()
+
+    def _evaluate_line(
+        self,
+        engine: chess.engine.SimpleEngine,
+        moves_san: List[str],
+        starting_fen: str,
+        depth: Optional[int] = None,
+        schedule: Optional[DepthSchedule] = None,
+        budget: Optional[SearchBudget] = None
+    ) -> List[Tuple[str, Optional[float], Optional[str], Optional[int]]]:
+        depth = depth or self.depth
+        board = chess.Board(starting_fen)
+        evaluations = []
+        searched = 0
+        previous_cp = None
+        for ply, san in enumerate(moves_san):
+            board.push_san(san)
+            if board.is_game_over():
+                evaluations.append((san, self._terminal_cp(board), None, None))
+                continue
+
+            # This position is the one before the next move, which the schedule judges it by
+            search_depth = schedule.depth_for(depth, ply + 1, previous_cp) if schedule is not None else depth
+            if budget is not None and budget.exhausted:
+                search_depth = None
+            fen = board.fen()
+            cached = self.cache.get(fen, search_depth or 1) if self.cache is not None else None
+            if cached is not None:
+                previous_cp = cached.score_cp
+                evaluations.append((san, cached.score_cp, cached.best_move, cached.depth))
+                continue
+            if search_depth is None:
+                previous_cp = None
+                evaluations.append((san, None, None, None))
+                continue
+
+            limit = budget.limit(search_depth) if budget is not None else chess.engine.Limit(depth=search_depth)
+            began = time.perf_counter()
+            info = engine.analyse(board, limit)
+            record_search("evaluate", time.perf_counter() - began, info)
+            if budget is not None:
+                budget.charge(info)
+            score_cp = self._score_to_cp(info.get("score"))
+            pv = info.get("pv")
+            best_move = pv[0].uci() if pv else None
+            searched += 1
+            # A search stopped by the budget only counts for the depth it reached
+            reached = min(search_depth, info.get("depth", search_depth))
+            if self.cache is not None and score_cp is not None:
+                self.cache.put(fen, reached, score_cp, best_move)
+            previous_cp = score_cp
+            evaluations.append((san, score_cp, best_move, reached if score_cp is not None else None))
+        self.pool.record_positions(searched)
+        return evaluations
+
+    def _without_best(self, line: List[Tuple[str, Optional[float], Optional[str], Optional[int]]]) -> List[Tuple[str, Optional[float]]]:
+        return [(san, score_cp) for san, score_cp, *_ in line]
+
+    def _score_to_cp(self, score: Optional[chess.engine.PovScore]) -> Optional[float]:
+        if score is None:
+            return None
+        return score_to_cp(score.white())
+
+    def _terminal_cp(self, board: chess.Board) -> float:
+        if board.is_checkmate():
+            return -MATE_SCORE_CP if board.turn == chess.WHITE else MATE_SCORE_CP
+        return 0.0
 
-    def evaluate_position(self, fen: str) ->  List[Tuple[str, Optional[float]]]:
-        pass
-    
\ No newline at end of file
+    def close(self) -> None:
+        # The cache may be shared with other engines and mistake identifiers, so it is left open
+        self.pool.close()
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from utils.metrics import JOBS
+
+ProgressCallback = Callable[[float, str], None]
+
+
+class JobStore:
+    """
+    SQLite record of analysis jobs: status, progress and the JSON result.
+    Stored on disk so every server worker can answer status polls for any job.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                cache_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (cache_key, created_at);
+            """
+        )
+
+    def create(self, job_id: str, cache_key: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, cache_key, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, cache_key, time.time()),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def find_reusable(self, cache_key: str, ttl_seconds: float, timeout_seconds: float) -> Optional[str]:
+        """
+        A job for the same key that finished within the TTL, or is still in progress.
+        In-progress jobs older than the timeout are ignored; their worker most likely died.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE cache_key = ? AND ("
+                "(status IN ('queued', 'running') AND created_at >= ?) OR (status = 'done' AND finished_at >= ?)"
+                ") ORDER BY created_at DESC LIMIT 1",
+                (cache_key, now - timeout_seconds, now - ttl_seconds),
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge(self, older_than_seconds: float) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - older_than_seconds,),
+            )
+
+
+class JobQueue:
+    """
+    Runs analysis jobs on a worker pool and records their progress in a JobStore.
+
+    Submitting work for a key that already has a queued, running or recently finished
+    job returns that job instead of starting a new one.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = 2,
+        result_ttl_seconds: float = 600,
+        job_timeout_seconds: float = 1800
+    ) -> None:
+        self.store = store
+        self.result_ttl_seconds = result_ttl_seconds
+        self.job_timeout_seconds = job_timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._submit_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, jobs_config: dict) -> "JobQueue":
+        store = JobStore(jobs_config.get("path", "data/jobs.sqlite"))
+        return cls(
+            store,
+            workers=jobs_config.get("workers", 2),
+            result_ttl_seconds=jobs_config.get("result_ttl_seconds", 600),
+            job_timeout_seconds=jobs_config.get("job_timeout_seconds", 1800),
+        )
+
+    def submit(self, cache_key: str, fn: Callable[[ProgressCallback], Any]) -> str:
+        """Queue `fn(progress)` and return the job id. `fn` must return a JSON-serializable result."""
+        with self._submit_lock:
+            job_id = self.store.find_reusable(cache_key, self.result_ttl_seconds, self.job_timeout_seconds)
+            if job_id is not None:
+                return job_id
+            job_id = uuid.uuid4().hex
+            self.store.create(job_id, cache_key)
+        JOBS.inc(status="queued")
+        self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[[ProgressCallback], Any]) -> None:
+        self.store.update(job_id, status="running")
+        JOBS.dec(status="queued")
+        JOBS.inc(status="running")
+
+        def progress(fraction: float, message: str) -> None:
+            self.store.update(job_id, progress=fraction, message=message)
+
+        try:
+            result = fn(progress)
+            self.store.update(
+                job_id, status="done", progress=1.0, finished_at=time.time(), result=json.dumps(result, default=str)
+            )
+        except Exception as e:
+            self.store.update(job_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            JOBS.dec(status="running")
+        # Keep finished jobs for a day (or the TTL, if longer) so clients can still fetch them
+        self.store.purge(older_than_seconds=max(self.result_ttl_seconds, 24 * 3600))
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -1,12 +1,15 @@
+import json
 from pathlib import Path
 
 from data.helper_functions import load_config
 from ml.dispatcher_app import DispatcherApp
 from utils.logger import setup_logger
+from utils.metrics import summary
 
 # Step 1: Load config once
 CONFIG_PATH = "config.yaml"
 config = load_config(CONFIG_PATH)
+logger = setup_logger(config.get("paths", {}).get("logs", "logs/chessmate.log"))
 
 # Step 2: Set user/platform/game details
 username = "Hikaru"
@@ -17,4 +20,5 @@ number_of_games = 25
 dispatcher_app = DispatcherApp.start(config)
 dispatcher_app.analyse(username, platform_name, number_of_games=number_of_games)
 
-print("done")
+# Step 4: What the run spent its time on
+logger.info(f"Run metrics:\n{json.dumps(summary(), indent=2)}")
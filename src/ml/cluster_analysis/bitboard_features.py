@@ -0,0 +1,213 @@
+# bitboard_features.py
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.positions import unpack_bitboards
+
+PIECES = "PNBRQKpnbrqk"
+PIECE_VALUES = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9}
+
+# Reorders the FEN's rank-8-first squares to a1 = 0 ... h8 = 63
+_FEN_TO_SQUARE = np.array([(7 - i // 8) * 8 + i % 8 for i in range(64)]).argsort()
+
+FILE_A = np.uint64(0x0101010101010101)
+FILE_H = np.uint64(0x8080808080808080)
+NOT_A = ~FILE_A
+NOT_H = ~FILE_H
+NOT_AB = ~(FILE_A | (FILE_A << np.uint64(1)))
+NOT_GH = ~(FILE_H | (FILE_H >> np.uint64(1)))
+RANK_3 = np.uint64(0x0000000000FF0000)
+RANK_6 = np.uint64(0x0000FF0000000000)
+
+# (shift, mask applied to the destination square)
+KING_STEPS = [(8, ~np.uint64(0)), (-8, ~np.uint64(0)), (1, NOT_A), (-1, NOT_H), (9, NOT_A), (7, NOT_H), (-7, NOT_A), (-9, NOT_H)]
+KNIGHT_STEPS = [(17, NOT_A), (15, NOT_H), (10, NOT_AB), (6, NOT_GH), (-17, NOT_H), (-15, NOT_A), (-10, NOT_GH), (-6, NOT_AB)]
+ROOK_STEPS = KING_STEPS[:4]
+BISHOP_STEPS = KING_STEPS[4:]
+WHITE_PAWN_CAPTURES = [(9, NOT_A), (7, NOT_H)]
+BLACK_PAWN_CAPTURES = [(-7, NOT_A), (-9, NOT_H)]
+
+
+def _shield_masks(ranks: Tuple[int, int]) -> np.ndarray:
+    """Pawn shield per king file: files file-1..file+1 on the given ranks."""
+    masks = np.zeros(8, dtype=np.uint64)
+    for king_file in range(8):
+        for rank in ranks:
+            for file in range(max(0, king_file - 1), min(7, king_file + 1) + 1):
+                masks[king_file] |= np.uint64(1) << np.uint64(rank * 8 + file)
+    return masks
+
+
+# Same zones as ClusterAnalyser.extract_features_from_fen: own 2nd/3rd rank
+WHITE_SHIELDS = _shield_masks((1, 2))
+BLACK_SHIELDS = _shield_masks((6, 5))
+
+
+def popcount(bitboards: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitboards).astype(np.int32)
+    as_bytes = np.ascontiguousarray(bitboards).view(np.uint8).reshape(*bitboards.shape, 8)
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1, dtype=np.int32)
+
+
+def _shift(bitboards: np.ndarray, amount: int) -> np.ndarray:
+    if amount > 0:
+        return bitboards << np.uint64(amount)
+    return bitboards >> np.uint64(-amount)
+
+
+def _slider_attacks(sliders: np.ndarray, empty: np.ndarray, amount: int, mask: np.uint64) -> np.ndarray:
+    """Kogge-Stone occluded fill: every square a slider set attacks in one direction."""
+    propagator = empty & mask
+    generator = sliders
+    for step in (1, 2, 4):
+        generator = generator | (propagator & _shift(generator, amount * step))
+        propagator = propagator & _shift(propagator, amount * step)
+    return _shift(generator, amount) & mask
+
+
+def fens_to_bitboards(fens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses FENs into a (N, 12) uint64 array of piece bitboards, ordered as PIECES,
+    plus a boolean array that is True where white is to move.
+    """
+    placements = []
+    white_to_move = np.empty(len(fens), dtype=bool)
+    for i, fen in enumerate(fens):
+        fields = fen.split(" ", 2)
+        placements.append(fields[0])
+        white_to_move[i] = len(fields) < 2 or fields[1] == "w"
+
+    # Expand the whole batch at once: one C-level pass per replacement instead of per FEN
+    board = "".join(placements).replace("/", "")
+    for empty_run in range(8, 1, -1):
+        board = board.replace(str(empty_run), "." * empty_run)
+    board = board.replace("1", ".")
+
+    squares = np.frombuffer(board.encode("ascii"), dtype=np.uint8)
+    if len(squares) != 64 * len(fens):
+        raise ValueError("Invalid FEN placement in batch")
+    squares = squares.reshape(len(fens), 64)[:, _FEN_TO_SQUARE]
+
+    bitboards = np.empty((len(fens), len(PIECES)), dtype=np.uint64)
+    for index, piece in enumerate(PIECES):
+        # Every position is exactly 64 bits, so packing the flat mask yields one uint64 per row
+        bitboards[:, index] = np.packbits((squares == ord(piece)).ravel(), bitorder="little").view("<u8")
+    return bitboards, white_to_move
+
+
+def _king_safety(pawns: np.ndarray, kings: np.ndarray, shields: np.ndarray) -> np.ndarray:
+    has_king = kings != 0
+    # A single set bit is an exact power of two, so log2 recovers the square
+    king_square = np.zeros(len(kings), dtype=np.int64)
+    king_square[has_king] = np.log2(kings[has_king].astype(np.float64)).astype(np.int64)
+    zone = np.where(has_king, shields[king_square % 8], np.uint64(0))
+    return popcount(pawns & zone)
+
+
+def _pseudo_mobility(bitboards: np.ndarray, white_to_move: np.ndarray) -> np.ndarray:
+    """
+    Approximate pseudo-legal move count for the side to move. Per direction the shifted
+    or filled sets of different pieces never overlap, so popcounts add up to exact move
+    counts, except that castling and en passant are left out and a promotion counts as
+    one move rather than four. It is therefore at most python-chess's
+    `pseudo_legal_moves.count()`, and equal to it in positions without those moves.
+    Pins and checks are not considered.
+    """
+    white = np.bitwise_or.reduce(bitboards[:, :6], axis=1)
+    black = np.bitwise_or.reduce(bitboards[:, 6:], axis=1)
+    own = np.where(white_to_move, white, black)
+    enemy = np.where(white_to_move, black, white)
+    empty = ~(white | black)
+    targets = ~own
+
+    def side(white_index: int) -> np.ndarray:
+        return np.where(white_to_move, bitboards[:, white_index], bitboards[:, white_index + 6])
+
+    pawns, knights, bishops, rooks, queens, king = (side(i) for i in range(6))
+    mobility = np.zeros(len(bitboards), dtype=np.int32)
+
+    for amount, mask in KNIGHT_STEPS:
+        mobility += popcount(_shift(knights, amount) & mask & targets)
+    for amount, mask in KING_STEPS:
+        mobility += popcount(_shift(king, amount) & mask & targets)
+    for amount, mask in ROOK_STEPS:
+        mobility += popcount(_slider_attacks(rooks | queens, empty, amount, mask) & targets)
+    for amount, mask in BISHOP_STEPS:
+        mobility += popcount(_slider_attacks(bishops | queens, empty, amount, mask) & targets)
+
+    # Pawns move towards the opponent: up the board for white, down for black
+    single = np.where(white_to_move, (pawns << np.uint64(8)) & empty, (pawns >> np.uint64(8)) & empty)
+    double = np.where(
+        white_to_move,
+        ((single & RANK_3) << np.uint64(8)) & empty,
+        ((single & RANK_6) >> np.uint64(8)) & empty,
+    )
+    captures = np.zeros(len(bitboards), dtype=np.int32)
+    for (white_amount, white_mask), (black_amount, black_mask) in zip(WHITE_PAWN_CAPTURES, BLACK_PAWN_CAPTURES):
+        captures += popcount(np.where(
+            white_to_move,
+            _shift(pawns, white_amount) & white_mask & enemy,
+            _shift(pawns, black_amount) & black_mask & enemy,
+        ))
+    return mobility + popcount(single) + popcount(double) + captures
+
+
+def _legal_move_counts(fens: Sequence[str]) -> list[int]:
+    import chess
+
+    return [chess.Board(fen).legal_moves.count() for fen in fens]
+
+
+def exact_mobility(fens: Sequence[str], processes: Optional[int] = None, chunk_size: int = 10_000) -> np.ndarray:
+    """Exact legal-move counts through python-chess, spread over a process pool."""
+    chunks = [fens[i:i + chunk_size] for i in range(0, len(fens), chunk_size)]
+    if len(chunks) <= 1:
+        return np.asarray(_legal_move_counts(fens), dtype=np.int32)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        counts = [count for chunk in executor.map(_legal_move_counts, chunks) for count in chunk]
+    return np.asarray(counts, dtype=np.int32)
+
+
+def extract_features_batch(
+    fens: Sequence[str],
+    exact: bool = False,
+    processes: Optional[int] = None,
+    boards: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    Material, king safety and mobility for many positions at once, computed on
+    bitboards. Packed `boards` of the same positions (see common.positions) save
+    parsing the FENs.
+
+    By default mobility is the pseudo-legal proxy of `_pseudo_mobility`, not the
+    legal-move count `ClusterAnalyser.extract_features_from_fen` gives, so it counts
+    moves into check and illegal pinned-piece moves but not castling, en passant or
+    under-promotions. With `exact` it is the legal-move count again, at python-chess speed.
+    """
+    fens = list(fens)
+    if not fens:
+        return pd.DataFrame({"material": [], "king_safety": [], "mobility": []})
+
+    if boards is not None:
+        bitboards, white_to_move = unpack_bitboards(boards)
+    else:
+        bitboards, white_to_move = fens_to_bitboards(fens)
+    counts = popcount(bitboards)
+
+    material = np.zeros(len(fens), dtype=np.int32)
+    for index, piece in enumerate(PIECES[:5]):
+        material += (counts[:, index] - counts[:, index + 6]) * PIECE_VALUES[piece]
+
+    king_safety = (
+        _king_safety(bitboards[:, 0], bitboards[:, 5], WHITE_SHIELDS)
+        - _king_safety(bitboards[:, 6], bitboards[:, 11], BLACK_SHIELDS)
+    )
+
+    mobility = exact_mobility(fens, processes) if exact else _pseudo_mobility(bitboards, white_to_move)
+
+    return pd.DataFrame({"material": material, "king_safety": king_safety, "mobility": mobility})
@@ -2,12 +2,18 @@
 
 import chess
 import chess.engine
+import joblib
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
-from sklearn.cluster import KMeans
+from pathlib import Path
+from typing import List, Dict, Any, Iterable
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 
+from common.positions import PACKED_BOARD_BYTES, packed_boards
+from ml.cluster_analysis.bitboard_features import extract_features_batch
+from utils.metrics import CLUSTER_SECONDS
+
 
 class ClusterAnalyser:
     """
@@ -31,10 +37,25 @@ class ClusterAnalyser:
         chess.QUEEN: 9
     }
 
-    def __init__(self, n_clusters: int = 5, random_state: int = 42) -> None:
+    FEATURE_COLS = ["material", "king_safety", "mobility", "time_used", "eval_cp", "cp_loss"]
+
+    def __init__(
+        self,
+        n_clusters: int = 5,
+        random_state: int = 42,
+        exact_mobility: bool = False,
+        incremental: bool = False,
+        batch_size: int = 4096
+    ) -> None:
         self.n_clusters = n_clusters
+        # Exact legal-move counts need python-chess per position; the default is a bitboard proxy
+        self.exact_mobility = exact_mobility
+        self.incremental = incremental
         self.scaler = StandardScaler()
-        self.model = KMeans(n_clusters=n_clusters, random_state=random_state)
+        if incremental:
+            self.model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size)
+        else:
+            self.model = KMeans(n_clusters=n_clusters, random_state=random_state)
         self.cluster_centers_: List[List[float]] = []
         self.features_used: List[str] = []
 
@@ -76,29 +97,80 @@ class ClusterAnalyser:
         }
 
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        extracted = df["fen"].apply(self.extract_features_from_fen)
-        feature_df = pd.DataFrame(extracted.tolist())
+        boards = None
+        if "board" in df and df["board"].map(len).eq(PACKED_BOARD_BYTES).all():
+            # Packed boards from the game replay; otherwise the FENs are parsed
+            boards = packed_boards(df["board"].tolist())
+        feature_df = extract_features_batch(df["fen"].tolist(), exact=self.exact_mobility, boards=boards)
         combined_df = pd.concat([df.reset_index(drop=True), feature_df], axis=1)
         return combined_df
 
     def fit(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_features = self.prepare_features(df)
+        with CLUSTER_SECONDS.time(operation="features"):
+            df_features = self.prepare_features(df)
 
         # Use only numerical features for clustering
-        feature_cols = ["material", "king_safety", "mobility", "time_used", "eval_cp", "cp_loss"]
-        self.features_used = feature_cols
+        self.features_used = self.FEATURE_COLS
 
-        X = df_features[feature_cols].fillna(0).values
-        X_scaled = self.scaler.fit_transform(X)
-        cluster_labels = self.model.fit_predict(X_scaled)
+        with CLUSTER_SECONDS.time(operation="fit"):
+            X = self._feature_matrix(df_features)
+            X_scaled = self.scaler.fit_transform(X)
+            cluster_labels = self.model.fit_predict(X_scaled)
 
         df_features["cluster"] = cluster_labels
         self.cluster_centers_ = self.model.cluster_centers_
 
         return df_features
 
+    def partial_fit(self, df: pd.DataFrame) -> "ClusterAnalyser":
+        """
+        Update the scaler and the MiniBatchKMeans model with one chunk of positions,
+        without revisiting earlier chunks. The first chunk needs at least n_clusters rows.
+        """
+        if not self.incremental:
+            raise ValueError("partial_fit requires ClusterAnalyser(incremental=True)")
+
+        self.features_used = self.FEATURE_COLS
+        with CLUSTER_SECONDS.time(operation="features"):
+            X = self._feature_matrix(self.prepare_features(df))
+        with CLUSTER_SECONDS.time(operation="partial_fit"):
+            self.scaler.partial_fit(X)
+            self.model.partial_fit(self.scaler.transform(X))
+        self.cluster_centers_ = self.model.cluster_centers_
+        return self
+
+    def fit_stream(self, chunks: Iterable[pd.DataFrame]) -> "ClusterAnalyser":
+        """Fit on a stream of DataFrame chunks, holding only one chunk in memory at a time."""
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Assign positions to the existing clusters without refitting."""
+        with CLUSTER_SECONDS.time(operation="features"):
+            df_features = self.prepare_features(df)
+        with CLUSTER_SECONDS.time(operation="predict"):
+            X_scaled = self.scaler.transform(self._feature_matrix(df_features))
+            df_features["cluster"] = self.model.predict(X_scaled)
+        return df_features
+
+    def _feature_matrix(self, df_features: pd.DataFrame) -> np.ndarray:
+        return df_features[self.FEATURE_COLS].fillna(0).values
+
+    def save(self, path: str) -> None:
+        """Persist the fitted scaler and model so later runs can predict without a refit."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ClusterAnalyser":
+        analyser = joblib.load(path)
+        if not isinstance(analyser, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}")
+        return analyser
+
     def describe_clusters(self) -> pd.DataFrame:
         """Return a DataFrame summarizing the cluster centers."""
         centers_scaled = self.cluster_centers_
         centers_original = self.scaler.inverse_transform(centers_scaled)
-        return pd.DataFrame(centers_original, columns=self.features_used)
\ No newline at end of file
+        return pd.DataFrame(centers_original, columns=self.features_used)
@@ -1,53 +1,593 @@
-from datetime import datetime
-from typing import Self, Optional
+import logging
+import queue
+import threading
+from contextlib import closing, nullcontext
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, Self, Optional
 
+from common.game import Game
+from common.move_table import MoveTable
+from data.game_store import Coverage, GameStore
 from data.helper_functions import load_class
+from engines.budget import DepthSchedule, SearchBudget
+from ml.game_analysis import GameAnalysis
+from ml.helper_functions.evaluation_drop_detector import EvaluationDropDetector
+from ml.pipeline import Pipeline, Stage, format_timings
 from platforms.platform_abc import PlatformWrapper
+from utils.profiling import RunProfiler
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    # scikit-learn and the engine modules are imported when `start`'s components are loaded
+    from engines.eval_cache import EvaluationCache
+    from engines.stockfish import StockfishWrapper
+    from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+    from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+
+logger = logging.getLogger("chessmate")
 
 class DispatcherApp:
-    def __init__(self, platforms: list[PlatformWrapper]):
+    def __init__(
+        self,
+        platforms: list[PlatformWrapper],
+        engine: Optional["StockfishWrapper"] = None,
+        game_store: Optional[GameStore] = None,
+        drop_detector: Optional[EvaluationDropDetector] = None,
+        mistake_identifiers: Optional[list["MistakeIdentifier"]] = None,
+        cluster_analyser: Optional["ClusterAnalyser"] = None,
+        cluster_model_path: Optional[str] = None,
+        pipeline_config: Optional[dict] = None,
+        tiered_config: Optional[dict] = None,
+        profiling_config: Optional[dict] = None,
+        budget_config: Optional[dict] = None,
+        platform_configs: Optional[list[dict]] = None,
+        component_config: Optional[dict] = None
+    ):
         self.platforms = platforms
+        self.engine = engine
+        self.game_store = game_store
+        if game_store is not None:
+            for platform in platforms:
+                platform.attach_game_store(game_store)
+
+        self.drop_detector = drop_detector or EvaluationDropDetector()
+        # Each identifier owns one engine process; classify workers borrow them one at a time
+        self.mistake_identifiers: Optional[queue.Queue] = None
+        if mistake_identifiers:
+            self.mistake_identifiers = queue.Queue()
+            for identifier in mistake_identifiers:
+                self.mistake_identifiers.put(identifier)
+        self.cluster_analyser = cluster_analyser
+        self.cluster_model_path = cluster_model_path
+        self._cluster_lock = threading.Lock()
+        self.pipeline_config = pipeline_config or {}
+        # Tiered mode: a shallow pass over every position, deep analysis only where the evaluation drops
+        self.tiered_config = tiered_config if tiered_config and tiered_config.get("enabled", False) else None
+        self.profiling_config = profiling_config or {}
+        # Engine time per request, and how it is spread over the positions of each game
+        self.budget_config = budget_config or {}
+        self.schedule = DepthSchedule.from_config(self.budget_config)
+        # Left for later by `start`: platforms by name, created on their first request, and the
+        # config of the engines and cluster model, loaded on the first run or by `warm_up`
+        self._platform_configs = {platform_cfg["name"]: platform_cfg for platform_cfg in platform_configs or []}
+        self._component_config = component_config
+        self._eval_cache: Optional["EvaluationCache"] = None  # created by `_load_components`
+        self._load_lock = threading.Lock()
 
     @classmethod
     def start(cls, config: dict) -> Self:
-        platforms_config = config.get("platforms", [])
-        platforms = []
+        """
+        A DispatcherApp for a config, built without importing or starting anything heavy:
+        platform wrappers are created on their first request, and the engines, mistake
+        identifiers and cluster model when the first analysis runs (or on `warm_up`).
+        """
+        game_store = None
+        game_store_config = config.get("game_store", {})
+        if game_store_config.get("enabled", False):
+            game_store = GameStore.from_config(game_store_config)
 
-        for platform_cfg in platforms_config:
-            if not platform_cfg.get("enabled", False):
-                continue
+        detector_config = config.get("drop_detector", {})
+        drop_detector = EvaluationDropDetector(
+            threshold_cp=detector_config.get("threshold_cp", 100),
+            mate_cp=detector_config.get("mate_cp", 1000),
+        )
 
-            class_path = platform_cfg["class"]
-            wrapper_cls = load_class(class_path)
-            platforms.append(wrapper_cls(platform_cfg))  # Pass full config
-        dispatcher_app = cls(platforms)
+        dispatcher_app = cls(
+            [],
+            game_store=game_store,
+            drop_detector=drop_detector,
+            pipeline_config=config.get("pipeline", {}),
+            tiered_config=config.get("mistake_identifier", {}).get("tiered"),
+            profiling_config={
+                # Profiles go next to the log file unless profiling.dir says otherwise
+                "dir": str(Path(config.get("paths", {}).get("logs", "logs/chessmate.log")).parent),
+                **config.get("profiling", {}),
+            },
+            budget_config=config.get("budget", {}),
+            platform_configs=[platform_cfg for platform_cfg in config.get("platforms", []) if platform_cfg.get("enabled", False)],
+            component_config=config,
+        )
         return dispatcher_app
-       
+
+    def warm_up(self) -> None:
+        """Loads everything `start` left for later, so the first request does not wait for it."""
+        self._load_components()
+        for platform_name in list(self._platform_configs):
+            self._find_platform_wrapper(platform_name)
+
+    def _load_components(self) -> None:
+        """Starts the engines and loads the cluster model from the config `start` kept, once."""
+        with self._load_lock:
+            config, self._component_config = self._component_config, None
+            if config is None:
+                return
+
+            # Shallow and deep searches share one evaluation cache, which is closed by `close`
+            engine_config = config.get("engine", {})
+            cache_config = engine_config.get("cache", {})
+            if cache_config.get("enabled", False):
+                from engines.eval_cache import EvaluationCache
+
+                self._eval_cache = EvaluationCache.from_config(cache_config)
+            cache = self._eval_cache
+            if engine_config.get("enabled", False):
+                engine_cls = load_class(engine_config.get("class", "engines.stockfish.StockfishWrapper"))
+                self.engine = engine_cls.from_config(engine_config, cache=cache)
+
+            identifier_config = config.get("mistake_identifier", {})
+            if identifier_config.get("enabled", False):
+                from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+
+                self.mistake_identifiers = queue.Queue()
+                for _ in range(identifier_config.get("instances", 1)):
+                    self.mistake_identifiers.put(
+                        MistakeIdentifier(identifier_config["path"], depth=identifier_config.get("depth", 18), cache=cache)
+                    )
+
+            cluster_config = config.get("clustering", {})
+            model_path = cluster_config.get("model_path")
+            if cluster_config.get("enabled", False):
+                from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+
+                if model_path and Path(model_path).exists():
+                    self.cluster_analyser = ClusterAnalyser.load(model_path)
+                else:
+                    self.cluster_analyser = ClusterAnalyser(
+                        n_clusters=cluster_config.get("n_clusters", 5),
+                        incremental=cluster_config.get("incremental", False),
+                    )
+                self.cluster_model_path = model_path
+
+    def close(self) -> None:
+        """Stops the engine processes and closes the evaluation cache they shared."""
+        if self.engine is not None:
+            self.engine.close()
+        if self.mistake_identifiers is not None:
+            while not self.mistake_identifiers.empty():
+                self.mistake_identifiers.get().close()
+        if self._eval_cache is not None:
+            self._eval_cache.close()
+            self._eval_cache = None
+
     def analyse(self,
             username: str,
             platform_name: str,
             start_dt_utc: Optional[datetime] = None,
             end_dt_utc: Optional[datetime] = None,
-            number_of_games: Optional[int] = None
-            ):
-        platform_wrapper = self._find_platform_wrapper(platform_name)
-        player = platform_wrapper.get_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games)
-    #     for pgn in pgns:
-    #         evaluated_pgn = stockfish_wrapper.evaluate_game(pgn)
-    #         evaluated_pgns[evaluated_pgn.id] = evaluated_pgn
-    #     clusters = cluster_analysis(evaluated_pgns)
-    #     mistakes = mistake_identifier(clusters)
-    #     biggest_impact_mistakes = ImpactFinder(mistakes)
-        games = player.get_all_games_df()
-        print(player)
+            number_of_games: Optional[int] = None,
+            progress: Optional[Callable[[float, str], None]] = None,
+            profile: Optional[bool] = None
+            ) -> "pd.DataFrame":
+        """
+        Runs the player's games through fetch, parse, evaluate, detect, classify and cluster
+        and returns every move with what the stages found, in the order the games were fetched.
+        The wall time of each stage is printed and kept in `df.attrs["stage_timings"]`. Games a
+        stage failed on are left out, listed in `df.attrs["failed_games"]` and named in the
+        final progress message.
+
+        With `profile` (by default `profiling.enabled`) the run is sampled by a RunProfiler,
+        and the paths of its flamegraph and hotspot files are kept in `df.attrs["profile"]`.
+        """
+        import pandas as pd
+
+        if profile is None:
+            profile = self.profiling_config.get("enabled", False)
+        profiler = RunProfiler.from_config(self.profiling_config, f"{platform_name}-{username}") if profile else nullcontext()
+
+        report = progress or (lambda fraction, message: None)
+        report(0.0, "Fetching games")
+        with profiler:
+            pipeline = self._build_pipeline(self._request_budget())
+            analyses = []
+            for analysis in pipeline.run(self._iter_games(platform_name, username, start_dt_utc, end_dt_utc, number_of_games)):
+                analyses.append(analysis)
+                if number_of_games:
+                    report(0.9 * min(1.0, len(analyses) / number_of_games), f"Analysed {len(analyses)} of {number_of_games} games")
+
+            report(0.9, "Preparing results")
+            analyses.sort(key=lambda analysis: analysis.index)
+            self._update_clusters(analyses)
+        #     biggest_impact_mistakes = ImpactFinder(mistakes)
+            if analyses:
+                games = pd.concat([analysis.to_dataframe() for analysis in analyses], ignore_index=True)
+            else:
+                games = MoveTable().to_dataframe()
+
+        timings = pipeline.timings()
+        games.attrs["stage_timings"] = timings
+        games.attrs["failed_games"] = failures = pipeline.failures()
+        logger.info(f"Analysed {len(analyses)} games of {username} on {platform_name}: {format_timings(timings)}")
+        if failures:
+            report(1.0, f"Analysed {len(analyses)} games; {len(failures)} could not be analysed: " + "; ".join(
+                f"{failure['item']} ({failure['stage']}: {failure['error']})" for failure in failures
+            ))
+        else:
+            report(1.0, f"Analysed {len(analyses)} games")
+        if profile:
+            games.attrs["profile"] = {kind: str(path) for kind, path in profiler.paths.items()}
+            logger.info(f"Profile of the run written to {profiler.paths['hotspots'].parent}: {profiler.paths['hotspots'].name}")
         return games
 
+    def iter_analyse(
+            self,
+            username: str,
+            platform_name: str,
+            number_of_games: Optional[int] = None,
+            failures: Optional[list[dict[str, str]]] = None
+            ) -> Iterator["pd.DataFrame"]:
+        """
+        Yields each game's per-move rows as soon as that game has made it through the
+        pipeline. Games are analysed concurrently while later games are still downloading,
+        so they arrive in the order they finish. Games a stage failed on are added to
+        `failures` once the run is over.
+        """
+        pipeline = self._build_pipeline(self._request_budget())
+        for analysis in pipeline.run(self._iter_games(platform_name, username, None, None, number_of_games)):
+            yield analysis.to_dataframe()
+        if failures is not None:
+            failures.extend(pipeline.failures())
+
+    def _iter_games(
+            self,
+            platform_name: str,
+            username: str,
+            start_dt_utc: Optional[datetime],
+            end_dt_utc: Optional[datetime],
+            number_of_games: Optional[int]
+            ) -> Iterator[GameAnalysis]:
+        """The pipeline's source: games wrapped for analysis, streamed as the platform delivers them."""
+        platform_wrapper = self._find_platform_wrapper(platform_name)
+        if self.game_store is not None:
+            games = self._iter_stored_games(platform_wrapper, username, start_dt_utc, end_dt_utc, number_of_games)
+        else:
+            games = platform_wrapper.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games)
+        for index, game in enumerate(games):
+            yield GameAnalysis(game, index)
+
+    def _request_budget(self) -> SearchBudget:
+        """
+        The engine allowance of one run, shared by all its games (`budget.max_*_per_request`).
+        Its clock starts with the run's first engine search, so fetching games is not charged.
+        """
+        return SearchBudget(
+            self.budget_config.get("max_nodes_per_request"),
+            self.budget_config.get("max_seconds_per_request"),
+        )
+
+    def _build_pipeline(self, budget: Optional[SearchBudget] = None) -> Pipeline:
+        """
+        A fresh pipeline for one run, whose engine stages search within `budget`. Worker counts
+        come from the `pipeline.workers` config; evaluate and classify default to the number
+        of engine processes behind them.
+        """
+        self._load_components()
+        workers = self.pipeline_config.get("workers", {})
+        stages = [Stage("parse", GameAnalysis.replay, workers.get("parse", 1))]
+        if self.engine is not None:
+            stages.append(Stage("evaluate", partial(self._evaluate, budget=budget), workers.get("evaluate") or self.engine.pool.size))
+        stages.append(Stage("detect", self._detect, workers.get("detect", 1)))
+        if self.mistake_identifiers is not None:
+            stages.append(Stage("classify", partial(self._classify, budget=budget), workers.get("classify") or self.mistake_identifiers.qsize()))
+        if self.cluster_analyser is not None:
+            stages.append(Stage("cluster", self._cluster, workers.get("cluster", 1)))
+        return Pipeline(
+            stages, queue_size=self.pipeline_config.get("queue_size", 8), name="analyse",
+            describe=lambda analysis: analysis.game.id,
+        )
+
+    def _evaluate(self, analysis: GameAnalysis, budget: Optional[SearchBudget] = None) -> GameAnalysis:
+        """
+        Engine evaluations for every game the platform has not already analysed deeply enough;
+        shallow ones in tiered mode. Platform analysis counts if it is at least as deep as
+        `pipeline.min_platform_eval_depth`, by default the depth the engine would search.
+        The engine's best moves are kept for the classify stage to check the played ones against.
+        """
+        game = analysis.game
+        depth = self.tiered_config.get("shallow_depth", 10) if self.tiered_config else self.engine.depth
+        min_depth = self.pipeline_config.get("min_platform_eval_depth") or depth
+        if game.evaluations and game.eval_depth is not None and game.eval_depth >= min_depth:
+            return analysis
+
+        evaluations = self.engine.evaluate_line(game.moves, depth=depth, schedule=self.schedule, budget=budget)
+        game.evaluations = [None if evaluation is None else int(evaluation) for _, evaluation, _, _ in evaluations]
+        # The best reply to the position after a move is the best move before the next one
+        analysis.shallow_best = [None] + [best_move for _, _, best_move, _ in evaluations[:-1]]
+        game.eval_source = "engine"
+        # The shallowest search the evaluations rest on; unknown once the budget ran out, as it may have skipped positions
+        searched = [searched_depth for *_, searched_depth in evaluations if searched_depth is not None]
+        cut_short = budget is not None and budget.exhausted
+        game.eval_depth = min(searched) if searched and not cut_short else None
+        return analysis
+
+    def _detect(self, analysis: GameAnalysis) -> GameAnalysis:
+        evaluations = analysis.evaluations_cp()
+        analysis.drops = self.drop_detector.find_drops_batch(evaluations, [0, len(evaluations)])
+        return analysis
+
+    def _classify(self, analysis: GameAnalysis, budget: Optional[SearchBudget] = None) -> GameAnalysis:
+        """
+        Mistake types for every move. A game without any evaluation (no engine stage and no
+        platform analysis, as for Chess.com games) has no shallow pass to refine, so even in
+        tiered mode it gets the full analysis.
+        """
+        identifier = self.mistake_identifiers.get()
+        try:
+            if self.tiered_config is not None and analysis.has_evaluations():
+                analysis.mistakes = self._classify_tiered(analysis, identifier, budget)
+            else:
+                analysis.mistakes = identifier.analyze_game(
+                    analysis.moves_uci, analysis.game.time_spent, budget=budget, schedule=self.schedule
+                )
+                analysis.mistakes["deep"] = True
+        finally:
+            self.mistake_identifiers.put(identifier)
+        return analysis
+
+    def _classify_tiered(
+            self,
+            analysis: GameAnalysis,
+            identifier: "MistakeIdentifier",
+            request_budget: Optional[SearchBudget] = None
+            ) -> "pd.DataFrame":
+        """
+        Classifies every move from the shallow evaluations, then re-does the moves the drop
+        detector flagged with a deep search, biggest drop first, within the per-game budget.
+        Book moves are left out and each search is as deep as the schedule gives the move.
+        """
+        import numpy as np
+
+        drops = analysis.drops[np.argsort(-analysis.drops["drop"], kind="stable")]
+        evaluations = analysis.evaluations_cp()
+        candidates, depths = [], []
+        for ply in drops["ply"]:
+            ply = int(ply)
+            if ply >= len(analysis.moves_uci):
+                continue
+            depth = self.schedule.depth_for(
+                identifier.depth,
+                ply,
+                eval_before_cp=float(evaluations[ply - 1]) if ply else None,
+                eval_after_cp=float(evaluations[ply]),
+                played=analysis.moves_uci[ply],
+                shallow_best=analysis.shallow_best[ply] if ply < len(analysis.shallow_best) else None,
+            )
+            if depth is not None:
+                candidates.append(ply)
+                depths.append(depth)
+        budget = SearchBudget(
+            self.tiered_config.get("max_nodes_per_game"),
+            self.tiered_config.get("max_seconds_per_game"),
+            parent=request_budget,
+        )
+        deep = identifier.analyze_candidates(
+            analysis.moves_uci, candidates, analysis.game.time_spent, budget=budget, fens=analysis.fens, depths=depths
+        )
+
+        mistakes = analysis.shallow_mistakes(identifier.classify_mistake)
+        mistakes["deep"] = False
+        if len(deep):
+            mistakes.loc[deep.index, deep.columns] = deep
+            mistakes.loc[deep.index, "deep"] = True
+        return mistakes
+
+    def _cluster(self, analysis: GameAnalysis) -> GameAnalysis:
+        """Assigns positions to the clusters of a fitted model; before the first fit this is left to `_update_clusters`."""
+        with self._cluster_lock:
+            if self._clusters_fitted() and analysis.fens:
+                analysis.clusters = self.cluster_analyser.predict(analysis.feature_frame())["cluster"].to_numpy()
+        return analysis
+
+    def _clusters_fitted(self) -> bool:
+        return hasattr(self.cluster_analyser.model, "cluster_centers_")
+
+    def _update_clusters(self, analyses: list[GameAnalysis]) -> None:
+        """
+        Fits the cluster model on a run's positions when none is fitted yet, and keeps training
+        an incremental model on every run. The model is saved so later runs only predict.
+        """
+        if self.cluster_analyser is None:
+            return
+        positions = [analysis for analysis in analyses if analysis.fens]
+        if not positions:
+            return
+        import pandas as pd
+
+        features = pd.concat([analysis.feature_frame() for analysis in positions], ignore_index=True)
+
+        with self._cluster_lock:
+            fitted = self._clusters_fitted()
+            if fitted and not self.cluster_analyser.incremental:
+                return
+            if len(features) < self.cluster_analyser.n_clusters:
+                return
+            if self.cluster_analyser.incremental:
+                self.cluster_analyser.partial_fit(features)
+            else:
+                self.cluster_analyser.fit(features)
+            if self.cluster_model_path:
+                self.cluster_analyser.save(self.cluster_model_path)
+            if fitted:
+                # Already labelled by the cluster stage
+                return
+            labels = self.cluster_analyser.predict(features)["cluster"].to_numpy()
+
+        start = 0
+        for analysis in positions:
+            analysis.clusters = labels[start:start + len(analysis.fens)]
+            start += len(analysis.fens)
+
+    def _iter_stored_games(
+            self,
+            platform_wrapper: PlatformWrapper,
+            username: str,
+            start_dt_utc: Optional[datetime],
+            end_dt_utc: Optional[datetime],
+            number_of_games: Optional[int]
+            ) -> Iterator[Game]:
+        """
+        A player's games, newest first, going through the local game store. Downloaded games
+        are passed on as they arrive and saved along the way. Once part of a user's history is
+        stored without gaps, only games newer than that span are downloaded, the span is read
+        from the store, and older games are downloaded only when the request needs more.
+        """
+        if start_dt_utc is not None or end_dt_utc is not None:
+            with closing(self._save_as_fetched(
+                platform_wrapper, username,
+                platform_wrapper.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games),
+            )) as games:
+                yield from games
+            return
+
+        coverage = self.game_store.coverage(platform_wrapper.name, username)
+        if coverage is None:
+            with closing(self._fetch_covered(platform_wrapper, username, number_of_games=number_of_games)) as games:
+                yield from games
+            return
+
+        fetched = 0
+        with closing(self._fetch_covered(
+            platform_wrapper, username, start_dt_utc=coverage.newest_dt_utc + timedelta(milliseconds=1)
+        )) as new_games:
+            for game in new_games:
+                yield game
+                fetched += 1
+                if number_of_games and fetched >= number_of_games:
+                    return
+        remaining = number_of_games - fetched if number_of_games else None
+        stored = self.game_store.load_games(
+            platform_wrapper.name, username, coverage.oldest_dt_utc, coverage.newest_dt_utc, remaining
+        )
+        yield from stored
+        if coverage.complete or (remaining is not None and len(stored) >= remaining):
+            return
+        with closing(self._fetch_covered(
+            platform_wrapper, username,
+            end_dt_utc=coverage.oldest_dt_utc - timedelta(milliseconds=1),
+            number_of_games=remaining - len(stored) if remaining is not None else None,
+        )) as old_games:
+            yield from old_games
+
+    def _fetch_covered(
+            self,
+            platform_wrapper: PlatformWrapper,
+            username: str,
+            start_dt_utc: Optional[datetime] = None,
+            end_dt_utc: Optional[datetime] = None,
+            number_of_games: Optional[int] = None
+            ) -> Iterator[Game]:
+        """
+        Downloads games newest first through `_save_as_fetched` and, once the download ends or
+        is abandoned, extends the user's coverage by the span it went through. Without bounds
+        the download is the start of a new coverage; with `start_dt_utc` it extends the coverage
+        to newer games, but only if it ran to the end; with `end_dt_utc` it extends it to older
+        games. Wrappers that download whole months also pass on games outside the bounds, which
+        are skipped.
+        """
+        platform = platform_wrapper.name
+        newest = oldest = None
+        count = 0
+        exhausted = False
+        try:
+            with closing(self._save_as_fetched(
+                platform_wrapper, username,
+                platform_wrapper.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games),
+            )) as games:
+                for game in games:
+                    if start_dt_utc is not None and game.start_dt_utc < start_dt_utc:
+                        continue
+                    if end_dt_utc is not None and game.start_dt_utc > end_dt_utc:
+                        continue
+                    newest = newest or game.start_dt_utc
+                    oldest = game.start_dt_utc
+                    count += 1
+                    yield game
+                    if number_of_games and count >= number_of_games:
+                        return
+            exhausted = True
+        finally:
+            # Everything passed on is saved by now, the last batch when `games` was closed
+            reached_oldest = exhausted and (number_of_games is None or count < number_of_games)
+            coverage = self.game_store.coverage(platform, username)
+            if start_dt_utc is None and end_dt_utc is None:
+                if count:
+                    coverage = Coverage(oldest, newest, reached_oldest)
+            elif start_dt_utc is not None:
+                if count and exhausted and coverage is not None:
+                    coverage = coverage._replace(newest_dt_utc=max(newest, coverage.newest_dt_utc))
+            elif coverage is not None:
+                coverage = coverage._replace(oldest_dt_utc=oldest or coverage.oldest_dt_utc, complete=reached_oldest)
+            if coverage is not None:
+                self.game_store.set_coverage(platform, username, coverage)
+
+    def _save_as_fetched(
+            self,
+            platform_wrapper: PlatformWrapper,
+            username: str,
+            games: Iterator[Game],
+            batch_size: int = 50
+            ) -> Iterator[Game]:
+        """
+        Passes `games` on as they arrive and writes them to the game store every `batch_size`
+        games, and once more for the rest when the iteration ends or is abandoned. Wrappers
+        that save what they download themselves are passed through untouched.
+        """
+        if platform_wrapper.saves_fetched_games:
+            yield from games
+            return
+        batch = []
+        try:
+            for game in games:
+                batch.append(game)
+                yield game
+                if len(batch) >= batch_size:
+                    self.game_store.save_games(platform_wrapper.name, username, batch)
+                    batch = []
+        finally:
+            if batch:
+                self.game_store.save_games(platform_wrapper.name, username, batch)
+
     def _find_platform_wrapper(self,
                       platform_name: str) -> PlatformWrapper:
         platform_wrapper = next(
             (p for p in self.platforms if p.name == platform_name),
             None
             )
+        if platform_wrapper is None and platform_name in self._platform_configs:
+            with self._load_lock:
+                platform_cfg = self._platform_configs.get(platform_name)
+                if platform_cfg is not None:
+                    platform_wrapper = load_class(platform_cfg["class"])(platform_cfg)  # Pass full config
+                    if self.game_store is not None:
+                        platform_wrapper.attach_game_store(self.game_store)
+                    self.platforms.append(platform_wrapper)
+                    # Only once the wrapper exists, so a failed construction is retried by the next request
+                    del self._platform_configs[platform_name]
+            if platform_wrapper is None:
+                # Created by another thread while this one waited for the lock
+                return self._find_platform_wrapper(platform_name)
         if platform_wrapper is None:
             raise ValueError(f"No platform wrapper found for platform '{platform_name}'")
         
@@ -0,0 +1,124 @@
+from typing import TYPE_CHECKING, Callable, Optional
+
+import numpy as np
+
+from common.evaluation import EVAL_MISSING
+from common.game import Game
+from common.positions import PACKED_BOARD_BYTES
+from ml.helper_functions.evaluation_drop_detector import DROP_DTYPE
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MISTAKE_COLUMNS = ["best_move", "best_eval_cp", "actual_eval_cp", "cp_loss", "mistake_type", "deep"]
+
+
+class GameAnalysis:
+    """A game on its way through the analysis pipeline, and what every stage found out about it."""
+
+    def __init__(self, game: Game, index: int = 0) -> None:
+        self.game = game
+        self.index = index  # position in the source, so results can be put back in order
+        self.fens: list[str] = []  # position before every ply
+        self.moves_uci: list[str] = []
+        self.shallow_best: list[Optional[str]] = []  # engine's best move before every ply, where the evaluate stage found one
+        self.boards = np.empty((0, PACKED_BOARD_BYTES), dtype=np.uint8)
+        self.drops = np.empty(0, dtype=DROP_DTYPE)
+        self.mistakes: Optional["pd.DataFrame"] = None
+        self.clusters: Optional[np.ndarray] = None
+
+    def replay(self) -> "GameAnalysis":
+        """Takes the positions and UCI moves from the game's replay, which ingestion usually already did."""
+        positions = self.game.replay()
+        self.fens = positions.fens
+        self.moves_uci = positions.moves_uci
+        self.boards = positions.boards
+        return self
+
+    def evaluations_cp(self) -> np.ndarray:
+        """White-POV centipawn evaluation after every ply, NaN where there is none."""
+        values = np.full(len(self.game.move_codes), np.nan, dtype=np.float32)
+        evals = self.game.evals_cp[:len(values)]
+        values[:len(evals)] = np.where(evals == EVAL_MISSING, np.nan, evals)
+        return values
+
+    def has_evaluations(self) -> bool:
+        """Whether any ply has an evaluation, from the platform or the evaluate stage."""
+        return bool(np.any(~np.isnan(self.evaluations_cp())))
+
+    def shallow_mistakes(self, classify: Callable[[float, float, Optional[float]], str]) -> "pd.DataFrame":
+        """
+        Rows in the format of `MistakeIdentifier.analyze_game`, worked out from the evaluations
+        the game already has: the evaluation before a move stands in for the best line's, and
+        the best move itself is unknown. `classify` is `MistakeIdentifier.classify_mistake`.
+        """
+        import pandas as pd
+
+        plies = len(self.moves_uci)
+        after = self.evaluations_cp()[:plies]
+        before = np.concatenate([[np.nan], after[:-1]]).astype(np.float32)
+        # Evaluations are white's; turn them to the mover's side, white moving on even plies
+        sign = np.where(np.arange(plies) % 2 == 0, 1.0, -1.0).astype(np.float32)
+        best_eval = sign * before
+        actual_eval = sign * after
+
+        # None where the game has no clock reading, which rules out "Time trouble"
+        clocks = list((self.game.time_spent or [])[:plies])
+        time_used = clocks + [None] * (plies - len(clocks))
+        # A shallow swing in the mover's favour is search noise, not a mistake
+        mistake_type = [
+            None if np.isnan(best) or np.isnan(actual) else classify(min(actual, best), best, spent)
+            for best, actual, spent in zip(best_eval, actual_eval, time_used)
+        ]
+        return pd.DataFrame({
+            "fen": self.fens,
+            "best_move": [None] * plies,
+            "actual_move": self.moves_uci,
+            "best_eval_cp": best_eval,
+            "actual_eval_cp": actual_eval,
+            "cp_loss": best_eval - actual_eval,
+            "mistake_type": mistake_type,
+            "time_used": time_used,
+        })
+
+    def feature_frame(self) -> "pd.DataFrame":
+        """The columns ClusterAnalyser works on, one row per replayed ply."""
+        import pandas as pd
+
+        plies = len(self.fens)
+        time_used = np.full(plies, np.nan, dtype=np.float32)
+        clocks = self.game.seconds_spent[:plies]
+        time_used[:len(clocks)] = clocks
+        cp_loss = np.full(plies, np.nan, dtype=np.float32)
+        if self.mistakes is not None:
+            cp_loss = self.mistakes["cp_loss"].reindex(range(plies)).to_numpy(dtype=np.float32)
+        return pd.DataFrame({
+            "fen": self.fens,
+            "board": self.boards.view(f"S{PACKED_BOARD_BYTES}")[:, 0],
+            "time_used": time_used,
+            "eval_cp": self.evaluations_cp()[:plies],
+            "cp_loss": cp_loss,
+        })
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        """The game's per-move rows, plus the columns the pipeline stages added."""
+        import pandas as pd
+
+        # fen, move_uci, zobrist and board come from the game's replay already
+        df = self.game.to_dataframe()
+        plies = len(df)
+
+        eval_drop = np.full(plies, np.nan, dtype=np.float32)
+        eval_drop[self.drops["ply"]] = self.drops["drop"]
+        df["eval_drop"] = eval_drop
+
+        if self.mistakes is not None:
+            mistakes = self.mistakes.reindex(range(plies))
+            for column in MISTAKE_COLUMNS:
+                df[column] = mistakes[column].to_numpy()
+        if self.clusters is not None:
+            df["cluster"] = pd.array(self._padded(list(self.clusters), plies), dtype="Int16")
+        return df
+
+    def _padded(self, values: list, length: int) -> list:
+        return list(values[:length]) + [None] * (length - len(values))
@@ -0,0 +1,122 @@
+from typing import Iterable, List, Sequence, Tuple, Optional, Union
+
+import numpy as np
+
+from common.evaluation import EVAL_MISSING, eval_to_cp
+
+# One row per detected drop; `game` indexes into the batch, `ply` into the game
+DROP_DTYPE = np.dtype([
+    ("game", np.int32),
+    ("ply", np.int32),
+    ("eval_before", np.float32),
+    ("eval_after", np.float32),
+    ("drop", np.float32),
+])
+
+
+class EvaluationDropDetector:
+    def __init__(self, threshold_cp: int = 100, mate_cp: int = 1000):
+        """
+        :param threshold_cp: Minimum drop in centipawns to consider significant.
+        :param mate_cp: Mate scores (and anything beyond) are clipped to +/- this value.
+        """
+        self.threshold_cp = threshold_cp
+        self.mate_cp = mate_cp
+
+    def _normalize_eval(self, eval_str: Union[str, float, None]) -> Optional[float]:
+        """
+        Converts an evaluation (centipawns, or a string in pawns such as "+0.53", "-M3",
+        "mate in 2") to centipawns. Mates are clipped to +/- `mate_cp` for detection purposes.
+        """
+        cp = eval_to_cp(eval_str)
+        if cp is None:
+            return None
+        return float(max(-self.mate_cp, min(self.mate_cp, cp)))
+
+    def find_drops(
+        self,
+        evaluations: List[str],
+        positions: List[str]
+    ) -> List[Tuple[int, float, float, str]]:
+        """
+        Finds evaluation drops over the threshold and returns:
+        - index,
+        - evaluation before,
+        - evaluation after,
+        - FEN at the drop.
+
+        :param evaluations: List of evaluations read by `eval_to_cp`: centipawn numbers, or
+            strings in pawns (e.g. "+0.53", "-1.20", "+M2").
+        :param positions: List of FEN strings or PGN moves.
+        :return: List of tuples with (index, eval_before, eval_after, fen_at_drop)
+        """
+        assert len(evaluations) == len(positions), "Evaluations and positions must match in length."
+
+        flat, offsets = self.flatten([evaluations])
+        drops = self.find_drops_batch(flat, offsets, perspective="white")
+        return [
+            (int(drop["ply"]), float(drop["eval_before"]), float(drop["eval_after"]), positions[drop["ply"]])
+            for drop in drops
+        ]
+
+    def flatten(self, games: Iterable[Sequence[Union[str, float, None]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Packs per-game evaluation lists into one float32 array plus offsets, where game g
+        occupies flat[offsets[g]:offsets[g + 1]]. Each value is parsed exactly once;
+        missing or unparseable values become NaN.
+        """
+        lengths = []
+        values = []
+        for evaluations in games:
+            lengths.append(len(evaluations))
+            values.extend(np.nan if cp is None else cp for cp in map(eval_to_cp, evaluations))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return np.asarray(values, dtype=np.float32), offsets
+
+    def find_drops_batch(
+        self,
+        evaluations: np.ndarray,
+        offsets: np.ndarray,
+        perspective: str = "mover"
+    ) -> np.ndarray:
+        """
+        Finds drops over the threshold in many games at once.
+
+        :param evaluations: Flat array of white-POV centipawn evaluations after every ply, NaN
+            (or EVAL_MISSING, as games store them) if missing.
+        :param offsets: Start index of every game in `evaluations`, followed by the total length.
+        :param perspective: "mover" measures every drop from the side that just moved, so a
+            black blunder is a rise in white's evaluation; "white" measures all drops from white's side.
+        :return: Structured array of DROP_DTYPE, ordered by game and ply.
+        """
+        if perspective not in ("mover", "white"):
+            raise ValueError(f"Unknown perspective: {perspective}")
+
+        evals = np.asarray(evaluations, dtype=np.float32)
+        evals = np.clip(np.where(evals == EVAL_MISSING, np.nan, evals), -self.mate_cp, self.mate_cp)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(evals) < 2:
+            return np.empty(0, dtype=DROP_DTYPE)
+
+        game = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+        ply = np.arange(len(evals), dtype=np.int64) - offsets[game]
+
+        before = evals[:-1]
+        after = evals[1:]
+        drop = before - after
+        if perspective == "mover":
+            # Ply 0 is white's first move, so odd plies are black's
+            drop = np.where(ply[1:] % 2 == 1, -drop, drop)
+
+        # Pairs that straddle two games are not moves; NaN comparisons are False
+        same_game = game[:-1] == game[1:]
+        hits = np.flatnonzero(same_game & (drop >= self.threshold_cp)) + 1
+
+        result = np.empty(len(hits), dtype=DROP_DTYPE)
+        result["game"] = game[hits]
+        result["ply"] = ply[hits]
+        result["eval_before"] = evals[hits - 1]
+        result["eval_after"] = evals[hits]
+        result["drop"] = drop[hits - 1]
+        return result
@@ -1,7 +1,15 @@
+import math
+import time
+
 import chess
 import chess.engine
 import pandas as pd
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Sequence, Tuple, Optional
+
+from common.evaluation import MATE_SCORE_CP, score_to_cp
+from engines.budget import DepthSchedule, SearchBudget
+from engines.eval_cache import EvaluationCache, normalize_fen
+from utils.metrics import record_search
 
 
 class MistakeIdentifier:
@@ -10,14 +18,18 @@ class MistakeIdentifier:
     with the best Stockfish move.
     """
 
-    def __init__(self, engine_path: str = "stockfish", depth: int = 18) -> None:
+    def __init__(self, engine_path: str = "stockfish", depth: int = 18, cache: Optional[EvaluationCache] = None) -> None:
         self.engine_path = engine_path
         self.depth = depth
+        self.cache = cache
         self.engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+        # The last evaluated position and its depth; the position after move N is the one before move N+1
+        self._last_position: Optional[Tuple[str, int, Optional[str], float]] = None
 
-    def classify_mistake(self, actual_eval: float, best_eval: float, time_used: float) -> str:
+    def classify_mistake(self, actual_eval: float, best_eval: float, time_used: Optional[float]) -> str:
         """
         Classifies the mistake based on evaluation difference and time used.
+        Without a clock reading (None or NaN) a move is never put down to time trouble.
 
         Returns:
             str: Type of mistake
@@ -25,7 +37,7 @@ class MistakeIdentifier:
         cp_loss = best_eval - actual_eval
         abs_loss = abs(cp_loss)
 
-        if time_used < 2 and abs_loss > 150:
+        if time_used is not None and time_used < 2 and abs_loss > 150:
             return "Time trouble"
         if abs_loss > 300:
             return "Blunder"
@@ -36,59 +48,212 @@ class MistakeIdentifier:
         else:
             return "Minor inaccuracy or stylistic"
 
-    def analyze_position(self, fen: str, actual_move_uci: str, time_used: float) -> Dict[str, Any]:
+    def analyze_position(self, fen: str, actual_move_uci: str, time_used: Optional[float]) -> Dict[str, Any]:
         board = chess.Board(fen)
         actual_move = chess.Move.from_uci(actual_move_uci)
+        mover = board.turn
 
         # Evaluate current position
-        info_best = self.engine.analyse(board, chess.engine.Limit(depth=self.depth))
-        best_move = info_best["pv"][0]
-        best_eval = self._score_to_cp(info_best["score"])
+        best_move, best_eval = self._evaluate(board, mover)
 
-        # Apply actual move
-        board.push(actual_move)
-        info_actual = self.engine.analyse(board, chess.engine.Limit(depth=self.depth))
-        actual_eval = self._score_to_cp(info_actual["score"])
+        # Playing the engine's move loses nothing; otherwise apply the actual move
+        if actual_move.uci() == best_move:
+            actual_eval = best_eval
+        else:
+            board.push(actual_move)
+            _, actual_eval = self._evaluate(board, mover)
 
-        mistake_type = self.classify_mistake(actual_eval, best_eval, time_used)
+        return self._build_result(fen, best_move, best_eval, actual_move.uci(), actual_eval, time_used)
 
-        return {
-            "fen": fen,
-            "best_move": best_move.uci(),
-            "actual_move": actual_move.uci(),
-            "best_eval_cp": best_eval,
-            "actual_eval_cp": actual_eval,
-            "cp_loss": best_eval - actual_eval,
-            "mistake_type": mistake_type,
-            "time_used": time_used
-        }
+    def analyze_game(
+        self,
+        moves_uci: List[str],
+        time_used: Optional[List[float]] = None,
+        starting_fen: str = chess.STARTING_FEN,
+        budget: Optional[SearchBudget] = None,
+        schedule: Optional[DepthSchedule] = None
+    ) -> pd.DataFrame:
+        """
+        Walks a whole game once, searching every position a single time. The evaluation of
+        the position after a move doubles as the "before" evaluation of the next move, so a
+        game of N moves costs N + 1 searches instead of 2N.
+
+        With a `schedule`, each position is searched as deep as the move played from it
+        deserves, and book positions only come from the cache. Positions left unsearched,
+        or past the end of `budget`, have no evaluation and their moves no mistake type.
+
+        Returns one row per move, in the same format as `analyze_multiple`.
+        """
+        board = chess.Board(starting_fen)
+        depth = self._scheduled_depth(schedule, 0, None)
+        best_move, white_cp = self._evaluate(board, chess.WHITE, budget, depth, search=depth is not None)
+
+        results = []
+        for ply, move_uci in enumerate(moves_uci):
+            fen = board.fen()
+            sign = 1 if board.turn == chess.WHITE else -1
+            board.push_uci(move_uci)
+            depth = self._scheduled_depth(schedule, ply + 1, white_cp)
+            next_best_move, next_white_cp = self._evaluate(board, chess.WHITE, budget, depth, search=depth is not None)
+
+            best_eval = sign * white_cp
+            # Playing the engine's move loses nothing; don't let search noise say otherwise
+            actual_eval = best_eval if move_uci == best_move else sign * next_white_cp
+            spent = time_used[ply] if time_used is not None and ply < len(time_used) else None
+            results.append(self._build_result(fen, best_move, best_eval, move_uci, actual_eval, spent))
+
+            best_move, white_cp = next_best_move, next_white_cp
+        return pd.DataFrame(results)
+
+    def analyze_candidates(
+        self,
+        moves_uci: List[str],
+        plies: Sequence[int],
+        time_used: Optional[List[float]] = None,
+        starting_fen: str = chess.STARTING_FEN,
+        budget: Optional[SearchBudget] = None,
+        fens: Optional[Sequence[str]] = None,
+        depths: Optional[Sequence[int]] = None
+    ) -> pd.DataFrame:
+        """
+        Deep analysis of selected moves only, e.g. the ones a shallow pass flagged. Plies are
+        analysed in the order given until the budget runs out, so pass the most suspicious first.
+        `fens` are the positions before every move (see `Game.replay`); without them the moves
+        are replayed from `starting_fen`. `depths` are the search depths of the plies, by
+        default the identifier's depth for all (see `DepthSchedule`).
+
+        Returns one row per analysed move, indexed by ply, in the format of `analyze_game`.
+        """
+        positions = fens
+        if positions is None:
+            board = chess.Board(starting_fen)
+            positions = []
+            for move_uci in moves_uci:
+                positions.append(board.fen())
+                board.push_uci(move_uci)
+
+        results, analysed = [], []
+        for index, ply in enumerate(plies):
+            if budget is not None and budget.exhausted:
+                break
+            depth = depths[index] if depths is not None else self.depth
+            board = chess.Board(positions[ply])
+            mover = board.turn
+            best_move, best_eval = self._evaluate(board, mover, budget, depth)
+
+            move_uci = moves_uci[ply]
+            if move_uci == best_move:
+                actual_eval = best_eval
+            else:
+                board.push_uci(move_uci)
+                _, actual_eval = self._evaluate(board, mover, budget, depth)
+
+            spent = time_used[ply] if time_used is not None and ply < len(time_used) else None
+            results.append(self._build_result(positions[ply], best_move, best_eval, move_uci, actual_eval, spent))
+            analysed.append(ply)
+        return pd.DataFrame(results, index=analysed)
 
     def analyze_multiple(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Expects a DataFrame with:
         - fen
         - actual_move (in UCI)
-        - time_used (in seconds)
+        - time_used (in seconds, optional)
 
         Returns the same DataFrame with classified mistake types.
+        When rows are consecutive moves of a game, each position is only searched once.
         """
         results = []
         for _, row in df.iterrows():
             result = self.analyze_position(
                 fen=row["fen"],
                 actual_move_uci=row["actual_move"],
-                time_used=row.get("time_used", 0.0)
+                time_used=row.get("time_used")
             )
             results.append(result)
         return pd.DataFrame(results)
 
-    def _score_to_cp(self, score) -> float:
-        """Convert score to centipawn float."""
-        if score.is_mate():
-            # Treat mate in N as +-1000 to 3000 centipawns
-            mate = score.mate()
-            return 3000 if mate > 0 else -3000
-        return score.score()
+    def _build_result(
+        self,
+        fen: str,
+        best_move: Optional[str],
+        best_eval: float,
+        actual_move_uci: str,
+        actual_eval: float,
+        time_used: Optional[float]
+    ) -> Dict[str, Any]:
+        return {
+            "fen": fen,
+            "best_move": best_move,
+            "actual_move": actual_move_uci,
+            "best_eval_cp": best_eval,
+            "actual_eval_cp": actual_eval,
+            "cp_loss": best_eval - actual_eval,
+            # Unsearched positions have no evaluation to judge the move by
+            "mistake_type": None if math.isnan(best_eval) or math.isnan(actual_eval) else self.classify_mistake(actual_eval, best_eval, time_used),
+            "time_used": time_used
+        }
+
+    def _evaluate(
+        self,
+        board: chess.Board,
+        color: chess.Color,
+        budget: Optional[SearchBudget] = None,
+        depth: Optional[int] = None,
+        search: bool = True
+    ) -> Tuple[Optional[str], float]:
+        """
+        Returns (best_move_uci, eval_cp) for a position, with the evaluation from `color`'s
+        point of view. Results are served from and written to the evaluation cache if set.
+        Searches go to `depth` (by default the identifier's) and are cut short when they would
+        overrun `budget`. Without `search`, or once the budget is spent, the position is only
+        looked up, and is (None, NaN) when it was never evaluated.
+        """
+        depth = depth or self.depth
+        search = search and not (budget is not None and budget.exhausted)
+        fen = board.fen()
+        key = normalize_fen(fen)
+        if self._last_position is not None and self._last_position[0] == key and (self._last_position[1] >= depth or not search):
+            _, _, best_move, white_cp = self._last_position
+            return best_move, white_cp if color == chess.WHITE else -white_cp
+
+        cached = self.cache.get(fen, depth if search else 1) if self.cache is not None else None
+        if cached is not None:
+            white_cp = cached.score_cp
+            best_move = cached.best_move
+            depth = cached.depth
+        elif board.is_game_over():
+            white_cp = self._terminal_cp(board)
+            best_move = None
+        elif not search:
+            return None, math.nan
+        else:
+            limit = budget.limit(depth) if budget is not None else chess.engine.Limit(depth=depth)
+            began = time.perf_counter()
+            info = self.engine.analyse(board, limit)
+            record_search("classify", time.perf_counter() - began, info)
+            if budget is not None:
+                budget.charge(info)
+            white_cp = score_to_cp(info["score"].white())
+            best_move = info["pv"][0].uci() if info.get("pv") else None
+            # A search stopped by the budget only counts for the depth it reached
+            depth = min(depth, info.get("depth", depth))
+            if self.cache is not None:
+                self.cache.put(fen, depth, white_cp, best_move)
+        self._last_position = (key, depth, best_move, white_cp)
+        return best_move, white_cp if color == chess.WHITE else -white_cp
+
+    def _scheduled_depth(self, schedule: Optional[DepthSchedule], ply: int, white_cp: Optional[float]) -> Optional[int]:
+        """The depth for the position before `ply` in `analyze_game`, None if it is not searched."""
+        if schedule is None:
+            return self.depth
+        return schedule.depth_for(self.depth, ply, white_cp)
+
+    def _terminal_cp(self, board: chess.Board) -> float:
+        if board.is_checkmate():
+            return -MATE_SCORE_CP if board.turn == chess.WHITE else MATE_SCORE_CP
+        return 0
 
     def close(self) -> None:
+        # The cache is shared with the other identifiers and the engine; whoever created it closes it
         self.engine.quit()
\ No newline at end of file
@@ -0,0 +1,222 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from utils.metrics import PIPELINE_ERRORS, PIPELINE_QUEUE_DEPTH, PIPELINE_STAGE_SECONDS
+from utils.profiling import in_run
+
+logger = logging.getLogger("chessmate")
+
+# Marks the end of the stream; every worker of the next stage receives one
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline: `fn(item)` run by `workers` threads. Whatever `fn` returns is
+    passed on to the next stage; returning None drops the item.
+    """
+
+    def __init__(self, name: str, fn: Optional[Callable[[Any], Any]] = None, workers: int = 1) -> None:
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers or 1)
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.failures: list[dict[str, str]] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._running = self.workers
+        self._lock = threading.Lock()
+
+    def _record(self, seconds: float, failure: Optional[dict[str, str]] = None) -> None:
+        with self._lock:
+            self.busy_seconds += seconds
+            if failure is not None:
+                self.errors += 1
+                self.failures.append(failure)
+            else:
+                self.items += 1
+
+    def timings(self) -> dict[str, Any]:
+        wall = (self.finished_at or time.perf_counter()) - self.started_at if self.started_at else 0.0
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "workers": self.workers,
+            "wall_seconds": round(wall, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class Pipeline:
+    """
+    Runs items from a source through a chain of stages, every stage on its own threads.
+
+    Stages are connected by bounded queues: when a stage falls behind, the queue in front
+    of it fills up and the stages before it block, so memory stays bounded however fast
+    the source is. Items leave the pipeline in the order they finish, not the order they
+    entered. An exception while handling one item drops that item and is kept in
+    `failures()`, with the item named by `describe`; an exception in the source ends the
+    run and is raised to the consumer.
+
+    When the consumer stops early, the threads are told to stop and waited on for at most
+    `join_timeout` seconds; a worker still inside `fn` (a long engine search, say) is left
+    to finish that item in the background and then exits.
+    """
+
+    def __init__(
+            self,
+            stages: list[Stage],
+            queue_size: int = 8,
+            source_name: str = "fetch",
+            name: str = "pipeline",
+            describe: Callable[[Any], str] = repr,
+            join_timeout: float = 5.0
+            ) -> None:
+        self.source = Stage(source_name)
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.name = name
+        self.describe = describe
+        self.join_timeout = join_timeout
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        """Start every stage and yield the items coming out of the last one."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        consumers = [stage.workers for stage in self.stages] + [1]
+
+        # A profiled run also samples the threads it starts here
+        threads = [threading.Thread(
+            target=in_run(self._feed), args=(source, queues[0], consumers[0]), name=f"{self.name}-{self.source.name}", daemon=True
+        )]
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=in_run(self._work),
+                    args=(stage, queues[index], queues[index + 1], consumers[index + 1]),
+                    name=f"{self.name}-{stage.name}-{worker}",
+                    daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1])
+                PIPELINE_QUEUE_DEPTH.set(queues[-1].qsize(), pipeline=self.name, stage="output")
+                if item is _DONE or item is None:
+                    break
+                yield item
+        finally:
+            # Also reached when the consumer stops early: unblock and retire every thread
+            self._stop.set()
+            deadline = time.monotonic() + self.join_timeout
+            for thread in threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+            busy = [thread.name for thread in threads if thread.is_alive()]
+            if busy:
+                logger.warning(f"{self.name}: stopped with {len(busy)} threads still busy, left to finish in the background: {', '.join(busy)}")
+        if self._error is not None:
+            raise self._error
+
+    def timings(self) -> dict[str, dict[str, Any]]:
+        """Items handled, wall time and summed worker time of every stage, in order."""
+        return {stage.name: stage.timings() for stage in (self.source, *self.stages)}
+
+    def failures(self) -> list[dict[str, str]]:
+        """The items a stage dropped on an error, as {"stage", "item", "error"}, stage by stage."""
+        return [failure for stage in self.stages for failure in list(stage.failures)]
+
+    def _feed(self, source: Iterable[Any], output: queue.Queue, consumers: int) -> None:
+        stage = self.source
+        stage.started_at = time.perf_counter()
+        iterator = iter(source)
+        try:
+            while not self._stop.is_set():
+                began = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stage._record(time.perf_counter() - began)
+                if not self._put(output, item):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            stage.finished_at = time.perf_counter()
+            for _ in range(consumers):
+                self._put(output, _DONE)
+
+    def _work(self, stage: Stage, source: queue.Queue, output: queue.Queue, consumers: int) -> None:
+        with stage._lock:
+            if stage.started_at is None:
+                stage.started_at = time.perf_counter()
+        while True:
+            item = self._get(source)
+            PIPELINE_QUEUE_DEPTH.set(source.qsize(), pipeline=self.name, stage=stage.name)
+            if item is _DONE or item is None:
+                break
+            began = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                failure = {"stage": stage.name, "item": self._describe(item), "error": str(e) or type(e).__name__}
+                stage._record(time.perf_counter() - began, failure)
+                PIPELINE_ERRORS.inc(pipeline=self.name, stage=stage.name)
+                logger.warning(f"{stage.name}: skipping {failure['item']} due to error: {failure['error']}")
+                continue
+            seconds = time.perf_counter() - began
+            stage._record(seconds)
+            PIPELINE_STAGE_SECONDS.observe(seconds, pipeline=self.name, stage=stage.name)
+            if result is not None and not self._put(output, result):
+                break
+
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last:
+            stage.finished_at = time.perf_counter()
+            for _ in range(consumers):
+                self._put(output, _DONE)
+
+    def _describe(self, item: Any) -> str:
+        try:
+            return self.describe(item)
+        except Exception:
+            return type(item).__name__
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        """Blocks while `target` is full; gives up (returns False) once the run is stopped."""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        """Blocks until an item arrives; returns None once the run is stopped."""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+
+def format_timings(timings: dict[str, dict[str, Any]]) -> str:
+    return ", ".join(
+        f"{name} {stage['wall_seconds']:.2f}s ({stage['items']} items, {stage['workers']} workers)"
+        for name, stage in timings.items()
+    )
@@ -1,18 +1,30 @@
-import requests
-import re
-
-from typing import Optional
-from datetime import datetime, timedelta, timezone
+import logging
+import time
+from typing import Iterator, Optional
+from datetime import datetime, timezone
 from dateutil.relativedelta import relativedelta
 from platforms.platform_abc import PlatformWrapper
+from platforms.chesscom_archive_fetcher import ChessComArchiveFetcher
+from platforms.pgn_movetext import Movetext, parse_movetext, parse_movetexts, parse_time_control, time_deltas
 from common.player import Player
 from common.game import Game
+from data.game_store import GameStore
+from utils.metrics import GAMES_PARSED, GAMES_SKIPPED, PARSE_SECONDS
+
+logger = logging.getLogger("chessmate")
 
 
 class ChessComWrapper(PlatformWrapper):
+    # Each downloaded month is saved whole, together with closing it once it has ended
+    saves_fetched_games = True
+
     def __init__(self, platform_config: dict[str, any]) -> None:
         self._name = platform_config['name']
         self.api_url = platform_config["url"]
+        self.fetcher = ChessComArchiveFetcher(
+            self.api_url, max_concurrency=platform_config.get("max_concurrency", 8), platform=self._name
+        )
+        self.game_store: Optional[GameStore] = None
 
     @property
     def name(self) -> str:
@@ -25,6 +37,23 @@ class ChessComWrapper(PlatformWrapper):
         end_dt_utc: Optional[datetime] = None,
         number_of_games: Optional[int] = None
     ) -> Player:
+        player = Player(username)
+        player.add_games(list(self.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games)))
+        return player
+
+    def iter_games_by_username(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None
+    ) -> Iterator[Game]:
+        """
+        Yields games newest first, one monthly archive at a time. With a game store attached,
+        every downloaded month is saved whole before its games are yielded, and months the
+        server reports unchanged are read back from it; a month that has ended and parsed
+        without skipped games is closed in the same write and never requested again.
+        """
         if start_dt_utc is None:
             start_dt_utc = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         if end_dt_utc is None:
@@ -33,99 +62,75 @@ class ChessComWrapper(PlatformWrapper):
         start_dt_utc = start_dt_utc.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         end_dt_utc = (end_dt_utc.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + relativedelta(months=1))
 
-        player = Player(username)
         collected_games = 0
-        current_month = end_dt_utc - relativedelta(months=1)
-
-        while current_month >= start_dt_utc:
-            games = self._fetch_games_for_month(username, current_month.year, current_month.month)
-            self._parse_games(games, player, number_of_games, collected_games)
-            if number_of_games and collected_games >= number_of_games:
-                break
-            current_month -= relativedelta(months=1)
 
-        return player
+        store = self.game_store
+        closed_months = store.closed_months(self.name, username) if store is not None else set()
+        now = datetime.now(timezone.utc)
+
+        # With a store every downloaded month is saved whole, so an unchanged month is read from it
+        months = self.fetcher.iter_months(username, start_dt_utc, end_dt_utc, closed_months, revalidate=store is not None)
+        for year, month, games in months:
+            if games is None:
+                month_games = store.month_games(self.name, username, year, month)
+            elif store is not None:
+                skipped = []
+                month_games = list(self._iter_parsed_games(games, username, skipped))
+                ended = (year, month) < (now.year, now.month)
+                try:
+                    store.save_games(
+                        self.name, username, month_games, closed_month=(year, month) if ended and not skipped else None
+                    )
+                except Exception:
+                    self.fetcher.forget(self.fetcher.month_url(username, year, month))
+                    raise
+            else:
+                month_games = self._iter_parsed_games(games, username)
+            for game in month_games:
+                yield game
+                collected_games += 1
+                if number_of_games and collected_games >= number_of_games:
+                    return
 
     def _fetch_games_for_month(self, username: str, year: int, month: int) -> list[dict]:
-        url = f"{self.api_url}/player/{username}/games/{year}/{month:02d}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; ChessComWrapper/1.0; +https://github.com/therealchessmate/chessmate)"
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json().get("games", [])
-
-    def _parse_games(self, games: list[dict], player: Player, max_games: Optional[int], collected_games: int):
-        for game_data in games:
-            if game_data.get("rules") != "chess":
-                continue  # Skip chess960, atomic, etc.
-
+        return self.fetcher.fetch_month(self.fetcher.month_url(username, year, month))
+
+    def _iter_parsed_games(self, games: list[dict], username: str, skipped: Optional[list[str]] = None) -> Iterator[Game]:
+        # Skip chess960, atomic, etc.; archives are chronological, so walk them backwards
+        # to make a game limit keep the newest games. Games that fail to parse are added to `skipped`
+        began = time.perf_counter()
+        games = [game_data for game_data in reversed(games) if game_data.get("rules") == "chess"]
+        # The whole month's movetext is tokenized in one batch
+        movetexts = [game_data.get("pgn", "").partition("\n\n")[2] for game_data in games]
+        parsed = parse_movetexts(movetexts)
+        PARSE_SECONDS.inc(time.perf_counter() - began, platform=self.name)
+
+        for index, game_data in enumerate(games):
+            began = time.perf_counter()
             try:
-                game = self._create_game_from_data(game_data, player.username)
-                player.add_game(game)
-                collected_games += 1
-                if max_games and collected_games >= max_games:
-                    break
+                if not movetexts[index]:
+                    raise ValueError("Invalid PGN format")
+                game = self._create_game_from_data(game_data, username, parsed.game(index))
             except Exception as e:
-                print(f"Skipping game due to error: {e}")
-                
-
-
-    def _create_game_from_data(self, game_data: dict, username: str) -> Game:
-        pgn = game_data.get("pgn", "")
-
-        try:
-            moves_section = pgn.split("\n\n", 1)[1].replace("\n", " ")
-        except IndexError:
-            raise ValueError("Invalid PGN format")
-
-        # Match lines like:
-        # 1. e4 {[%clk 0:10:00]}
-        # 1... e6 {[%clk 0:09:55]}
-        move_pattern = re.compile(
-            r'(?P<number>\d+)\.(?P<dots>\.\.)?\s*(?P<move>\S+)(?:\s*\{\[%clk (?P<clk>[^\]]+)\]\})?'
-        )
+                GAMES_SKIPPED.inc(platform=self.name)
+                logger.warning(f"Skipping game due to error: {e}")
+                if skipped is not None:
+                    skipped.append(game_data.get("url", ""))
+                continue
+            PARSE_SECONDS.inc(time.perf_counter() - began, platform=self.name)
+            GAMES_PARSED.inc(platform=self.name)
+            yield game
+
+    def _create_game_from_data(self, game_data: dict, username: str, parsed: Optional[Movetext] = None) -> Game:
+        if parsed is None:
+            try:
+                parsed = parse_movetext(game_data.get("pgn", "").split("\n\n", 1)[1])
+            except IndexError:
+                raise ValueError("Invalid PGN format")
 
-        def parse_clock(clk: str | None) -> float | None:
-            if not clk:
-                return None
-            parts = clk.split(":")
-            if len(parts) == 3:
-                h, m, s = int(parts[0]), int(parts[1]), float(parts[2])
-            elif len(parts) == 2:
-                h, m, s = 0, int(parts[0]), float(parts[1])
-            else:
-                return None
-            return h * 3600 + m * 60 + s
-
-        moves = []
-        time_spent = []
-
-        prev_white_clock = None
-        prev_black_clock = None
-
-        for match in move_pattern.finditer(moves_section):
-            is_black = match.group("dots") == ".."
-            move = match.group("move")
-            clock_str = match.group("clk")
-            clock = parse_clock(clock_str)
-
-            moves.append(move)
-
-            if is_black:
-                if clock is not None and prev_black_clock is not None:
-                    time_spent.append(prev_black_clock - clock)
-                else:
-                    time_spent.append(None)
-                if clock is not None:
-                    prev_black_clock = clock
-            else:
-                if clock is not None and prev_white_clock is not None:
-                    time_spent.append(prev_white_clock - clock)
-                else:
-                    time_spent.append(None)
-                if clock is not None:
-                    prev_white_clock = clock
+        initial, increment = parse_time_control(game_data.get("time_control", ""))
+        moves = parsed.moves
+        time_spent = time_deltas(parsed.clocks, initial, increment)
 
         # Metadata
         start_dt_utc = datetime.fromtimestamp(game_data.get("end_time", 0), tz=timezone.utc)
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import HTTP_BYTES, HTTP_REQUEST_SECONDS, HTTP_RESPONSES
+from utils.profiling import in_run
+
+USER_AGENT = "Mozilla/5.0 (compatible; ChessComWrapper/1.0; +https://github.com/therealchessmate/chessmate)"
+
+
+class ChessComArchiveFetcher:
+    """
+    Downloads Chess.com monthly game archives concurrently over one keep-alive session.
+
+    The archive list is read once per call and months are fetched in parallel up to
+    `max_concurrency`. The ETag/Last-Modified of the latest `max_validators` responses are
+    remembered (the games are not), so a caller that keeps its own copy of a month, such as
+    the game store, can revalidate it and pay a 304 instead of a full download.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        platform: str = "ChessCom",
+        max_validators: int = 4096
+    ) -> None:
+        self.api_url = api_url
+        self.platform = platform  # label of the request metrics
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # url -> (etag, last_modified), least recently used first
+        self._validators: OrderedDict[str, tuple[Optional[str], Optional[str]]] = OrderedDict()
+        self.max_validators = max_validators
+        self._lock = threading.Lock()
+        self.not_modified = 0
+
+    def get_archive_urls(self, username: str) -> list[str]:
+        """Returns the user's monthly archive URLs, oldest first."""
+        url = f"{self.api_url}/player/{username}/games/archives"
+        response = self._get(url)
+        response.raise_for_status()
+        return response.json().get("archives", [])
+
+    def month_url(self, username: str, year: int, month: int) -> str:
+        # Lowercase, as in the archive list, so it names the same validators as the listed URL
+        return f"{self.api_url}/player/{username.lower()}/games/{year}/{month:02d}"
+
+    def fetch_month(self, url: str, revalidate: bool = False) -> Optional[list[dict]]:
+        """
+        Fetch one monthly archive. With `revalidate` the validators of the last download are
+        sent along, and None is returned when the server answers that the month is unchanged:
+        the caller's own copy is still current.
+        """
+        headers = {}
+        if revalidate:
+            with self._lock:
+                known = self._validators.get(url)
+                if known is not None:
+                    self._validators.move_to_end(url)
+            if known is not None:
+                etag, last_modified = known
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+
+        response = self._get(url, headers)
+        if response.status_code == 304 and headers:
+            with self._lock:
+                self.not_modified += 1
+            return None
+        response.raise_for_status()
+
+        games = response.json().get("games", [])
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            with self._lock:
+                self._validators[url] = (etag, last_modified)
+                self._validators.move_to_end(url)
+                while len(self._validators) > self.max_validators:
+                    self._validators.popitem(last=False)
+        return games
+
+    def forget(self, url: str) -> None:
+        """Drop the validators of a month whose copy the caller could not keep, so it is downloaded in full next time."""
+        with self._lock:
+            self._validators.pop(url, None)
+
+    def _get(self, url: str, headers: Optional[dict[str, str]] = None) -> requests.Response:
+        began = time.perf_counter()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - began, platform=self.platform)
+        HTTP_RESPONSES.inc(platform=self.platform, status=response.status_code)
+        HTTP_BYTES.inc(len(response.content), platform=self.platform)
+        return response
+
+    def iter_months(
+        self,
+        username: str,
+        start_dt_utc: datetime,
+        end_dt_utc: datetime,
+        skip_months: Optional[set[tuple[int, int]]] = None,
+        revalidate: bool = False
+    ) -> Iterator[tuple[int, int, Optional[list[dict]]]]:
+        """
+        Yields (year, month, games) for every archive in [start_dt_utc, end_dt_utc), newest first.
+        The (year, month) pairs in `skip_months` are not downloaded and come with games None,
+        as do months found unchanged when `revalidate` (see `fetch_month`).
+        Months are downloaded `max_concurrency` at a time, so a consumer that stops early
+        never waits on more than one window of unneeded requests.
+        """
+        start_key = (start_dt_utc.year, start_dt_utc.month)
+        end_key = (end_dt_utc.year, end_dt_utc.month)
+        skip_months = skip_months or set()
+
+        months = []
+        for url in self.get_archive_urls(username):
+            year, month = (int(part) for part in url.rstrip("/").split("/")[-2:])
+            if start_key <= (year, month) < end_key:
+                months.append((year, month, url))
+        months.sort(reverse=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="chesscom", initializer=in_run()) as executor:
+            i = 0
+            while i < len(months):
+                # A window holds up to max_concurrency downloads plus the skipped months between them
+                window, downloads = [], 0
+                while i < len(months) and downloads < self.max_concurrency:
+                    year, month, url = months[i]
+                    skipped = (year, month) in skip_months
+                    window.append((year, month, None if skipped else executor.submit(self.fetch_month, url, revalidate)))
+                    downloads += not skipped
+                    i += 1
+                for year, month, future in window:
+                    yield year, month, None if future is None else future.result()
+
+    def close(self) -> None:
+        self.session.close()
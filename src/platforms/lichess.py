@@ -1,10 +1,29 @@
 import requests
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 from datetime import datetime, timezone
 import json
+import logging
+import time
+
+import numpy as np
+
+from platforms.pgn_movetext import time_deltas
 from platforms.platform_abc import PlatformWrapper
+from common.evaluation import mate_to_cp
 from common.player import Player
 from common.game import Game
+from utils.metrics import GAMES_PARSED, GAMES_SKIPPED, HTTP_BYTES, HTTP_REQUEST_SECONDS, HTTP_RESPONSES, PARSE_SECONDS
+
+logger = logging.getLogger("chessmate")
+
+# Use a fast JSON decoder when one is installed; all of them accept the raw bytes of a line
+try:
+    from orjson import loads as _loads
+except ImportError:
+    try:
+        from msgspec.json import decode as _loads
+    except ImportError:
+        _loads = json.loads
 
 
 class LichessWrapper(PlatformWrapper):
@@ -12,6 +31,8 @@ class LichessWrapper(PlatformWrapper):
         self._name = platform_config['name']
         self.api_url = platform_config["url"]
         self.token = platform_config["token"]
+        # Lichess does not report the depth of its server analysis; this is how deep we take it to be
+        self.analysis_depth = platform_config.get("analysis_depth", 18)
 
     @property
     def name(self) -> str:
@@ -27,10 +48,44 @@ class LichessWrapper(PlatformWrapper):
         if number_of_games is not None and (start_dt_utc is not None or end_dt_utc is not None):
             raise ValueError("Cannot specify number_of_games with start_dt_utc or end_dt_utc")
 
-        response = self._fetch_games(username, start_dt_utc, end_dt_utc, number_of_games)
-        return self._parse_games(response.iter_lines(), username)
+        player = Player(username)
+        player.add_games(list(self.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games)))
+        return player
 
-    def _fetch_games(self, username: str, start_dt_utc: Optional[datetime], end_dt_utc: Optional[datetime], number_of_games: Optional[int]):
+    def iter_games_by_username(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None,
+        speeds: Optional[set[str]] = None
+    ) -> Iterator[Game]:
+        """
+        Yields games as their NDJSON lines arrive, so analysis can start on the first game
+        while the rest of the export is still downloading. The HTTP stream is closed as soon
+        as `number_of_games` games matching `speeds` have been yielded.
+        """
+        response = self._fetch_games(username, start_dt_utc, end_dt_utc, number_of_games, speeds)
+        try:
+            yielded = 0
+            for game in self._iter_parsed_games(self._counted(response.iter_lines()), username):
+                if speeds and game.speed not in speeds:
+                    continue
+                yield game
+                yielded += 1
+                if number_of_games is not None and yielded >= number_of_games:
+                    break
+        finally:
+            response.close()
+
+    def _fetch_games(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime],
+        end_dt_utc: Optional[datetime],
+        number_of_games: Optional[int],
+        speeds: Optional[set[str]] = None
+    ):
         url = f"https://lichess.org/api/games/user/{username}"
         headers = {
             "Accept": "application/x-ndjson",
@@ -50,33 +105,55 @@ class LichessWrapper(PlatformWrapper):
                 params["since"] = int(start_dt_utc.timestamp() * 1000)
             if end_dt_utc:
                 params["until"] = int(end_dt_utc.timestamp() * 1000)
+        if speeds:
+            # Filter server-side too, so that `max` counts only matching games
+            params["perfType"] = ",".join(sorted(speeds))
 
+        began = time.perf_counter()
         response = requests.get(url, headers=headers, params=params, stream=True)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - began, platform=self.name)
+        HTTP_RESPONSES.inc(platform=self.name, status=response.status_code)
         response.raise_for_status()
         return response
 
-    def _parse_games(self, lines, username: str) -> Player:
+    def _counted(self, lines: Iterable[bytes]) -> Iterator[bytes]:
+        """The export's lines, counting the bytes downloaded as they stream in."""
+        for line in lines:
+            HTTP_BYTES.inc(len(line) + 1, platform=self.name)
+            yield line
+
+    def _parse_games(self, lines: Iterable[bytes], username: str) -> Player:
         player = Player(username)
+        player.add_games(list(self._iter_parsed_games(lines, username)))
+        return player
+
+    def _iter_parsed_games(self, lines: Iterable[bytes], username: str) -> Iterator[Game]:
         for line in lines:
             if not line:
                 continue
+            began = time.perf_counter()
             try:
-                game_data = json.loads(line.decode("utf-8"))
+                game_data = _loads(line)
 
                 # Filter: only normal chess games
                 if game_data.get("variant", 'unkown') != "standard":
                     continue
 
                 game = self._create_game_from_data(game_data, username)
-                player.add_game(game)
             except Exception as e:
-                print(f"Skipping game due to error: {e}")
-        return player
+                GAMES_SKIPPED.inc(platform=self.name)
+                logger.warning(f"Skipping game due to error: {e}")
+                continue
+            PARSE_SECONDS.inc(time.perf_counter() - began, platform=self.name)
+            GAMES_PARSED.inc(platform=self.name)
+            yield game
 
     def _create_game_from_data(self, game_data: dict, username: str) -> Game:
         move_list = game_data.get("moves", "").split()
         evals = self._extract_evaluations(game_data, len(move_list))
-        clocks = game_data.get("clocks", [])
+        clock = game_data.get("clock", {})
+        # Remaining time after each move, in centiseconds; stored as seconds spent, like the other platforms
+        clocks = np.asarray(game_data.get("clocks", [])[:len(move_list)], dtype=np.float32) / 100
 
         # Determine player's color
         white_player = game_data.get("players", {}).get("white", {}).get("user", {}).get("name", "").lower()
@@ -99,19 +176,20 @@ class LichessWrapper(PlatformWrapper):
             winner=game_data.get("winner", "draw") if game_data.get("winner") else "draw",
             moves=move_list,
             evaluations=evals,
-            time_spent=clocks,
-            player_color=player_color
+            time_spent=time_deltas(clocks, clock.get("initial"), clock.get("increment", 0)),
+            player_color=player_color,
+            eval_source=self.name if evals else None,
+            eval_depth=self.analysis_depth if evals else None
         )
 
-    def _extract_evaluations(self, game_data: dict, move_count: int) -> list[str]:
+    def _extract_evaluations(self, game_data: dict, move_count: int) -> list[Optional[int]]:
+        """White-POV centipawns after every move; None for a move the analysis has no score for."""
         evals = []
         for step in game_data.get("analysis", []):
             if "eval" in step:
-                evals.append(str(step["eval"]))
+                evals.append(int(step["eval"]))
             elif "mate" in step:
-                mate_score = step["mate"]
-                if mate_score > 0:
-                    evals.append(f"mate in {mate_score}")
-                else:
-                    evals.append(f"mated in {abs(mate_score)}")
+                evals.append(mate_to_cp(step["mate"]))
+            else:
+                evals.append(None)
         return evals[:move_count]
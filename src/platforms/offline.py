@@ -1,22 +1,44 @@
-import json
-from typing import Any, Optional
+import logging
+import sqlite3
+from typing import Any, Iterator, Optional
 from datetime import datetime
 from pathlib import Path
 
+from platforms.offline_importer import ImportFilter, OfflineImporter
+from platforms.offline_index import OfflineIndex
 from platforms.platform_abc import PlatformWrapper
-from common_objects.player import Player
-from common_objects.game import Game
+from common.move_table import MoveTable
+from common.player import Player
+from common.game import Game
+
+logger = logging.getLogger("chessmate")
 
 class OfflineWrapper(PlatformWrapper):
+    """
+    Games from local dumps: a PGN or NDJSON file, optionally .zst-compressed, or a
+    directory of them. Files are parsed in parallel by an OfflineImporter.
+
+    Uncompressed files get an OfflineIndex on first use, so per-player queries and id
+    lookups only parse the records they need. Compressed files, and files whose index
+    cannot be written anywhere, are scanned every time.
+    """
+
     def __init__(self, platform_config: dict[str, Any]) -> None:
         self._name = platform_config['name']
-        self.data_path = Path(platform_config['path'])  # path to the NDJSON file or JSON list
+        self.importer = OfflineImporter(
+            platform_config['path'],
+            processes=platform_config.get('processes'),
+            chunk_bytes=platform_config.get('chunk_mb', 64) * 1024 * 1024,
+        )
+        self.analysis_depth = platform_config.get('analysis_depth', 18)
+        self.use_index = platform_config.get('index', True)
+        self._indexes: dict[Path, Optional[OfflineIndex]] = {}  # None for files that could not be indexed
 
     @property
     def name(self) -> str:
         return self._name
 
-    def get_player_by_username(
+    def get_games_by_username(
         self,
         username: str,
         start_dt_utc: Optional[datetime] = None,
@@ -24,59 +46,68 @@ class OfflineWrapper(PlatformWrapper):
         number_of_games: Optional[int] = None
     ) -> Player:
         player = Player(username)
-        games_loaded = 0
-
-        with self.data_path.open('r', encoding='utf-8') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-
-                try:
-                    game_data = json.loads(line)
-
-                    created_at = datetime.fromtimestamp(game_data["createdAt"] / 1000)
-                    if start_dt_utc and created_at < start_dt_utc:
-                        continue
-                    if end_dt_utc and created_at > end_dt_utc:
-                        continue
-
-                    move_list = game_data.get("moves", "").split()
-
-                    evals = []
-                    if "analysis" in game_data:
-                        for step in game_data["analysis"]:
-                            eval_info = step.get("eval")
-                            if eval_info is not None:
-                                evals.append(eval_info)
-                    evals = evals[:len(move_list)]
+        player.add_games(list(self.iter_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games)))
+        return player
 
-                    times = []
-                    if "clock" in game_data and "clock" in game_data["clock"]:
-                        times = game_data["clock"]["clock"]
-                        if isinstance(times, list):
-                            times = times[:len(move_list)]
+    def iter_games_by_username(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None,
+        speeds: Optional[set[str]] = None
+    ) -> Iterator[Game]:
+        """Newest first, like the online platforms. Files without an index are scanned in full."""
+        game_filter = self._filter([username], speeds, start_dt_utc, end_dt_utc)
+        games, unindexed = [], []
+        for path in self.importer.files():
+            index = self._index(path)
+            if index is None:
+                unindexed.append(path)
+                continue
+            spans = index.spans_of_player(username, start_dt_utc, end_dt_utc, speeds, number_of_games)
+            games.extend(self.importer.read_games(path, [(offset, length) for _, offset, length in spans], game_filter))
+        if unindexed:
+            games.extend(self.importer.iter_games(game_filter, files=unindexed))
 
-                    game = Game(
-                        id=game_data["id"],
-                        start_dt_utc=created_at,
-                        platform=self.name,
-                        speed=game_data.get("speed", "unknown"),
-                        opening=game_data.get("opening", {}).get("name", "Unknown"),
-                        status=game_data.get("status", "unknown"),
-                        winner=game_data.get("winner", "draw") if game_data.get("winner") else "draw",
-                        moves=move_list,
-                        evaluations=evals,
-                        time_spent=times
-                    )
+        games.sort(key=lambda game: game.start_dt_utc, reverse=True)
+        yield from games[:number_of_games]
 
-                    player.add_game(game)
-                    games_loaded += 1
-                    print(game.to_dataframe())
+    def get_game_by_id(self, game_id: str) -> Optional[Game]:
+        """A single game by id, read straight from its offset in an indexed file."""
+        for path in self.importer.files():
+            index = self._index(path)
+            span = index.span_of(game_id) if index is not None else None
+            if span is not None:
+                return next(self.importer.read_games(path, [span], self._filter(None, None, None, None)), None)
+        return None
 
-                    if number_of_games is not None and games_loaded >= number_of_games:
-                        break
+    def import_table(
+        self,
+        usernames: Optional[list[str]] = None,
+        speeds: Optional[set[str]] = None,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None
+    ) -> MoveTable:
+        """Bulk import of every matching game, for any number of players, into one columnar table."""
+        return self.importer.import_table(self._filter(usernames, speeds, start_dt_utc, end_dt_utc))
 
-                except Exception as e:
-                    print(f"Skipping game due to error: {e}")
+    def _index(self, path: Path) -> Optional[OfflineIndex]:
+        if not self.use_index or path.name.lower().endswith(".zst"):
+            return None
+        if path in self._indexes:
+            index = self._indexes[path]
+            if index is not None:
+                index.refresh()
+            return index
+        try:
+            index = OfflineIndex(path, self.importer)
+        except (sqlite3.Error, OSError) as e:
+            # Neither next to the file nor in the cache directory; the file is scanned instead
+            logger.warning(f"Not indexing {path}: {e}")
+            index = None
+        self._indexes[path] = index
+        return index
 
-        return player
+    def _filter(self, usernames, speeds, start_dt_utc, end_dt_utc) -> ImportFilter:
+        return ImportFilter(usernames, speeds, start_dt_utc, end_dt_utc, platform=self.name, analysis_depth=self.analysis_depth)
@@ -0,0 +1,440 @@
+import json
+import logging
+import mmap
+import os
+import re
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from common.evaluation import mate_to_cp
+from common.game import Game
+from common.move_table import MoveTable
+from platforms.pgn_movetext import Movetext, parse_movetext, parse_movetexts, parse_time_control, time_deltas
+from utils.metrics import GAMES_PARSED, GAMES_SKIPPED, PARSE_SECONDS
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+logger = logging.getLogger("chessmate")
+
+PGN_SUFFIXES = (".pgn", ".pgn.zst")
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".ndjson.zst", ".jsonl.zst")
+
+_HEADER = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$', re.MULTILINE)
+# Where the next record starts: a PGN game begins with its [Event] tag after a blank line,
+# which may hold whitespace or carriage returns
+_GAME_START = re.compile(rb"\n[ \t\r]*\n(?=\[Event )")
+_TAGS_END = re.compile(r"\n[ \t\r]*\n")
+_BOUNDARIES = {"pgn": _GAME_START, "ndjson": re.compile(rb"\n")}
+
+
+class GameHeader(NamedTuple):
+    """What a record says about a game before its moves are parsed."""
+    game_id: str
+    start_dt_utc: datetime
+    white: str
+    black: str
+    speed: str
+
+
+class ImportFilter:
+    """Which games an import keeps: by player (case-insensitive), speed and start time."""
+
+    def __init__(
+        self,
+        usernames: Optional[Iterable[str]] = None,
+        speeds: Optional[Iterable[str]] = None,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        platform: str = "Offline",
+        analysis_depth: Optional[int] = 18
+    ) -> None:
+        self.usernames = {name.lower() for name in usernames} if usernames else None
+        self.speeds = set(speeds) if speeds else None
+        self.start_dt_utc = start_dt_utc
+        self.end_dt_utc = end_dt_utc
+        self.platform = platform
+        self.analysis_depth = analysis_depth
+
+    def player_color(self, white: str, black: str) -> Optional[str]:
+        """The filtered player's colour, "white" when not filtering by player, None to skip the game."""
+        if self.usernames is None or white.lower() in self.usernames:
+            return "white"
+        if black.lower() in self.usernames:
+            return "black"
+        return None
+
+    def keeps(self, speed: str, start_dt_utc: datetime) -> bool:
+        if self.speeds is not None and speed not in self.speeds:
+            return False
+        if self.start_dt_utc is not None and start_dt_utc < self.start_dt_utc:
+            return False
+        return self.end_dt_utc is None or start_dt_utc <= self.end_dt_utc
+
+
+def file_format(path: Path) -> str:
+    name = path.name.lower()
+    if name.endswith(PGN_SUFFIXES):
+        return "pgn"
+    if name.endswith(NDJSON_SUFFIXES):
+        return "ndjson"
+    raise ValueError(f"Unsupported offline game file: {path}")
+
+
+def find_chunks(path: Path, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Splits an uncompressed file into (start, end) byte ranges that begin and end on game boundaries."""
+    size = path.stat().st_size
+    if size == 0:
+        return []
+    boundary = _BOUNDARIES[file_format(path)]
+    chunks = []
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            cut = boundary.search(mm, start + chunk_bytes) if start + chunk_bytes < size else None
+            end = size if cut is None else cut.end()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def _last_boundary(data: bytes, boundary: re.Pattern) -> int:
+    """Where the last record that starts in `data` begins, or -1; only the tail is searched until one is found."""
+    window = 64 * 1024
+    while True:
+        start = max(0, len(data) - window)
+        last = None
+        for last in boundary.finditer(data, start):
+            pass
+        if last is not None:
+            return last.end()
+        if start == 0:
+            return -1
+        window *= 4
+
+
+def speed_from_time_control(time_control: str) -> str:
+    """Lichess' speed categories, from the estimated game duration: base + 40 increments."""
+    if not time_control or time_control == "-":
+        return "correspondence"
+    base, _, increment = time_control.partition("+")
+    try:
+        duration = int(base) + 40 * int(increment or 0)
+    except ValueError:
+        return "unknown"
+    if duration < 30:
+        return "ultraBullet"
+    if duration < 180:
+        return "bullet"
+    if duration < 480:
+        return "blitz"
+    if duration < 1500:
+        return "rapid"
+    return "classical"
+
+
+def _pgn_header(headers: dict[str, str]) -> Optional[GameHeader]:
+    date = headers.get("UTCDate") or headers.get("Date", "")
+    try:
+        start_dt_utc = datetime.strptime(f"{date} {headers.get('UTCTime', '00:00:00')}", "%Y.%m.%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    white, black = headers.get("White", ""), headers.get("Black", "")
+    site = headers.get("Site", "")
+    game_id = headers.get("GameId") or site.rstrip("/").rsplit("/", 1)[-1] or f"{start_dt_utc.isoformat()}-{white}"
+    return GameHeader(game_id, start_dt_utc, white, black, speed_from_time_control(headers.get("TimeControl", "-")))
+
+
+def _pgn_accept(record: bytes, game_filter: ImportFilter) -> Optional[tuple]:
+    """(tags, header, player color, movetext) of a PGN record that passes the filter."""
+    text = record.decode("utf-8", errors="replace")
+    headers = dict(_HEADER.findall(text))
+    header = _pgn_header(headers)
+    if header is None:
+        return None
+    player_color = game_filter.player_color(header.white, header.black)
+    if player_color is None or not game_filter.keeps(header.speed, header.start_dt_utc):
+        return None
+    tags_end = _TAGS_END.search(text)
+    return headers, header, player_color, text[tags_end.start():] if tags_end is not None else ""
+
+
+def _pgn_game(record: bytes, game_filter: ImportFilter) -> Optional[Game]:
+    accepted = _pgn_accept(record, game_filter)
+    if accepted is None:
+        return None
+    return _pgn_build(accepted, parse_movetext(accepted[3]), game_filter)
+
+
+def _pgn_build(accepted: tuple, parsed: Movetext, game_filter: ImportFilter) -> Game:
+    headers, header, player_color, _ = accepted
+    initial, increment = parse_time_control(headers.get("TimeControl", "-"))
+    has_evals = not np.isnan(parsed.evals).all()
+    result = headers.get("Result", "*")
+
+    return Game(
+        id=header.game_id,
+        start_dt_utc=header.start_dt_utc,
+        platform=game_filter.platform,
+        speed=header.speed,
+        opening=headers.get("Opening", "Unknown"),
+        winner={"1-0": "white", "0-1": "black"}.get(result, "draw"),
+        moves=parsed.moves,
+        evaluations=parsed.evals if has_evals else [],
+        time_spent=time_deltas(parsed.clocks, initial, increment),
+        player_color=player_color,
+        eval_source=game_filter.platform if has_evals else None,
+        eval_depth=game_filter.analysis_depth if has_evals else None,
+    )
+
+
+def _ndjson_header(game_data: dict[str, Any]) -> Optional[GameHeader]:
+    if game_data.get("variant", "standard") != "standard":
+        return None
+    players = game_data.get("players", {})
+    return GameHeader(
+        game_data["id"],
+        datetime.fromtimestamp(game_data["createdAt"] / 1000, tz=timezone.utc),
+        players.get("white", {}).get("user", {}).get("name", ""),
+        players.get("black", {}).get("user", {}).get("name", ""),
+        game_data.get("speed", "unknown"),
+    )
+
+
+def _ndjson_game(record: bytes, game_filter: ImportFilter) -> Optional[Game]:
+    game_data = _loads(record)
+    header = _ndjson_header(game_data)
+    if header is None:
+        return None
+    player_color = game_filter.player_color(header.white, header.black)
+    if player_color is None or not game_filter.keeps(header.speed, header.start_dt_utc):
+        return None
+
+    moves = game_data.get("moves", "").split()
+    evals = []
+    for step in game_data.get("analysis", [])[:len(moves)]:
+        evals.append(int(step["eval"]) if "eval" in step else mate_to_cp(step["mate"]) if "mate" in step else None)
+    clock = game_data.get("clock", {})
+    # Remaining time after each move, in centiseconds
+    clocks = np.asarray(game_data.get("clocks", [])[:len(moves)], dtype=np.float32) / 100
+
+    return Game(
+        id=header.game_id,
+        start_dt_utc=header.start_dt_utc,
+        platform=game_filter.platform,
+        speed=header.speed,
+        opening=game_data.get("opening", {}).get("name", "Unknown"),
+        winner=game_data.get("winner") or "draw",
+        moves=moves,
+        evaluations=evals,
+        time_spent=time_deltas(clocks, clock.get("initial"), clock.get("increment", 0)),
+        player_color=player_color,
+        eval_source=game_filter.platform if evals else None,
+        eval_depth=game_filter.analysis_depth if evals else None,
+    )
+
+
+def iter_records(data: bytes, fmt: str) -> Iterator[tuple[int, bytes]]:
+    """(offset, bytes) of every non-empty record in a block of whole records."""
+    if fmt == "ndjson":
+        starts = [0, *(match.end() for match in re.finditer(b"\n", data))]
+    else:
+        starts = [0, *(match.end() for match in _GAME_START.finditer(data))]
+    for start, end in zip(starts, [*starts[1:], len(data)]):
+        record = data[start:end]
+        if record.strip():
+            yield start, record
+
+
+def read_header(record: bytes, fmt: str) -> Optional[GameHeader]:
+    if fmt == "ndjson":
+        return _ndjson_header(_loads(record))
+    text = record.decode("utf-8", errors="replace")
+    tags_end = _TAGS_END.search(text)
+    return _pgn_header(dict(_HEADER.findall(text[:tags_end.start()] if tags_end is not None else text)))
+
+
+def parse_record(record: bytes, fmt: str, game_filter: ImportFilter) -> Optional[Game]:
+    return _ndjson_game(record, game_filter) if fmt == "ndjson" else _pgn_game(record, game_filter)
+
+
+def parse_games(data: bytes, fmt: str, game_filter: ImportFilter) -> Iterator[Game]:
+    """Every game in a block of whole records that passes the filter."""
+    if fmt == "pgn":
+        yield from _parse_pgn_games(data, game_filter)
+        return
+    for _, record in iter_records(data, fmt):
+        try:
+            game = parse_record(record, fmt, game_filter)
+        except Exception as e:
+            logger.warning(f"Skipping game due to error: {e}")
+            continue
+        if game is not None:
+            yield game
+
+
+def _parse_pgn_games(data: bytes, game_filter: ImportFilter) -> Iterator[Game]:
+    # Headers are filtered record by record; the movetext of the kept games is tokenized in one batch
+    kept = []
+    for _, record in iter_records(data, "pgn"):
+        try:
+            accepted = _pgn_accept(record, game_filter)
+        except Exception as e:
+            logger.warning(f"Skipping game due to error: {e}")
+            continue
+        if accepted is not None:
+            kept.append(accepted)
+
+    parsed = parse_movetexts([accepted[3] for accepted in kept])
+    for index, accepted in enumerate(kept):
+        try:
+            yield _pgn_build(accepted, parsed.game(index), game_filter)
+        except Exception as e:
+            logger.warning(f"Skipping game due to error: {e}")
+
+
+def _read_range(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[start:end]
+
+
+def _games_in_block(block: Any, fmt: str, game_filter: ImportFilter) -> list[Game]:
+    data = _read_range(*block) if isinstance(block, tuple) else block
+    return list(parse_games(data, fmt, game_filter))
+
+
+def _table_of_block(block: Any, fmt: str, game_filter: ImportFilter) -> MoveTable:
+    # No replay: positions are worked out later, for the games that get analysed
+    data = _read_range(*block) if isinstance(block, tuple) else block
+    return MoveTable(parse_games(data, fmt, game_filter), positions=False)
+
+
+def _headers_of_block(block: tuple[str, int, int], fmt: str) -> list[tuple[int, int, GameHeader]]:
+    """(file offset, length, header) of every record in a byte range, without parsing any moves."""
+    path, block_start, block_end = block
+    entries = []
+    for offset, record in iter_records(_read_range(path, block_start, block_end), fmt):
+        try:
+            header = read_header(record, fmt)
+        except Exception as e:
+            logger.warning(f"Skipping game due to error: {e}")
+            continue
+        if header is not None:
+            entries.append((block_start + offset, len(record), header))
+    return entries
+
+
+class OfflineImporter:
+    """
+    Bulk reader for large game dumps: PGN or NDJSON, optionally zstd-compressed.
+
+    Plain files are memory-mapped and split into byte ranges on game boundaries, and each
+    range is read and parsed by a worker process. Compressed files are stream-decompressed
+    in this process and handed to the workers block by block, with a bounded number of
+    blocks in flight. Filters are applied in the workers, and only the headers of games
+    that are filtered out are parsed.
+    """
+
+    def __init__(self, path: str, processes: Optional[int] = None, chunk_bytes: int = 64 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+
+    def files(self) -> list[Path]:
+        if self.path.is_dir():
+            return sorted(p for p in self.path.iterdir() if p.name.lower().endswith(PGN_SUFFIXES + NDJSON_SUFFIXES))
+        return [self.path]
+
+    def iter_games(self, game_filter: ImportFilter, files: Optional[list[Path]] = None) -> Iterator[Game]:
+        """Yields the matching games as Game objects, in file order."""
+        for games in self._map(_games_in_block, game_filter, files=files):
+            GAMES_PARSED.inc(len(games), platform=game_filter.platform)
+            yield from games
+
+    def import_table(self, game_filter: ImportFilter) -> MoveTable:
+        """
+        Imports the matching games straight into one columnar MoveTable. The table has no
+        replay columns; `Game.replay` computes them for the games that are analysed.
+        """
+        began = time.perf_counter()
+        table = MoveTable(positions=False)
+        for chunk_table in self._map(_table_of_block, game_filter):
+            table.extend(chunk_table)
+        GAMES_PARSED.inc(len(table.game_ids), platform=game_filter.platform)
+        PARSE_SECONDS.inc(time.perf_counter() - began, platform=game_filter.platform)
+        return table
+
+    def iter_headers(self, path: Path) -> Iterator[tuple[int, int, GameHeader]]:
+        """(offset, length, header) of every game in an uncompressed file, for indexing."""
+        for entries in self._map(_headers_of_block, files=[path]):
+            yield from entries
+
+    def read_games(self, path: Path, spans: Iterable[tuple[int, int]], game_filter: ImportFilter) -> Iterator[Game]:
+        """Parses just the records at the given (offset, length) spans of a memory-mapped file."""
+        fmt = file_format(path)
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset, length in spans:
+                try:
+                    game = parse_record(mm[offset:offset + length], fmt, game_filter)
+                except Exception as e:
+                    GAMES_SKIPPED.inc(platform=game_filter.platform)
+                    logger.warning(f"Skipping game due to error: {e}")
+                    continue
+                if game is not None:
+                    GAMES_PARSED.inc(platform=game_filter.platform)
+                    yield game
+
+    def _map(self, worker, *args: Any, files: Optional[list[Path]] = None) -> Iterator[Any]:
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            pending: deque[Future] = deque()
+            try:
+                for path in files if files is not None else self.files():
+                    fmt = file_format(path)
+                    for block in self._blocks(path):
+                        pending.append(executor.submit(worker, block, fmt, *args))
+                        # Bound the decompressed data in flight; plain ranges are only offsets
+                        while len(pending) >= 2 * self.processes:
+                            yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # The consumer may stop early; don't parse blocks nobody will read
+                for future in pending:
+                    future.cancel()
+
+    def _blocks(self, path: Path) -> Iterator[Any]:
+        if path.name.lower().endswith(".zst"):
+            yield from self._decompressed_blocks(path)
+        else:
+            for start, end in find_chunks(path, self.chunk_bytes):
+                yield str(path), start, end
+
+    def _decompressed_blocks(self, path: Path) -> Iterator[bytes]:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading .zst game dumps requires the zstandard package") from e
+
+        boundary = _BOUNDARIES[file_format(path)]
+        with path.open("rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f)
+            buffer = b""
+            while True:
+                data = reader.read(self.chunk_bytes)
+                if not data:
+                    break
+                buffer += data
+                cut = _last_boundary(buffer, boundary)
+                if cut > 0:
+                    yield buffer[:cut]
+                    buffer = buffer[cut:]
+            if buffer.strip():
+                yield buffer
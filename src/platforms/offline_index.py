@@ -0,0 +1,155 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+from platforms.offline_importer import OfflineImporter
+
+
+def _cache_dir() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "chessmate" / "offline_index"
+
+
+class OfflineIndex:
+    """
+    Side index of one uncompressed offline game file, stored next to it as `<file>.idx.sqlite`,
+    or under the user's cache directory when the file's directory cannot be written to.
+
+    Maps every game id to the byte offset and length of its record, and every player to
+    the records of their games by start time, so queries seek straight to the matching
+    records instead of parsing the whole file. The index remembers the file's size and
+    mtime and is rebuilt when either changes.
+    """
+
+    def __init__(self, path: Path, importer: OfflineImporter) -> None:
+        self.path = Path(path)
+        self.importer = importer
+        self._lock = threading.Lock()
+        # The cache copy is named after the file's full path, so equally named dumps don't share it
+        digest = hashlib.sha1(str(self.path.resolve()).encode()).hexdigest()[:16]
+        candidates = [self.path.with_name(self.path.name + ".idx.sqlite"), _cache_dir() / f"{self.path.name}-{digest}.idx.sqlite"]
+        for index_path in candidates:
+            try:
+                self._db = self._open(index_path)
+            except (sqlite3.Error, OSError):
+                if index_path == candidates[-1]:
+                    raise
+                continue
+            self.index_path = index_path
+            break
+        self.refresh()
+
+    @staticmethod
+    def _open(index_path: Path) -> sqlite3.Connection:
+        """Connects to an index file, failing right away if it cannot be written."""
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(index_path, check_same_thread=False)
+        try:
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS meta (size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS games (
+                    game_id TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS player_games (
+                    player TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    speed TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS player_games_by_time ON player_games (player, start_ts);
+                BEGIN IMMEDIATE;
+                ROLLBACK;
+                """
+            )
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
+
+    def is_current(self) -> bool:
+        stat = self.path.stat()
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns FROM meta").fetchone()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def build(self, batch_size: int = 100_000) -> int:
+        """(Re)indexes the file from its headers, in parallel. Returns the number of games."""
+        stat = self.path.stat()
+        count = 0
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM games")
+            self._db.execute("DELETE FROM player_games")
+            games, player_games = [], []
+            for offset, length, header in self.importer.iter_headers(self.path):
+                games.append((header.game_id, offset, length))
+                start_ts = header.start_dt_utc.timestamp()
+                for player in {header.white.lower(), header.black.lower()}:
+                    player_games.append((player, start_ts, header.speed, offset, length))
+                if len(games) >= batch_size:
+                    count += self._insert(games, player_games)
+                    games, player_games = [], []
+            count += self._insert(games, player_games)
+            self._db.execute("INSERT INTO meta VALUES (?, ?)", (stat.st_size, stat.st_mtime_ns))
+        return count
+
+    def refresh(self) -> None:
+        """Rebuilds the index if the file changed since it was built."""
+        if not self.is_current():
+            self.build()
+
+    def _insert(self, games: list[tuple], player_games: list[tuple]) -> int:
+        self._db.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?)", games)
+        self._db.executemany("INSERT INTO player_games VALUES (?, ?, ?, ?, ?)", player_games)
+        return len(games)
+
+    def span_of(self, game_id: str) -> Optional[tuple[int, int]]:
+        """(offset, length) of a game's record, or None if the file does not have it."""
+        with self._lock:
+            return self._db.execute("SELECT offset, length FROM games WHERE game_id = ?", (game_id,)).fetchone()
+
+    def spans_of_player(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        speeds: Optional[Iterable[str]] = None,
+        number_of_games: Optional[int] = None
+    ) -> list[tuple[float, int, int]]:
+        """(start_ts, offset, length) of a player's games in a window, newest first."""
+        query = "SELECT start_ts, offset, length FROM player_games WHERE player = ?"
+        params: list = [username.lower()]
+        if start_dt_utc is not None:
+            query += " AND start_ts >= ?"
+            params.append(start_dt_utc.timestamp())
+        if end_dt_utc is not None:
+            query += " AND start_ts <= ?"
+            params.append(end_dt_utc.timestamp())
+        if speeds:
+            speeds = list(speeds)
+            query += f" AND speed IN ({', '.join('?' * len(speeds))})"
+            params.extend(speeds)
+        query += " ORDER BY start_ts DESC, offset"
+        if number_of_games is not None:
+            query += " LIMIT ?"
+            params.append(number_of_games)
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    def date_range(self, username: str) -> Optional[tuple[float, float]]:
+        """Timestamps of a player's first and last game in the file."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(start_ts), MAX(start_ts) FROM player_games WHERE player = ?", (username.lower(),)
+            ).fetchone()
+        return row if row[0] is not None else None
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,280 @@
+import re
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from common.evaluation import MATE_SCORE_CP
+
+# Regex fallback for movetext with ";" line comments, which the array tokenizer does not
+# model. One match per ply: optional move number, the SAN, any NAGs and the comment that
+# follows, with its %eval and %clk annotations in either order. Comments, variation brackets
+# and result tokens that are not attached to a move match the trailing alternatives.
+_PLY = re.compile(
+    r"(?:\d+\.+\s*)?"
+    r"([A-Za-z][^\s{}()$;]*)"
+    r"(?:\s*\$\d+)*"
+    r"(?:\s*\{\s*"
+    r"(?:\[%eval\s+(#?-?[\d.]+)[^\]]*\]\s*)?"
+    r"(?:\[%clk\s+(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)\]\s*)?"
+    r"(?:\[%eval\s+(#?-?[\d.]+)[^\]]*\]\s*)?"
+    r"[^}]*\})?"
+    r"|\{[^}]*\}|;[^\n]*|[()]"
+)
+_COMMENT_OR_PAREN = re.compile(r"\{[^}]*\}|;[^\n]*|[()]")
+
+# Bytes that end a token outside comments
+_DELIMITERS = np.zeros(256, dtype=bool)
+_DELIMITERS[np.frombuffer(b" \t\r\n{}()$;", dtype=np.uint8)] = True
+_LETTERS = np.zeros(256, dtype=bool)
+_LETTERS[np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", dtype=np.uint8)] = True
+_VALUE_WIDTH = 12  # bytes read after "%clk" / "%eval"
+_LEADING = np.frombuffer(b" #-+", dtype=np.uint8)
+
+
+class Movetext(NamedTuple):
+    moves: list[str]
+    clocks: np.ndarray  # float32 seconds left on the mover's clock after each ply, NaN if not annotated
+    evals: np.ndarray   # float32 white-POV centipawns from %eval, NaN if not annotated
+
+
+class MovetextBatch(NamedTuple):
+    """Many games' movetext parsed together; game i owns plies offsets[i]:offsets[i + 1]."""
+    moves: list[str]
+    clocks: np.ndarray
+    evals: np.ndarray
+    offsets: np.ndarray
+
+    def game(self, index: int) -> Movetext:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return Movetext(self.moves[start:end], self.clocks[start:end], self.evals[start:end])
+
+
+def parse_movetext(movetext: str) -> Movetext:
+    """Mainline SAN moves of one PGN movetext with their %clk and %eval annotations."""
+    return parse_movetexts([movetext]).game(0)
+
+
+def parse_movetexts(movetexts: Sequence[str]) -> MovetextBatch:
+    """
+    Mainline SAN moves of many PGN movetexts with their %clk and %eval annotations.
+
+    All games are tokenized together with array operations over one byte buffer, so no
+    Python code runs per ply; only the SAN strings themselves are created. Move numbers, NAGs, results
+    and comments are skipped; variations are dropped.
+    """
+    movetexts = list(movetexts)
+    fallback = [index for index, text in enumerate(movetexts) if ";" in text]
+    if fallback:
+        batch = _tokenize([text if ";" not in text else "" for text in movetexts])
+        return _merge_fallback(batch, {index: _parse_with_regex(movetexts[index]) for index in fallback})
+    return _tokenize(movetexts)
+
+
+def _tokenize(movetexts: list[str]) -> MovetextBatch:
+    joined = "\n".join(movetexts)
+    is_ascii = joined.isascii()
+    raw = joined.encode("ascii" if is_ascii else "utf-8")
+    lengths = [len(text) if is_ascii else len(text.encode("utf-8")) for text in movetexts]
+    game_starts = np.zeros(len(movetexts), dtype=np.int64)
+    np.cumsum(np.asarray(lengths[:-1], dtype=np.int64) + 1, out=game_starts[1:])
+
+    data = np.frombuffer(raw, dtype=np.uint8)
+    size = len(data)
+    delimiters = _DELIMITERS[data]
+    # A move starts with a letter right after a delimiter or a move number's dot
+    after_break = np.ones(size, dtype=bool)
+    np.logical_or(delimiters[:-1], data[:-1] == ord("."), out=after_break[1:])
+    candidates = np.flatnonzero(_LETTERS[data] & after_break)
+
+    # Comments don't nest, so an offset is inside one if more braces opened than closed before it
+    opening, closing = np.flatnonzero(data == ord("{")), np.flatnonzero(data == ord("}"))
+    parens = np.flatnonzero((data == ord("(")) | (data == ord(")")))
+    parens = parens[~_in_comment(parens, opening, closing)]
+    depth = np.cumsum(np.where(data[parens] == ord("("), 1, -1), dtype=np.int32)
+    starts = candidates[~_in_comment(candidates, opening, closing) & ~_in_variation(candidates, parens, depth)]
+
+    breaks = np.append(np.flatnonzero(delimiters), size)
+    ends = breaks[np.searchsorted(breaks, starts)]
+    moves = _slice_tokens(data, starts, ends)
+
+    clocks = np.full(len(starts), np.nan, dtype=np.float32)
+    evals = np.full(len(starts), np.nan, dtype=np.float32)
+    ply_game = np.searchsorted(game_starts, starts, side="right") - 1
+    for command, target in ((b"%clk", clocks), (b"%eval", evals)):
+        positions = _find(data, command)
+        positions = positions[~_in_variation(positions, parens, depth)]
+        # An annotation belongs to the closest move before it in the same game
+        plies = np.searchsorted(starts, positions, side="right") - 1
+        owned = plies >= 0
+        owned[owned] = ply_game[plies[owned]] == np.searchsorted(game_starts, positions[owned], side="right") - 1
+        values, mates = _parse_values(data, positions[owned] + len(command))
+        if command == b"%eval":
+            values = np.where(mates, np.sign(values) * MATE_SCORE_CP - values, np.round(values * 100))
+        target[plies[owned]] = values
+
+    offsets = np.zeros(len(movetexts) + 1, dtype=np.int64)
+    offsets[1:] = np.searchsorted(ply_game, np.arange(len(movetexts)), side="right")
+    return MovetextBatch(moves, clocks, evals, offsets)
+
+
+def _slice_tokens(data: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> list[str]:
+    """The tokens at [start, end) as strings, via one str.split over a copy blanked outside them."""
+    edges = np.zeros(len(data) + 1, dtype=np.int8)
+    edges[starts] = 1
+    edges[ends] = -1
+    kept = np.cumsum(edges[:-1], dtype=np.int8).view(bool)
+    tokens = np.where(kept, data, np.uint8(ord(" "))).tobytes().decode("utf-8", errors="replace").split()
+    if len(tokens) == len(starts):
+        return tokens
+    # Unicode whitespace inside a token; slice them one by one instead
+    raw = data.tobytes()
+    return [raw[start:end].decode("utf-8", errors="replace") for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def _in_comment(positions: np.ndarray, opening: np.ndarray, closing: np.ndarray) -> np.ndarray:
+    return np.searchsorted(opening, positions, side="right") > np.searchsorted(closing, positions)
+
+
+def _in_variation(positions: np.ndarray, parens: np.ndarray, depth: np.ndarray) -> np.ndarray:
+    """Whether each offset is inside a variation, from the running bracket depth outside comments."""
+    if not len(parens):
+        return np.zeros(len(positions), dtype=bool)
+    before = np.searchsorted(parens, positions, side="right") - 1
+    return (before >= 0) & (depth[np.maximum(before, 0)] > 0)
+
+
+def _find(data: np.ndarray, needle: bytes) -> np.ndarray:
+    """Start offsets of every occurrence of needle in data."""
+    found = np.flatnonzero(data[:len(data) - len(needle) + 1] == needle[0])
+    for shift, byte in enumerate(needle[1:], start=1):
+        found = found[data[found + shift] == byte]
+    return found
+
+
+def _parse_values(data: np.ndarray, positions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Numbers following the given offsets: "H:MM:SS.s" clocks as seconds, "-1.25" evals as-is
+    and "#-3" mates as signed move counts (flagged in the second array). NaN if unreadable.
+    """
+    columns = np.minimum(positions[:, None] + np.arange(_VALUE_WIDTH), len(data) - 1)
+    window = data[columns]
+    window[columns >= len(data) - 1] = 0
+    values, mates = np.full(len(positions), np.nan), np.zeros(len(positions), dtype=bool)
+
+    # Clocks as Chess.com and Lichess write them, " H:MM:SS" with optional tenths, by column
+    digit = [(column >= ord("0")) & (column <= ord("9")) for column in window.T[:10]]
+    fixed = (
+        (window[:, 0] == ord(" ")) & (window[:, 2] == ord(":")) & (window[:, 5] == ord(":"))
+        & digit[1] & digit[3] & digit[4] & digit[6] & digit[7] & ~digit[8]
+    )
+    if fixed.any():
+        clock = window[fixed, :10].astype(np.float64) - ord("0")
+        tenths = np.where((window[fixed, 8] == ord(".")) & digit[9][fixed], clock[:, 9] / 10, 0)
+        values[fixed] = clock[:, 1] * 3600 + clock[:, 3] * 600 + clock[:, 4] * 60 + clock[:, 6] * 10 + clock[:, 7] + tenths
+
+    rest = ~fixed
+    if rest.any():
+        rows = window[rest]
+        values[rest], mates[rest] = _parse_numbers(rows, rows.astype(np.float64) - ord("0"), (rows >= ord("0")) & (rows <= ord("9")))
+    return values, mates
+
+
+def _parse_numbers(window: np.ndarray, digits: np.ndarray, is_digit: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Rows of bytes with leading blanks, mate marker and sign, then digits, colons and a decimal dot."""
+    is_colon, is_dot = window == ord(":"), window == ord(".")
+    leading = np.logical_and.accumulate(np.isin(window, _LEADING), axis=1)
+    number = np.logical_and.accumulate(leading | is_digit | is_colon | is_dot, axis=1) & ~leading
+    mates = (leading & (window == ord("#"))).any(axis=1)
+    negative = (leading & (window == ord("-"))).any(axis=1)
+    in_fraction = np.logical_or.accumulate(number & is_dot, axis=1)
+
+    fraction_digits = number & is_digit & in_fraction
+    places = np.cumsum(fraction_digits, axis=1)
+    fraction = (np.where(fraction_digits, digits, 0) * 10.0 ** -places).sum(axis=1)
+
+    whole_digits, colons = number & is_digit & ~in_fraction, number & is_colon
+    total, current = np.zeros(len(window)), np.zeros(len(window))
+    for column in range(int(number.any(axis=0).nonzero()[0].max(initial=-1)) + 1):
+        current = np.where(whole_digits[:, column], current * 10 + digits[:, column], current)
+        total = np.where(colons[:, column], (total + current) * 60, total)
+        current[colons[:, column]] = 0
+
+    values = np.where(negative, -1.0, 1.0) * (total + current + fraction)
+    values[~(number & is_digit).any(axis=1)] = np.nan
+    return values, mates
+
+
+def _merge_fallback(batch: MovetextBatch, parsed: dict[int, Movetext]) -> MovetextBatch:
+    games = [parsed.get(index) or batch.game(index) for index in range(len(batch.offsets) - 1)]
+    offsets = np.zeros(len(games) + 1, dtype=np.int64)
+    np.cumsum([len(game.moves) for game in games], out=offsets[1:])
+    return MovetextBatch(
+        [move for game in games for move in game.moves],
+        np.concatenate([game.clocks for game in games]),
+        np.concatenate([game.evals for game in games]),
+        offsets,
+    )
+
+
+def _strip_variations(movetext: str) -> str:
+    """Drops every parenthesized variation, nested ones included; brackets inside comments don't count."""
+    kept, depth, position = [], 0, 0
+    for match in _COMMENT_OR_PAREN.finditer(movetext):
+        token = match.group()
+        if token not in "()":
+            continue
+        if token == "(":
+            if depth == 0:
+                kept.append(movetext[position:match.start()])
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                position = match.end()
+    if depth == 0:
+        kept.append(movetext[position:])
+    return "".join(kept)
+
+
+def _eval_cp(value: str) -> float:
+    if value.startswith("#"):
+        moves = int(value[1:])
+        return float(MATE_SCORE_CP - moves if moves > 0 else -MATE_SCORE_CP - moves)
+    return round(float(value) * 100)
+
+
+def _parse_with_regex(movetext: str) -> Movetext:
+    if "(" in movetext:
+        movetext = _strip_variations(movetext)
+    plies = [ply for ply in _PLY.findall(movetext) if ply[0]]
+    count = len(plies)
+
+    clocks = np.full(count, np.nan, dtype=np.float32)
+    evals = np.full(count, np.nan, dtype=np.float32)
+    for index, (_, eval_before, hours, minutes, seconds, eval_after) in enumerate(plies):
+        if seconds:
+            clocks[index] = int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+        if eval_before or eval_after:
+            evals[index] = _eval_cp(eval_before or eval_after)
+    return Movetext([ply[0] for ply in plies], clocks, evals)
+
+
+def time_deltas(clocks: np.ndarray, initial: Optional[float] = None, increment: float = 0.0) -> np.ndarray:
+    """
+    Seconds spent on every ply from the clock left after it: the mover's previous clock
+    (or the initial time) minus this one, plus the increment. NaN where a clock is missing.
+    """
+    clocks = np.asarray(clocks, dtype=np.float32)
+    start = np.nan if initial is None else initial
+    before = np.concatenate([np.full(min(2, len(clocks)), start, dtype=np.float32), clocks[:-2]])
+    # NaN propagates through the subtraction and the clamp
+    return np.maximum(before - clocks + np.float32(increment), np.float32(0))
+
+
+def parse_time_control(time_control: str) -> tuple[Optional[float], float]:
+    """(initial seconds, increment seconds) from "180+2"; daily controls like "1/259200" have no clock."""
+    base, _, increment = (time_control or "").partition("+")
+    try:
+        return float(base), float(increment or 0)
+    except ValueError:
+        return None, 0.0
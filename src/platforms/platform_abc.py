@@ -1,10 +1,14 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+from common.game import Game
 from common.player import Player
 
-from typing import Optional
+from typing import Iterator, Optional
 
 class PlatformWrapper(ABC):
+    game_store = None  # Optional data.game_store.GameStore, attached by the DispatcherApp
+    saves_fetched_games = False  # True when the wrapper writes what it downloads to the game store itself
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -27,4 +31,21 @@ class PlatformWrapper(ABC):
         - If `number_of_games` is None, `start_dt_utc` and `end_dt_utc` can be used to specify a date range.
         - If none of the optional params are specified, fetch all or use some default range.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def iter_games_by_username(
+        self,
+        username: str,
+        start_dt_utc: Optional[datetime] = None,
+        end_dt_utc: Optional[datetime] = None,
+        number_of_games: Optional[int] = None
+    ) -> Iterator[Game]:
+        """
+        Yield games as they become available, under the same rules as `get_games_by_username`.
+        Wrappers that can stream override this; the default fetches everything first.
+        """
+        yield from self.get_games_by_username(username, start_dt_utc, end_dt_utc, number_of_games).get_all_games()
+
+    def attach_game_store(self, game_store) -> None:
+        """Lets the wrapper skip downloads the local game store already covers."""
+        self.game_store = game_store
\ No newline at end of file
@@ -0,0 +1,263 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+# Seconds; wide enough for a cache lookup at one end and a slow archive download at the other
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _items(self) -> list[tuple[tuple[str, ...], Any]]:
+        with self._lock:
+            return [(key, value.copy() if isinstance(value, list) else value) for key, value in self._values.items()]
+
+    def _labels_text(self, key: tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._items():
+            lines.append(f"{self.name}{self._labels_text(key)} {_number(value)}")
+        return lines
+
+    def summary(self) -> dict[str, Any]:
+        return {_summary_key(self.labelnames, key): value for key, value in self._items()}
+
+
+class Counter(_Metric):
+    """A running total, e.g. games parsed or bytes downloaded."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. the depth of a queue."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into fixed buckets, plus their sum. Quantiles in the summary are
+    read off the buckets, so they are upper bounds at bucket resolution.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per bucket counts (the last one is +Inf), then the sum
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - began, **labels)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(sum(state[:-1]) for state in self._values.values())
+
+    def sum(self) -> float:
+        with self._lock:
+            return sum(state[-1] for state in self._values.values())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, state in self._items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{self._labels_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels_text(key)} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{self._labels_text(key)} {cumulative}")
+        return lines
+
+    def summary(self) -> dict[str, Any]:
+        result = {}
+        for key, state in self._items():
+            counts, total = state[:-1], state[-1]
+            count = sum(counts)
+            result[_summary_key(self.labelnames, key)] = {
+                "count": count,
+                "sum": round(total, 6),
+                "mean": round(total / count, 6) if count else None,
+                "p50": self._quantile(counts, 0.5),
+                "p95": self._quantile(counts, 0.95),
+            }
+        return result
+
+    def _quantile(self, counts: list[int], q: float) -> Optional[float]:
+        count = sum(counts)
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Every metric of the process, by name; asking twice for a name returns the same metric."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, help: str, labelnames: tuple[str, ...], **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.summary() for metric in metrics if metric._values}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _summary_key(labelnames: tuple[str, ...], key: tuple[str, ...]) -> str:
+    return ",".join(f"{name}={value}" for name, value in zip(labelnames, key)) or "total"
+
+
+REGISTRY = MetricsRegistry()
+
+# Platforms
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "chessmate_http_request_seconds", "Time until a platform API responded (headers, for streamed exports).", ("platform",)
+)
+HTTP_RESPONSES = REGISTRY.counter("chessmate_http_responses_total", "Platform API responses by status code.", ("platform", "status"))
+HTTP_BYTES = REGISTRY.counter("chessmate_http_bytes_total", "Response bytes downloaded from platform APIs.", ("platform",))
+GAMES_PARSED = REGISTRY.counter("chessmate_games_parsed_total", "Games parsed from platform data or offline dumps.", ("platform",))
+GAMES_SKIPPED = REGISTRY.counter("chessmate_games_skipped_total", "Games skipped because they failed to parse or have an unknown speed.", ("platform",))
+PARSE_SECONDS = REGISTRY.counter("chessmate_parse_seconds_total", "Time spent turning platform data into games.", ("platform",))
+
+# Engines
+ENGINE_SEARCH_SECONDS = REGISTRY.histogram("chessmate_engine_search_seconds", "Time per engine search.", ("caller",))
+ENGINE_NODES = REGISTRY.counter("chessmate_engine_nodes_total", "Nodes searched by the engines.", ("caller",))
+EVAL_CACHE_LOOKUPS = REGISTRY.counter("chessmate_eval_cache_lookups_total", "Evaluation cache lookups by outcome.", ("result",))
+
+# Analysis
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram("chessmate_pipeline_stage_seconds", "Time a pipeline stage spent on one item.", ("pipeline", "stage"))
+PIPELINE_ERRORS = REGISTRY.counter("chessmate_pipeline_errors_total", "Items a pipeline stage dropped on an error.", ("pipeline", "stage"))
+PIPELINE_QUEUE_DEPTH = REGISTRY.gauge("chessmate_pipeline_queue_depth", "Items waiting in front of a pipeline stage.", ("pipeline", "stage"))
+CLUSTER_SECONDS = REGISTRY.histogram("chessmate_cluster_seconds", "Time per cluster model operation.", ("operation",))
+JOBS = REGISTRY.gauge("chessmate_jobs", "Analysis jobs in this process by status.", ("status",))
+
+
+def record_search(caller: str, seconds: float, info: Any) -> None:
+    """Time and nodes of one engine search; `info` is what `engine.analyse` returned."""
+    ENGINE_SEARCH_SECONDS.observe(seconds, caller=caller)
+    if isinstance(info, list):
+        info = info[0] if info else {}
+    ENGINE_NODES.inc(info.get("nodes", 0), caller=caller)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def summary() -> dict[str, Any]:
+    """Every metric with a value, plus the rates derived from them."""
+    report = REGISTRY.summary()
+    derived = {}
+    for key, games in GAMES_PARSED.summary().items():
+        seconds = PARSE_SECONDS.summary().get(key)
+        if seconds:
+            derived[f"games_parsed_per_second[{key}]"] = round(games / seconds, 1)
+    for key, searches in ENGINE_SEARCH_SECONDS.summary().items():
+        nodes = ENGINE_NODES.summary().get(key, 0)
+        if searches["sum"]:
+            derived[f"engine_nodes_per_second[{key}]"] = round(nodes / searches["sum"], 1)
+    lookups = EVAL_CACHE_LOOKUPS.total()
+    if lookups:
+        derived["eval_cache_hit_rate"] = round(1 - EVAL_CACHE_LOOKUPS.value(result="miss") / lookups, 4)
+    report["derived"] = derived
+    return report
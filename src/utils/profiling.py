@@ -0,0 +1,236 @@
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+# A stack frame: (function, file, first line)
+Frame = tuple[str, str, int]
+
+# Thread ident -> the scoped profiler of the run the thread works for (see `in_run`)
+_run_threads: dict[int, "SamplingProfiler"] = {}
+_run_threads_lock = threading.Lock()
+
+# Frames of a thread blocked on the queue in front of or behind its pipeline stage
+_QUEUE_WAITS = {("_get", "pipeline.py"), ("_put", "pipeline.py")}
+
+
+def thread_group(name: str) -> str:
+    """
+    The part of the run a thread works for, from its name: pipeline workers are named
+    "<pipeline>-<stage>-<n>", pool threads "<prefix>_<n>".
+    """
+    parts = name.split("-")
+    if len(parts) >= 2 and parts[0] == "analyse":
+        return parts[1]
+    return re.sub(r"[-_ ]?\d+$", "", name.split(" ")[0]) or name
+
+
+def in_run(fn: Optional[Callable[..., Any]] = None) -> Callable[..., Any]:
+    """
+    Wraps `fn` (by default a no-op) for a thread the calling thread is about to start, such
+    as a Thread target or a thread pool's `initializer`: once running there, the new thread
+    joins the profiled run of the calling thread, if it is in one, and then calls `fn`.
+    """
+    with _run_threads_lock:
+        profiler = _run_threads.get(threading.get_ident())
+
+    def run_in_run(*args: Any, **kwargs: Any) -> Any:
+        if profiler is not None:
+            profiler.adopt(threading.get_ident())
+        return fn(*args, **kwargs) if fn is not None else None
+
+    return run_in_run
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of every thread at a fixed interval from a background thread.
+
+    Samples are grouped by the thread's part of the run (see `thread_group`), so a pipeline
+    run breaks down by stage; the thread that started the profiler counts as "dispatcher".
+    A `scoped` profiler only samples the thread that started it and the threads started
+    for that run through `in_run`, so other runs in the same process stay out of its profile;
+    otherwise every thread is sampled. Nothing is installed in the profiled threads, so the
+    cost is one stack walk per thread per interval, and none at all when no profiler is running.
+    """
+
+    def __init__(self, interval: float = 0.005, scoped: bool = False) -> None:
+        self.interval = interval
+        self.scoped = scoped
+        self._idents: set[int] = set()
+        self.samples: Counter[tuple[str, tuple[Frame, ...]]] = Counter()
+        self.started_at = 0.0
+        self.seconds = 0.0
+        self._owner = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._owner = threading.get_ident()
+        if self.scoped:
+            self.adopt(self._owner)
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def adopt(self, ident: int) -> None:
+        """Counts a thread as part of this profiler's run."""
+        with _run_threads_lock:
+            self._idents.add(ident)
+            _run_threads[ident] = self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started_at
+        with _run_threads_lock:
+            for ident in self._idents:
+                if _run_threads.get(ident) is self:
+                    del _run_threads[ident]
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with _run_threads_lock:
+                idents = set(self._idents)
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, "unknown")
+                if ident == own or (self.scoped and ident not in idents):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                group = "dispatcher" if ident == self._owner else thread_group(name)
+                self.samples[(group, tuple(reversed(stack)))] += 1
+
+    def collapsed(self) -> list[str]:
+        """Folded stacks, "group;outer;...;inner count", as flamegraph.pl and speedscope read them."""
+        lines = []
+        for (group, stack), count in sorted(self.samples.items()):
+            lines.append(";".join([group, *(_frame_name(frame) for frame in stack)]) + f" {count}")
+        return lines
+
+    def speedscope(self, name: str) -> dict[str, Any]:
+        """A speedscope document with one sampled profile per group."""
+        frames: dict[Frame, int] = {}
+        profiles: dict[str, dict[str, Any]] = {}
+        for (group, stack), count in sorted(self.samples.items()):
+            profile = profiles.setdefault(group, {
+                "type": "sampled", "name": group, "unit": "seconds", "startValue": 0, "endValue": 0.0,
+                "samples": [], "weights": [],
+            })
+            profile["samples"].append([frames.setdefault(frame, len(frames)) for frame in stack])
+            profile["weights"].append(count * self.interval)
+            profile["endValue"] += count * self.interval
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "chessmate",
+            "shared": {"frames": [
+                {"name": function, "file": _short_path(file), "line": line} for function, file, line in frames
+            ]},
+            "profiles": list(profiles.values()),
+        }
+
+    def hotspots(self, top_n: int = 25) -> str:
+        """
+        Per group: how much of it was spent waiting on the pipeline's queues, then the top
+        functions of the rest by own (self) and by inclusive time.
+        """
+        by_group: dict[str, Counter] = {}
+        for (group, stack), count in self.samples.items():
+            by_group.setdefault(group, Counter())[stack] += count
+
+        lines = [f"Sampled every {self.interval * 1000:.1f} ms for {self.seconds:.2f}s"]
+        for group, stacks in sorted(by_group.items(), key=lambda item: -sum(item[1].values())):
+            total = sum(stacks.values())
+            busy = Counter({
+                stack: count for stack, count in stacks.items()
+                if not any((function, Path(file).name) in _QUEUE_WAITS for function, file, _ in stack)
+            })
+            busy_total = sum(busy.values())
+            own, inclusive = Counter(), Counter()
+            for stack, count in busy.items():
+                if stack:
+                    own[stack[-1]] += count
+                for frame in set(stack):
+                    inclusive[frame] += count
+
+            lines.append("")
+            lines.append(
+                f"== {group}: {total} samples (~{total * self.interval:.2f}s), "
+                f"{100 * (total - busy_total) / total:.0f}% waiting on pipeline queues"
+            )
+            for title, counts in (("self", own), ("inclusive", inclusive)):
+                lines.append(f"   top {top_n} by {title} time:")
+                for frame, count in counts.most_common(top_n):
+                    lines.append(f"   {100 * count / max(busy_total, 1):6.1f}%  {count * self.interval:8.3f}s  {_frame_name(frame)}")
+        return "\n".join(lines) + "\n"
+
+
+class RunProfiler:
+    """
+    Profiles one analysis run: a scoped SamplingProfiler around the block, whose folded
+    stacks, speedscope file and per-stage hotspot report are written to `output_dir` on exit.
+    Only the calling thread and the threads it starts through `in_run` (the pipeline's stages
+    and the Chess.com downloads) are sampled, so concurrent jobs don't show up in it.
+    """
+
+    def __init__(self, output_dir: str, label: str, interval_ms: float = 5, top_n: int = 25) -> None:
+        self.output_dir = Path(output_dir)
+        self.label = re.sub(r"[^\w.-]+", "_", label)
+        self.top_n = top_n
+        self.profiler = SamplingProfiler(interval_ms / 1000, scoped=True)
+        self.paths: dict[str, Path] = {}
+
+    @classmethod
+    def from_config(cls, profiling_config: dict, label: str) -> "RunProfiler":
+        return cls(
+            profiling_config.get("dir") or "logs",
+            label,
+            interval_ms=profiling_config.get("interval_ms", 5),
+            top_n=profiling_config.get("top_n", 25),
+        )
+
+    def __enter__(self) -> "RunProfiler":
+        self.profiler.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.profiler.stop()
+        self.write()
+
+    def write(self) -> dict[str, Path]:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.output_dir / f"profile-{datetime.now():%Y%m%d-%H%M%S}-{self.label}"
+        self.paths = {
+            "collapsed": prefix.with_name(prefix.name + ".collapsed"),
+            "speedscope": prefix.with_name(prefix.name + ".speedscope.json"),
+            "hotspots": prefix.with_name(prefix.name + ".hotspots.txt"),
+        }
+        self.paths["collapsed"].write_text("\n".join(self.profiler.collapsed()) + "\n")
+        self.paths["speedscope"].write_text(json.dumps(self.profiler.speedscope(self.label)))
+        self.paths["hotspots"].write_text(self.profiler.hotspots(self.top_n))
+        return self.paths
+
+
+def _short_path(path: str) -> str:
+    """File paths relative to site-packages or the source tree, to keep frame names short."""
+    for marker in ("site-packages/", "/src/", "/lib/python"):
+        index = path.rfind(marker)
+        if index >= 0:
+            return path[index + len(marker):]
+    return path
+
+
+def _frame_name(frame: Frame) -> str:
+    function, file, line = frame
+    return f"{function} ({_short_path(file)}:{line})"
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+
+@pytest.fixture
+def fake_engine() -> list[str]:
+    """Command of the stand-in UCI engine from the benchmarks, which answers every search at once."""
+    return [sys.executable, str(PROJECT_ROOT / "benchmarks" / "fake_uci.py")]
+
+
+@pytest.fixture(scope="session")
+def random_games() -> list[list[str]]:
+    """Seeded random legal games in SAN, long enough to reach promotions, castling and en passant."""
+    import random
+
+    import chess
+
+    rng = random.Random(7)
+    games = []
+    for _ in range(60):
+        board, moves = chess.Board(), []
+        for _ in range(rng.randint(20, 200)):
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            move = rng.choice(legal)
+            moves.append(board.san(move))
+            board.push(move)
+        games.append(moves)
+    return games
@@ -0,0 +1,61 @@
+import pytest
+
+import app as web
+
+
+@pytest.fixture
+def client(monkeypatch):
+    submitted = []
+
+    class Queue:
+        def submit(self, cache_key, fn):
+            submitted.append(cache_key)
+            return "job1"
+
+    monkeypatch.setattr(web, "_services_started", True)
+    monkeypatch.setattr(web, "dispatcher_app", object())
+    monkeypatch.setattr(web, "job_queue", Queue())
+    client = web.app.test_client()
+    client.submitted = submitted
+    return client
+
+
+@pytest.mark.parametrize("value", ["abc", 0, -3, None, [5]])
+def test_analyse_rejects_a_bad_number_of_games(client, value):
+    response = client.post("/analyse", json={"username": "someone", "platform_name": "Lichess", "number_of_games": value})
+    assert response.status_code == 400
+    assert "number_of_games" in response.get_json()["error"]
+    assert client.submitted == []
+
+
+def test_analyse_queues_a_job(client):
+    response = client.post("/analyse", json={"username": "Someone", "platform_name": "Lichess", "number_of_games": "5"})
+    assert response.status_code == 202
+    assert client.submitted == ["Lichess:someone:5"]
+
+
+def test_stream_rejects_a_bad_number_of_games(client):
+    response = client.get("/analyse/stream?username=someone&platform_name=Lichess&number_of_games=abc")
+    assert response.status_code == 400
+
+
+def test_metrics_need_no_services():
+    response = web.app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+
+def test_records_leave_out_the_internal_position_columns():
+    from datetime import datetime, timezone
+
+    from common.game import Game
+
+    game = Game(
+        "g1", datetime(2024, 1, 1, tzinfo=timezone.utc), "Lichess", "blitz", "C20 King's Pawn Game",
+        "white", ["e4", "e5"], [20, None], [3.0, 2.0], "white",
+    )
+    records = web._to_records(game.to_dataframe())
+
+    assert [record["move_uci"] for record in records] == ["e2e4", "e7e5"]
+    assert not any(column in record for record in records for column in web.INTERNAL_COLUMNS)
+    assert records[1]["evaluation"] is None
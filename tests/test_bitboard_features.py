@@ -0,0 +1,62 @@
+import chess
+import numpy as np
+import pytest
+
+from common.positions import replay
+from ml.cluster_analysis.bitboard_features import extract_features_batch, fens_to_bitboards, popcount
+from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+
+
+@pytest.fixture(scope="module")
+def fens(random_games) -> list[str]:
+    return [fen for moves in random_games for fen in replay(moves).fens]
+
+
+def _has_moves_the_proxy_skips(board: chess.Board) -> bool:
+    return any(board.is_castling(move) or board.is_en_passant(move) or move.promotion for move in board.pseudo_legal_moves)
+
+
+def test_bitboards_match_python_chess(fens):
+    bitboards, white_to_move = fens_to_bitboards(fens[:200])
+    for fen, row, white in zip(fens, bitboards, white_to_move):
+        board = chess.Board(fen)
+        assert white == board.turn
+        assert int(row[0]) == board.pieces_mask(chess.PAWN, chess.WHITE)
+        assert int(row[11]) == board.pieces_mask(chess.KING, chess.BLACK)
+
+
+def test_popcount():
+    assert popcount(np.array([0, 1, 0xFF, 2**64 - 1], dtype=np.uint64)).tolist() == [0, 1, 8, 64]
+
+
+def test_material_and_king_safety_match_the_per_fen_features(fens):
+    analyser = ClusterAnalyser()
+    features = extract_features_batch(fens)
+    for fen, material, king_safety in zip(fens, features["material"], features["king_safety"]):
+        expected = analyser.extract_features_from_fen(fen)
+        assert (material, king_safety) == (expected["material"], expected["king_safety"])
+
+
+def test_pseudo_mobility_is_a_lower_bound_exact_without_special_moves(fens):
+    mobility = extract_features_batch(fens)["mobility"].tolist()
+    exact_positions = 0
+    for fen, count in zip(fens, mobility):
+        board = chess.Board(fen)
+        expected = board.pseudo_legal_moves.count()
+        assert count <= expected
+        if not _has_moves_the_proxy_skips(board):
+            assert count == expected
+            exact_positions += 1
+    assert exact_positions > len(fens) // 2
+
+
+def test_exact_mobility_is_the_legal_move_count(fens):
+    mobility = extract_features_batch(fens[:300], exact=True)["mobility"].tolist()
+    assert mobility == [chess.Board(fen).legal_moves.count() for fen in fens[:300]]
+
+
+def test_packed_boards_give_the_same_features(random_games):
+    positions = replay(random_games[0])
+    from_boards = extract_features_batch(positions.fens, boards=positions.boards)
+    from_fens = extract_features_batch(positions.fens)
+    assert from_boards.equals(from_fens)
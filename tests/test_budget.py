@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timezone
+
+import chess
+import pytest
+
+from common.game import Game
+from engines.budget import SearchBudget
+from engines.eval_cache import EvaluationCache
+from engines.stockfish import StockfishWrapper
+from ml.dispatcher_app import DispatcherApp
+from ml.game_analysis import GameAnalysis
+
+
+def _analysis() -> GameAnalysis:
+    game = Game(
+        "g1", datetime(2024, 1, 1, tzinfo=timezone.utc), "ChessCom", "blitz", "C20 King's Pawn Game",
+        "white", ["e4", "e5", "Nf3", "Nc6"], [], [], "white",
+    )
+    return GameAnalysis(game)
+
+
+@pytest.fixture
+def engine(fake_engine):
+    engine = StockfishWrapper(fake_engine, depth=12, pool_size=1, cache=EvaluationCache(max_entries=1000))
+    yield engine
+    engine.close()
+
+
+def test_the_clock_starts_with_the_first_search():
+    budget = SearchBudget(max_seconds=0.05)
+    time.sleep(0.1)  # e.g. the games still downloading
+    assert not budget.exhausted
+    time.sleep(0.1)
+    assert budget.exhausted
+
+
+def test_a_child_starts_the_parent_clock():
+    parent = SearchBudget(max_seconds=60)
+    time.sleep(0.05)
+    child = SearchBudget(max_seconds=1, parent=parent)
+    child.limit(10)
+    assert parent.elapsed < 0.05
+
+
+def test_eval_depth_is_the_depth_searched(engine):
+    dispatcher = DispatcherApp([], engine=engine)
+    analysis = dispatcher._evaluate(_analysis(), budget=SearchBudget())
+    assert analysis.game.eval_depth == 12
+    assert analysis.game.eval_source == "engine"
+
+
+def test_eval_depth_counts_shallower_cached_book_positions(engine):
+    board = chess.Board()
+    board.push_san("e4")
+    engine.cache.put(board.fen(), 5, 30.0, "e7e5")
+    dispatcher = DispatcherApp([], engine=engine, budget_config={"opening_plies": 2})
+
+    game = dispatcher._evaluate(_analysis()).game
+    assert game.evaluations[0] == 30
+    assert game.eval_depth == 5
+
+
+def test_eval_depth_is_unset_when_the_budget_ran_out(engine):
+    dispatcher = DispatcherApp([], engine=engine)
+    game = dispatcher._evaluate(_analysis(), budget=SearchBudget(max_nodes=1)).game
+    assert game.evaluations[0] is not None and game.evaluations[-1] is None
+    assert game.eval_depth is None
@@ -0,0 +1,219 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data.game_store import GameStore
+from platforms.chesscom import ChessComWrapper
+from platforms.chesscom_archive_fetcher import ChessComArchiveFetcher
+
+MONTHS = [(2023, month) for month in range(1, 13)] + [(2024, month) for month in range(1, 9)]
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """A stand-in for api.chess.com: an archive list and one game per month, with ETags."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), ArchiveHandler)
+        self.lock = threading.Lock()
+        self.requests: list[tuple[str, int]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.05
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/pub"
+
+    def month_requests(self) -> list[str]:
+        return [path for path, _ in self.requests if not path.endswith("/archives")]
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    server: ArchiveServer
+
+    def do_GET(self) -> None:
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if self.path.endswith("/games/archives"):
+                base = self.path.rsplit("/", 1)[0]
+                archives = [f"http://127.0.0.1:{server.server_address[1]}{base}/{year}/{month:02d}" for year, month in MONTHS]
+                self._send(200, {"archives": archives})
+                return
+
+            time.sleep(server.delay)
+            year, month = self.path.rstrip("/").split("/")[-2:]
+            etag = f'"{year}-{month}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, None)
+            else:
+                self._send(200, {"games": [{"url": f"game-{year}-{month}", "rules": "chess"}]}, {"ETag": etag})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, body, headers: dict = None) -> None:
+        payload = json.dumps(body).encode() if body is not None else b""
+        with self.server.lock:
+            self.server.requests.append((self.path, status))
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ArchiveServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _range(start: tuple[int, int], end: tuple[int, int]) -> tuple[datetime, datetime]:
+    return datetime(*start, 1, tzinfo=timezone.utc), datetime(*end, 1, tzinfo=timezone.utc)
+
+
+def test_months_come_newest_first_within_the_range(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=4)
+    months = [(year, month) for year, month, _ in fetcher.iter_months("someone", *_range((2023, 6), (2024, 3)))]
+    assert months == sorted([m for m in MONTHS if (2023, 6) <= m < (2024, 3)], reverse=True)
+    fetcher.close()
+
+
+def test_unchanged_month_is_revalidated_with_its_etag(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=2)
+    url = fetcher.month_url("someone", 2024, 5)
+    first = fetcher.fetch_month(url, revalidate=True)
+    again = fetcher.fetch_month(url, revalidate=True)
+    full = fetcher.fetch_month(url)
+
+    assert first == full == [{"url": "game-2024-05", "rules": "chess"}]
+    assert again is None  # the caller's copy is current
+    assert [status for path, status in server.requests] == [200, 304, 200]
+    assert fetcher.not_modified == 1
+    fetcher.close()
+
+
+def test_only_the_latest_validators_are_kept(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=2, max_validators=2)
+    urls = [fetcher.month_url("someone", 2024, month) for month in (1, 2, 3)]
+    for url in urls:
+        fetcher.fetch_month(url)
+
+    assert list(fetcher._validators) == urls[1:]
+    assert fetcher.fetch_month(urls[0], revalidate=True) is not None  # forgotten, so downloaded in full
+    fetcher.forget(urls[0])
+    assert urls[0] not in fetcher._validators
+    fetcher.close()
+
+
+def test_downloads_stay_within_max_concurrency(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=3)
+    months = list(fetcher.iter_months("someone", *_range((2023, 1), (2025, 1))))
+
+    assert len(months) == len(MONTHS)
+    assert 1 < server.max_in_flight <= 3
+    fetcher.close()
+
+
+def test_stopping_early_leaves_older_months_unrequested(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=4)
+    for year, month, games in fetcher.iter_months("someone", *_range((2023, 1), (2025, 1))):
+        assert (year, month) == (2024, 8)
+        break
+    fetcher.close()
+
+    requested = sorted(server.month_requests(), reverse=True)
+    assert len(requested) == 4  # the first window only
+    assert requested[0].endswith("/2024/08") and requested[-1].endswith("/2024/05")
+
+
+def test_skipped_months_are_not_requested(server):
+    fetcher = ChessComArchiveFetcher(server.api_url, max_concurrency=4)
+    months = [(y, m, games is None) for y, m, games in fetcher.iter_months("someone", *_range((2024, 1), (2024, 4)), skip_months={(2024, 2)})]
+    assert months == [(2024, 3, False), (2024, 2, True), (2024, 1, False)]
+    assert not any(path.endswith("/2024/02") for path in server.month_requests())
+    fetcher.close()
+
+
+class _Months:
+    """A fetcher stand-in that serves fixed archives, records which months were skipped and reports `unchanged` ones as 304s."""
+
+    def __init__(self, months: dict[tuple[int, int], list[dict]]) -> None:
+        self.months = months
+        self.unchanged: set[tuple[int, int]] = set()
+        self.skipped: list[set] = []
+
+    def iter_months(self, username, start_dt_utc, end_dt_utc, skip_months=None, revalidate=False):
+        self.skipped.append(set(skip_months or ()))
+        for year, month in sorted(self.months, reverse=True):
+            reuse = (year, month) in (skip_months or ()) or (revalidate and (year, month) in self.unchanged)
+            yield year, month, None if reuse else self.months[year, month]
+
+
+def _archive_game(year: int, month: int, pgn: str = '[Event "Live"]\n\n1. e4 {[%clk 0:02:59]} e5 {[%clk 0:02:58]} 1-0') -> dict:
+    return {
+        "url": f"game-{year}-{month}", "rules": "chess", "pgn": pgn, "time_control": "180", "time_class": "blitz",
+        "end_time": datetime(year, month, 15, tzinfo=timezone.utc).timestamp(),
+        "white": {"username": "someone", "result": "win"}, "black": {"username": "other", "result": "resigned"},
+    }
+
+
+def test_ended_months_are_closed_with_their_games_and_then_read_from_the_store(tmp_path):
+    wrapper = ChessComWrapper({"name": "ChessCom", "url": "http://unused"})
+    wrapper.attach_game_store(store := GameStore(str(tmp_path / "games.sqlite")))
+    wrapper.fetcher = _Months({(2024, 1): [_archive_game(2024, 1)], (2024, 2): [_archive_game(2024, 2), _archive_game(2024, 2, pgn="")]})
+    window = _range((2024, 1), (2024, 2))
+
+    assert [game.id for game in wrapper.iter_games_by_username("someone", *window)] == ["game-2024-2", "game-2024-1"]
+    # February lost a game to a parse error, so it stays open and is downloaded again next time
+    assert store.closed_months("ChessCom", "someone") == {(2024, 1)}
+
+    assert [game.id for game in wrapper.iter_games_by_username("someone", *window)] == ["game-2024-2", "game-2024-1"]
+    assert wrapper.fetcher.skipped[-1] == {(2024, 1)}
+    store.close()
+
+
+def test_an_abandoned_iteration_closes_no_month_it_did_not_save(tmp_path):
+    wrapper = ChessComWrapper({"name": "ChessCom", "url": "http://unused"})
+    wrapper.attach_game_store(store := GameStore(str(tmp_path / "games.sqlite")))
+    wrapper.fetcher = _Months({(2024, 1): [_archive_game(2024, 1)], (2024, 2): [_archive_game(2024, 2)]})
+
+    games = wrapper.iter_games_by_username("someone", *_range((2024, 1), (2024, 2)))
+    next(games)
+    games.close()
+    assert store.closed_months("ChessCom", "someone") == {(2024, 2)}
+    assert [game.id for game in store.month_games("ChessCom", "someone", 2024, 2)] == ["game-2024-2"]
+    store.close()
+
+
+def test_a_month_the_server_reports_unchanged_is_read_from_the_store(tmp_path):
+    now = datetime.now(timezone.utc)
+    wrapper = ChessComWrapper({"name": "ChessCom", "url": "http://unused"})
+    wrapper.attach_game_store(store := GameStore(str(tmp_path / "games.sqlite")))
+    wrapper.fetcher = _Months({(now.year, now.month): [_archive_game(now.year, now.month)]})
+    window = _range((now.year, now.month), (now.year, now.month))
+
+    first = [game.id for game in wrapper.iter_games_by_username("someone", *window)]
+    wrapper.fetcher.unchanged.add((now.year, now.month))
+    assert [game.id for game in wrapper.iter_games_by_username("someone", *window)] == first
+    assert store.closed_months("ChessCom", "someone") == set()  # the current month stays open
+    store.close()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.positions import replay
+from ml.cluster_analysis.cluster_analysis import ClusterAnalyser
+
+
+@pytest.fixture(scope="module")
+def positions(random_games) -> pd.DataFrame:
+    fens = [fen for moves in random_games[:20] for fen in replay(moves).fens]
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        "fen": fens,
+        "time_used": rng.uniform(0, 30, len(fens)),
+        "eval_cp": rng.normal(0, 150, len(fens)),
+        "cp_loss": rng.exponential(40, len(fens)),
+    })
+
+
+def test_an_incremental_model_predicts_the_same_after_a_reload(positions, tmp_path):
+    analyser = ClusterAnalyser(n_clusters=4, incremental=True, batch_size=256)
+    chunks = [positions.iloc[start:start + 300] for start in range(0, 900, 300)]
+    analyser.fit_stream(chunks)
+    assert analyser.scaler.n_samples_seen_ == 900
+
+    path = tmp_path / "models" / "clusters.joblib"
+    analyser.save(str(path))
+    loaded = ClusterAnalyser.load(str(path))
+
+    held_out = positions.iloc[900:1200]
+    labels = analyser.predict(held_out)["cluster"].to_numpy()
+    assert np.array_equal(loaded.predict(held_out)["cluster"].to_numpy(), labels)
+    assert np.array_equal(loaded.scaler.mean_, analyser.scaler.mean_)
+    assert np.array_equal(loaded.scaler.var_, analyser.scaler.var_)
+    assert loaded.scaler.n_samples_seen_ == analyser.scaler.n_samples_seen_
+    assert np.array_equal(loaded.cluster_centers_, analyser.cluster_centers_)
+
+    # Predicting leaves the model as it was
+    assert np.array_equal(loaded.model.cluster_centers_, analyser.cluster_centers_)
+    assert set(labels) <= set(range(4))
+
+
+def test_partial_fit_needs_an_incremental_model(positions):
+    with pytest.raises(ValueError):
+        ClusterAnalyser(n_clusters=4).partial_fit(positions.iloc[:100])
@@ -0,0 +1,174 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from common.game import Game
+from data.game_store import GameStore
+from ml.dispatcher_app import DispatcherApp
+from ml.game_analysis import GameAnalysis
+from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+from platforms.platform_abc import PlatformWrapper
+
+
+@pytest.fixture
+def identifier(fake_engine):
+    identifier = MistakeIdentifier(fake_engine, depth=12)
+    yield identifier
+    identifier.close()
+
+
+def _analysis(evaluations: list) -> GameAnalysis:
+    game = Game(
+        "g1", datetime(2024, 1, 1, tzinfo=timezone.utc), "ChessCom", "blitz", "C20 King's Pawn Game",
+        "white", ["e4", "e5", "Nf3", "Nc6"], evaluations, [3.0, 2.0, 4.0, 1.0], "white",
+    )
+    return GameAnalysis(game).replay()
+
+
+def test_tiered_mode_analyses_games_without_evaluations_in_full(identifier):
+    dispatcher = DispatcherApp([], mistake_identifiers=[identifier], tiered_config={"enabled": True})
+    analysis = dispatcher._classify(_analysis([]))
+
+    assert analysis.mistakes["deep"].all()
+    assert analysis.mistakes["mistake_type"].notna().all()
+    assert analysis.mistakes["best_move"].notna().all()
+
+
+def test_tiered_mode_uses_the_shallow_pass_when_there_are_evaluations(identifier):
+    dispatcher = DispatcherApp([], mistake_identifiers=[identifier], tiered_config={"enabled": True})
+    analysis = _analysis([20, 30, 25, 35])
+    analysis = dispatcher._classify(dispatcher._detect(analysis))
+
+    assert not analysis.mistakes["deep"].any()  # no drops to look at again
+    assert analysis.mistakes["mistake_type"][1:].notna().all()  # the first move has no evaluation before it
+
+
+def test_moves_without_a_clock_are_never_time_trouble(identifier):
+    game = Game(
+        "g1", datetime(2024, 1, 1, tzinfo=timezone.utc), "Lichess", "blitz", "C20 King's Pawn Game",
+        "white", ["e4", "e5", "Nf3", "Nc6"], [20, 30, -400, -380], [], "white",
+    )
+    mistakes = GameAnalysis(game).replay().shallow_mistakes(identifier.classify_mistake)
+
+    assert mistakes["mistake_type"][2] == "Blunder"
+    assert identifier.classify_mistake(-400, 30, None) == "Blunder"
+    assert identifier.classify_mistake(-400, 30, 1.0) == "Time trouble"
+
+
+def test_a_platform_that_failed_to_start_is_retried(monkeypatch):
+    attempts = []
+
+    class Wrapper:
+        def __init__(self, config):
+            attempts.append(config)
+            if len(attempts) == 1:
+                raise ConnectionError("no network yet")
+            self.name = config["name"]
+
+    monkeypatch.setattr("ml.dispatcher_app.load_class", lambda path: Wrapper)
+    dispatcher = DispatcherApp([], platform_configs=[{"name": "Lichess", "class": "platforms.lichess.LichessWrapper"}])
+
+    with pytest.raises(ConnectionError):
+        dispatcher._find_platform_wrapper("Lichess")
+    wrapper = dispatcher._find_platform_wrapper("Lichess")
+    assert dispatcher._find_platform_wrapper("Lichess") is wrapper
+    assert len(attempts) == 2
+    with pytest.raises(ValueError):
+        dispatcher._find_platform_wrapper("ChessCom")
+
+
+def _game(game_id: str, day: int) -> Game:
+    return Game(
+        game_id, datetime(2024, 1, day, tzinfo=timezone.utc), "Lichess", "blitz", "C20 King's Pawn Game",
+        "white", ["e4", "e5"], [], [3.0, 2.0], "white",
+    )
+
+
+class StreamingWrapper(PlatformWrapper):
+    """Yields games newest first and records how many the consumer had asked for."""
+
+    name = "Lichess"
+
+    def __init__(self, games: list[Game]) -> None:
+        self.games = games
+        self.yielded = 0
+        self.since: list = []
+
+    def get_games_by_username(self, username, start_dt_utc=None, end_dt_utc=None, number_of_games=None):
+        raise AssertionError("the dispatcher should stream")
+
+    def iter_games_by_username(self, username, start_dt_utc=None, end_dt_utc=None, number_of_games=None):
+        self.since.append(start_dt_utc)
+        games = [
+            game for game in self.games
+            if (start_dt_utc is None or game.start_dt_utc >= start_dt_utc)
+            and (end_dt_utc is None or game.start_dt_utc <= end_dt_utc)
+        ]
+        for game in games[:number_of_games]:
+            self.yielded += 1
+            yield game
+
+
+def test_games_stream_through_the_store_and_later_runs_only_fetch_new_ones(tmp_path):
+    store = GameStore(str(tmp_path / "games.sqlite"))
+    wrapper = StreamingWrapper([_game(f"g{day}", day) for day in range(5, 0, -1)])
+    dispatcher = DispatcherApp([wrapper], game_store=store)
+
+    games = dispatcher._iter_games("Lichess", "someone", None, None, None)
+    first = next(games)
+    assert first.game.id == "g5" and wrapper.yielded == 1  # passed on before the rest is downloaded
+    assert [analysis.game.id for analysis in games] == ["g4", "g3", "g2", "g1"]
+    assert store.count_games("Lichess", "someone") == 5
+
+    wrapper.games.insert(0, _game("g6", 6))
+    assert [analysis.game.id for analysis in dispatcher._iter_games("Lichess", "someone", None, None, 3)] == ["g6", "g5", "g4"]
+    assert wrapper.since[-1] > datetime(2024, 1, 5, tzinfo=timezone.utc)
+    assert store.count_games("Lichess", "someone") == 6
+    store.close()
+
+
+def test_games_passed_on_before_a_run_stops_are_saved(tmp_path):
+    store = GameStore(str(tmp_path / "games.sqlite"))
+    dispatcher = DispatcherApp([StreamingWrapper([_game(f"g{day}", day) for day in range(5, 0, -1)])], game_store=store)
+
+    games = dispatcher._iter_games("Lichess", "someone", None, None, None)
+    next(games), next(games)
+    games.close()
+    assert [game.id for game in store.load_games("Lichess", "someone")] == ["g5", "g4"]
+    store.close()
+
+
+def test_a_partial_history_in_the_store_is_completed_from_the_platform(tmp_path):
+    store = GameStore(str(tmp_path / "games.sqlite"))
+    wrapper = StreamingWrapper([_game(f"g{day}", day) for day in range(5, 0, -1)])
+    dispatcher = DispatcherApp([wrapper], game_store=store)
+
+    assert [analysis.game.id for analysis in dispatcher._iter_games("Lichess", "someone", None, None, 2)] == ["g5", "g4"]
+    assert not store.coverage("Lichess", "someone").complete
+
+    games = [analysis.game.id for analysis in dispatcher._iter_games("Lichess", "someone", None, None, None)]
+    assert games == ["g5", "g4", "g3", "g2", "g1"]
+    assert store.coverage("Lichess", "someone").complete
+
+    # The whole history is stored now, so nothing older is requested again
+    wrapper.yielded = 0
+    games = [analysis.game.id for analysis in dispatcher._iter_games("Lichess", "someone", None, None, None)]
+    assert games == ["g5", "g4", "g3", "g2", "g1"] and wrapper.yielded == 0
+    store.close()
+
+
+def test_more_games_than_a_stopped_run_stored_are_fetched(tmp_path):
+    store = GameStore(str(tmp_path / "games.sqlite"))
+    wrapper = StreamingWrapper([_game(f"g{day}", day) for day in range(5, 0, -1)])
+    dispatcher = DispatcherApp([wrapper], game_store=store)
+
+    games = dispatcher._iter_games("Lichess", "someone", None, None, None)
+    next(games), next(games)
+    games.close()
+    wrapper.games.insert(0, _game("g6", 6))
+
+    games = [analysis.game.id for analysis in dispatcher._iter_games("Lichess", "someone", None, None, 4)]
+    assert games == ["g6", "g5", "g4", "g3"]
+    coverage = store.coverage("Lichess", "someone")
+    assert (coverage.oldest_dt_utc.day, coverage.newest_dt_utc.day, coverage.complete) == (3, 6, False)
+    store.close()
@@ -0,0 +1,113 @@
+import chess
+import pytest
+
+from engines.engine_pool import EnginePool
+
+
+def _best_move(engine) -> str:
+    return engine.play(chess.Board(), chess.engine.Limit(depth=1)).move.uci()
+
+
+def test_run_lends_an_engine(fake_engine):
+    pool = EnginePool(fake_engine, size=2)
+    try:
+        assert pool.map(lambda engine, _: _best_move(engine), range(4)) == ["a2a3"] * 4
+    finally:
+        pool.close()
+
+
+def test_failed_restart_keeps_the_slot(fake_engine, monkeypatch):
+    pool = EnginePool(fake_engine, size=1, acquire_timeout=5)
+    try:
+        engine = pool._idle.get_nowait()
+        engine.quit()  # fails its health check on the next acquire
+        pool._idle.put(engine)
+
+        spawn = pool._spawn
+        monkeypatch.setattr(pool, "_spawn", lambda: (_ for _ in ()).throw(OSError("no engine binary")))
+        with pytest.raises(OSError):
+            pool.run(_best_move)
+
+        monkeypatch.setattr(pool, "_spawn", spawn)
+        assert pool.run(_best_move) == "a2a3"
+        assert pool.restarts == 2
+    finally:
+        pool.close()
+
+
+def test_crash_during_search_with_failed_restart_keeps_the_slot(fake_engine, monkeypatch):
+    pool = EnginePool(fake_engine, size=1, acquire_timeout=5)
+    try:
+        def crash(engine):
+            raise chess.engine.EngineTerminatedError("engine died")
+
+        monkeypatch.setattr(pool, "_spawn", lambda: (_ for _ in ()).throw(OSError("no engine binary")))
+        with pytest.raises(OSError):
+            pool.run(crash)
+        monkeypatch.undo()
+        assert pool.run(_best_move) == "a2a3"
+    finally:
+        pool.close()
+
+
+def test_acquire_times_out_when_every_engine_is_busy(fake_engine):
+    pool = EnginePool(fake_engine, size=1, acquire_timeout=0.1)
+    try:
+        engine = pool._acquire()
+        with pytest.raises(TimeoutError):
+            pool._acquire()
+        pool._release(engine)
+        assert pool.run(_best_move) == "a2a3"
+    finally:
+        pool.close()
+
+
+def test_a_bad_request_is_raised_without_restarting_the_engine(fake_engine):
+    pool = EnginePool(fake_engine, size=1, acquire_timeout=5)
+    try:
+        def bad_option(engine):
+            engine.configure({"NoSuchOption": 1})
+
+        with pytest.raises(chess.engine.EngineError):
+            pool.run(bad_option)
+        assert pool.restarts == 0
+        assert pool.run(_best_move) == "a2a3"
+    finally:
+        pool.close()
+
+
+def test_a_timed_out_search_restarts_the_engine(fake_engine):
+    pool = EnginePool(fake_engine, size=1, acquire_timeout=5)
+    try:
+        calls = []
+
+        def stuck_once(engine):
+            calls.append(engine)
+            if len(calls) == 1:
+                raise TimeoutError("no answer")
+            return _best_move(engine)
+
+        assert pool.run(stuck_once) == "a2a3"
+        assert pool.restarts == 1 and calls[0] is not calls[1]
+    finally:
+        pool.close()
+
+
+def test_engines_started_before_a_failed_spawn_are_shut_down(fake_engine, monkeypatch):
+    started = []
+    spawn = EnginePool._spawn
+
+    def spawn_twice(pool):
+        if len(started) == 2:
+            raise OSError("no engine binary")
+        started.append(spawn(pool))
+        return started[-1]
+
+    monkeypatch.setattr(EnginePool, "_spawn", spawn_twice)
+    with pytest.raises(OSError):
+        EnginePool(fake_engine, size=3)
+
+    assert len(started) == 2
+    for engine in started:
+        with pytest.raises(chess.engine.EngineTerminatedError):
+            engine.ping()
@@ -0,0 +1,75 @@
+import chess
+
+from engines.eval_cache import EvaluationCache, normalize_fen
+from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+
+FEN = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+
+
+def test_normalize_fen_drops_move_counters():
+    assert normalize_fen(FEN) == normalize_fen(FEN.replace(" 0 1", " 7 42"))
+
+
+def test_deeper_result_answers_shallower_requests_only():
+    cache = EvaluationCache()
+    cache.put(FEN, 12, 30, "e7e5")
+    assert cache.get(FEN, 10).score_cp == 30
+    assert cache.get(FEN, 12).best_move == "e7e5"
+    assert cache.get(FEN, 14) is None
+    assert (cache.memory_hits, cache.misses) == (2, 1)
+
+
+def test_shallower_put_does_not_replace_deeper_result(tmp_path):
+    cache = EvaluationCache(db_path=str(tmp_path / "evals.sqlite"))
+    cache.put(FEN, 18, 25, "e7e5")
+    cache.put(FEN, 10, -40, "c7c5")
+    assert cache.get(FEN, 1) == (18, 25, "e7e5")
+    cache.put(FEN, 20, 15, "c7c6")
+    assert cache.get(FEN, 20) == (20, 15, "c7c6")
+    cache.close()
+
+    reopened = EvaluationCache(db_path=str(tmp_path / "evals.sqlite"))
+    assert reopened.get(FEN, 20) == (20, 15, "c7c6")
+    assert reopened.disk_hits == 1
+    reopened.close()
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EvaluationCache(max_entries=2)
+    fens = ["8/8/8/8/8/8/8/K6k w - -", "8/8/8/8/8/8/8/K5k1 w - -", "8/8/8/8/8/8/8/K4k2 w - -"]
+    cache.put(fens[0], 10, 0)
+    cache.put(fens[1], 10, 0)
+    assert cache.get(fens[0], 10) is not None  # now the most recently used
+    cache.put(fens[2], 10, 0)
+    assert len(cache) == 2
+    assert cache.get(fens[1], 10) is None
+    assert cache.get(fens[0], 10) is not None
+
+
+def test_mistake_identifier_reads_and_fills_the_cache(fake_engine):
+    cache = EvaluationCache()
+    board = chess.Board()
+    cache.put(board.fen(), 30, 55, "g1f3")
+    identifier = MistakeIdentifier(fake_engine, depth=10, cache=cache)
+    try:
+        result = identifier.analyze_position(board.fen(), "e2e4", time_used=5.0)
+        assert (result["best_move"], result["best_eval_cp"]) == ("g1f3", 55)
+        board.push_uci("e2e4")
+        assert cache.get(board.fen(), 10) is not None
+    finally:
+        identifier.close()
+
+
+def test_closing_one_identifier_leaves_the_shared_cache_open(fake_engine, tmp_path):
+    cache = EvaluationCache(db_path=str(tmp_path / "evals.sqlite"))
+    first, second = (MistakeIdentifier(fake_engine, depth=10, cache=cache) for _ in range(2))
+    first.close()
+    try:
+        second.analyze_position(chess.Board().fen(), "e2e4", time_used=5.0)
+    finally:
+        second.close()
+        cache.close()
+
+    reopened = EvaluationCache(db_path=str(tmp_path / "evals.sqlite"))
+    assert reopened.get(chess.Board().fen(), 10) is not None  # still written to disk after the first close
+    reopened.close()
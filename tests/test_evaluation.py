@@ -0,0 +1,33 @@
+import chess
+import chess.engine
+
+from common.evaluation import MATE_SCORE_CP, eval_to_cp, mate_to_cp, score_to_cp
+
+
+def test_faster_mates_score_higher():
+    assert mate_to_cp(1) > mate_to_cp(5) > 0
+    assert mate_to_cp(-1) < mate_to_cp(-5) < 0
+    assert mate_to_cp(1) == MATE_SCORE_CP - 1
+
+
+def test_engine_scores_use_the_same_mate_scale():
+    assert score_to_cp(chess.engine.Cp(35)) == 35
+    assert score_to_cp(chess.engine.Mate(3)) == mate_to_cp(3)
+    assert score_to_cp(chess.engine.Mate(-2)) == mate_to_cp(-2)
+    assert score_to_cp(chess.engine.PovScore(chess.engine.Mate(2), chess.BLACK).white()) == mate_to_cp(-2)
+
+
+def test_eval_to_cp_formats():
+    assert eval_to_cp(35) == 35
+    assert eval_to_cp(-1.6) == -2
+    assert eval_to_cp("+0.53") == 53  # strings are in pawns
+    assert eval_to_cp("-1.5") == -150
+    assert eval_to_cp("n/a") is None
+    assert eval_to_cp("mate in") is None
+    assert eval_to_cp(float("nan")) is None
+
+
+def test_written_mates_score_like_engine_mates():
+    assert eval_to_cp("+M3") == eval_to_cp("M3") == eval_to_cp("#3") == eval_to_cp("mate in 3") == mate_to_cp(3)
+    assert eval_to_cp("-M2") == eval_to_cp("#-2") == eval_to_cp("mated in 2") == mate_to_cp(-2)
+    assert eval_to_cp("mate in 1") > eval_to_cp("mate in 5") > MATE_SCORE_CP - 10
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from common.evaluation import EVAL_MISSING, mate_to_cp
+from ml.helper_functions.evaluation_drop_detector import EvaluationDropDetector
+
+
+@pytest.fixture
+def detector():
+    return EvaluationDropDetector(threshold_cp=100, mate_cp=1000)
+
+
+def _drops(detector, evaluations, offsets=None, perspective="mover"):
+    evaluations = np.asarray(evaluations, dtype=np.float32)
+    drops = detector.find_drops_batch(evaluations, offsets if offsets is not None else [0, len(evaluations)], perspective)
+    return [(int(drop["game"]), int(drop["ply"]), float(drop["drop"])) for drop in drops]
+
+
+def test_drops_are_measured_from_the_mover_or_from_white(detector):
+    # White gives away 300 on ply 2, black gives it back on ply 3
+    evaluations = [0, 0, -300, 0]
+
+    assert _drops(detector, evaluations, perspective="mover") == [(0, 2, 300.0), (0, 3, 300.0)]
+    assert _drops(detector, evaluations, perspective="white") == [(0, 2, 300.0)]
+    with pytest.raises(ValueError):
+        _drops(detector, evaluations, perspective="black")
+
+
+def test_no_drop_is_reported_across_a_game_boundary(detector):
+    # The first game ends at +500 and the second starts at 0, then black blunders
+    evaluations = [500, 500, 0, 200, 200]
+    offsets = [0, 2, 5]
+
+    assert _drops(detector, evaluations, offsets, perspective="white") == []
+    assert _drops(detector, evaluations, offsets) == [(1, 1, 200.0)]
+
+
+def test_mates_are_clipped(detector):
+    drops = detector.find_drops_batch(np.array([mate_to_cp(2), mate_to_cp(-1)], dtype=np.float32), [0, 2], "white")
+
+    assert drops["eval_before"].tolist() == [1000.0]
+    assert drops["eval_after"].tolist() == [-1000.0]
+    assert drops["drop"].tolist() == [2000.0]
+
+
+def test_missing_evaluations_are_skipped(detector):
+    assert _drops(detector, [0, np.nan, -500, -500], perspective="white") == []
+    assert _drops(detector, [0, EVAL_MISSING, -500, -500], perspective="white") == []
+    assert _drops(detector, [0, EVAL_MISSING, 0, -500], perspective="white") == [(0, 3, 500.0)]
+
+
+def test_flatten_packs_ragged_games(detector):
+    flat, offsets = detector.flatten([["+0.20", None, "oops", "+5.00"], [], [35, "+M2"]])
+
+    assert offsets.tolist() == [0, 4, 4, 6]
+    assert flat[0] == 20 and np.isnan(flat[1:3]).all()
+    assert flat[3:].tolist() == [500, 35, mate_to_cp(2)]
+    # The empty game in the middle does not join the games around it
+    assert _drops(detector, flat, offsets, perspective="white") == []
+
+
+def test_find_drops_reads_evaluation_strings(detector):
+    evaluations = ["+0.53", "-1.20", "-1.00", "mate in 2", "-M1"]
+    positions = ["fen0", "fen1", "fen2", "fen3", "fen4"]
+
+    assert detector.find_drops(evaluations, positions) == [
+        (1, 53.0, -120.0, "fen1"),
+        (4, 1000.0, -1000.0, "fen4"),
+    ]
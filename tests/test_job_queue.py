@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from jobs.job_queue import JobQueue, JobStore
+
+
+@pytest.fixture
+def store(tmp_path) -> JobStore:
+    return JobStore(str(tmp_path / "jobs.sqlite"))
+
+
+def _wait(queue: JobQueue, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_store_round_trip(store):
+    store.create("a", "Lichess:someone:10")
+    store.update("a", status="done", progress=1.0, finished_at=time.time(), result='[{"ply": 1}]')
+    job = store.get("a")
+    assert (job["status"], job["progress"], job["result"]) == ("done", 1.0, [{"ply": 1}])
+    assert store.get("missing") is None
+
+
+def test_reuse_follows_ttl_and_timeout(store):
+    store.create("running", "key")
+    assert store.find_reusable("key", ttl_seconds=60, timeout_seconds=60) == "running"
+    assert store.find_reusable("key", ttl_seconds=60, timeout_seconds=-1) is None  # presumed dead
+
+    store.update("running", status="done", finished_at=time.time() - 120)
+    assert store.find_reusable("key", ttl_seconds=60, timeout_seconds=60) is None
+    assert store.find_reusable("key", ttl_seconds=600, timeout_seconds=60) == "running"
+
+    store.update("running", status="failed", finished_at=time.time())
+    assert store.find_reusable("key", ttl_seconds=600, timeout_seconds=600) is None
+
+
+def test_purge_keeps_unfinished_jobs(store):
+    store.create("old", "a")
+    store.update("old", status="done", finished_at=time.time() - 3600)
+    store.create("queued", "b")
+    store.purge(older_than_seconds=60)
+    assert store.get("old") is None
+    assert store.get("queued") is not None
+
+
+def test_queue_runs_jobs_and_reuses_them(store):
+    queue = JobQueue(store, workers=2)
+    release = threading.Event()
+    runs = []
+
+    def job(progress):
+        runs.append(1)
+        progress(0.5, "halfway")
+        release.wait(5)
+        return {"games": 3}
+
+    first = queue.submit("key", job)
+    assert queue.submit("key", job) == first
+    release.set()
+    assert _wait(queue, first)["result"] == {"games": 3}
+    assert queue.submit("key", job) == first  # within the TTL
+    assert len(runs) == 1
+    queue.shutdown()
+
+
+def test_failed_job_records_its_error(store):
+    queue = JobQueue(store, workers=1)
+
+    def job(progress):
+        raise ValueError("No platform wrapper found for platform 'Nope'")
+
+    job_id = queue.submit("key", job)
+    job = _wait(queue, job_id)
+    assert job["status"] == "failed" and "Nope" in job["error"]
+    assert queue.submit("key", lambda progress: []) != job_id
+    queue.shutdown()
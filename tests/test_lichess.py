@@ -0,0 +1,45 @@
+import json
+
+from platforms.lichess import LichessWrapper
+
+
+def _line(**fields) -> bytes:
+    game = {
+        "id": "abcd1234",
+        "variant": "standard",
+        "speed": "blitz",
+        "createdAt": 1704103200000,
+        "players": {"white": {"user": {"name": "Someone"}}, "black": {"user": {"name": "other"}}},
+        "winner": "white",
+        "moves": "e4 e5 Nf3 Nc6",
+        "clock": {"initial": 180, "increment": 2, "totalTime": 260},
+        # Centiseconds left after every move
+        "clocks": [18000, 18000, 17500, 17000],
+        "analysis": [{"eval": 20}, {"eval": 25}, {"mate": 3}, {}],
+    }
+    game.update(fields)
+    return json.dumps(game).encode()
+
+
+def _wrapper() -> LichessWrapper:
+    return LichessWrapper({"name": "Lichess", "url": "https://lichess.org/api", "token": ""})
+
+
+def test_clocks_become_seconds_spent_per_move():
+    [game] = _wrapper()._iter_parsed_games([_line()], "someone")
+
+    assert game.player_color == "white"
+    assert game.time_spent == [2.0, 2.0, 7.0, 12.0]
+    assert game.evaluations[:2] == [20, 25] and game.evaluations[3] is None
+    assert (game.eval_source, game.eval_depth) == ("Lichess", 18)
+
+
+def test_games_without_clocks_have_no_time_spent():
+    [game] = _wrapper()._iter_parsed_games([_line(clock={}, clocks=[], speed="correspondence")], "someone")
+    assert game.time_spent == []
+
+
+def test_unknown_speeds_do_not_abort_the_fetch():
+    lines = [_line(), _line(id="efgh5678", speed="unknown")]
+    player = _wrapper()._parse_games(lines, "someone")
+    assert [game.id for game in player.get_all_games()] == ["abcd1234"]
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from utils import metrics
+from utils.metrics import MetricsRegistry
+
+
+def test_metrics_render_in_the_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("games_total", "Games parsed.", ("platform",)).inc(3, platform='Li"chess\\\n')
+    registry.gauge("queue_depth", "Items waiting.").set(2)
+
+    assert registry.render().splitlines() == [
+        "# HELP games_total Games parsed.",
+        "# TYPE games_total counter",
+        'games_total{platform="Li\\"chess\\\\\\n"} 3',
+        "# HELP queue_depth Items waiting.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 2",
+    ]
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("search_seconds", "Time per search.", ("caller",), buckets=(0.5, 0.1))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, caller="classify")
+
+    assert registry.render().splitlines() == [
+        "# HELP search_seconds Time per search.",
+        "# TYPE search_seconds histogram",
+        'search_seconds_bucket{caller="classify",le="0.1"} 2',
+        'search_seconds_bucket{caller="classify",le="0.5"} 3',
+        'search_seconds_bucket{caller="classify",le="+Inf"} 4',
+        'search_seconds_sum{caller="classify"} 2.45',
+        'search_seconds_count{caller="classify"} 4',
+    ]
+    assert histogram.summary()["caller=classify"]["p50"] == 0.1
+
+
+def test_updates_from_many_threads_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter("things_total", "Things.", ("kind",))
+    gauge = registry.gauge("in_flight", "Things in flight.")
+
+    def work():
+        for _ in range(2000):
+            counter.inc(kind="a")
+            gauge.inc()
+            gauge.dec(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value(kind="a") == 16000
+    assert gauge.summary() == {"total": 8000}
+
+
+def test_wrong_labels_are_rejected():
+    registry = MetricsRegistry()
+    with pytest.raises(ValueError):
+        registry.counter("things_total", "Things.", ("kind",)).inc()
+    with pytest.raises(ValueError):
+        registry.gauge("things_total", "Things.", ("kind",))
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    """The module's metrics swapped for empty ones, so derived rates only see this test's values."""
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    for name in ("GAMES_PARSED", "PARSE_SECONDS", "ENGINE_NODES", "EVAL_CACHE_LOOKUPS"):
+        old = getattr(metrics, name)
+        monkeypatch.setattr(metrics, name, registry.counter(old.name, old.help, old.labelnames))
+    old = metrics.ENGINE_SEARCH_SECONDS
+    monkeypatch.setattr(metrics, "ENGINE_SEARCH_SECONDS", registry.histogram(old.name, old.help, old.labelnames))
+    return metrics
+
+
+def test_summary_derives_rates(fresh_metrics):
+    fresh_metrics.GAMES_PARSED.inc(50, platform="Lichess")
+    fresh_metrics.PARSE_SECONDS.inc(2, platform="Lichess")
+    fresh_metrics.ENGINE_SEARCH_SECONDS.observe(0.5, caller="evaluate")
+    fresh_metrics.ENGINE_NODES.inc(1000, caller="evaluate")
+    fresh_metrics.EVAL_CACHE_LOOKUPS.inc(3, result="hit")
+    fresh_metrics.EVAL_CACHE_LOOKUPS.inc(1, result="miss")
+
+    report = fresh_metrics.summary()
+    assert report["derived"] == {
+        "games_parsed_per_second[platform=Lichess]": 25.0,
+        "engine_nodes_per_second[caller=evaluate]": 2000.0,
+        "eval_cache_hit_rate": 0.75,
+    }
+    assert report["chessmate_games_parsed_total"] == {"platform=Lichess": 50}
+
+
+def test_summary_leaves_out_rates_without_a_denominator(fresh_metrics):
+    # Games from a store took no parse time, searches answered at once, no cache lookups
+    fresh_metrics.GAMES_PARSED.inc(50, platform="Lichess")
+    fresh_metrics.PARSE_SECONDS.inc(0, platform="Lichess")
+    fresh_metrics.ENGINE_SEARCH_SECONDS.observe(0.0, caller="evaluate")
+    fresh_metrics.ENGINE_NODES.inc(1000, caller="evaluate")
+
+    assert fresh_metrics.summary()["derived"] == {}
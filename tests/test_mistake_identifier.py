@@ -0,0 +1,62 @@
+import chess
+import pandas as pd
+import pytest
+
+from engines.eval_cache import normalize_fen
+from ml.mistake_identifier.mistake_identifier import MistakeIdentifier
+
+# The stand-in engine's best move is the smallest UCI string, so the first two moves are
+# its choices and the others are not
+MOVES = ["a2a3", "a7a5", "e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6"]
+
+
+@pytest.fixture
+def identifier(fake_engine):
+    identifier = MistakeIdentifier(fake_engine, depth=8)
+    searches = []
+    analyse = identifier.engine.analyse
+    identifier.engine.analyse = lambda board, limit: searches.append(board.fen()) or analyse(board, limit)
+    identifier.searches = searches
+    yield identifier
+    identifier.close()
+
+
+def _positions(moves: list[str]) -> list[str]:
+    board, fens = chess.Board(), []
+    for move in moves:
+        fens.append(board.fen())
+        board.push_uci(move)
+    return fens
+
+
+def test_a_game_of_n_moves_costs_n_plus_one_searches(identifier):
+    mistakes = identifier.analyze_game(MOVES)
+
+    assert len(mistakes) == len(MOVES)
+    assert len(identifier.searches) == len(MOVES) + 1
+    assert len(set(identifier.searches)) == len(identifier.searches)
+
+
+def test_the_engine_move_loses_nothing(identifier):
+    mistakes = identifier.analyze_game(MOVES)
+
+    best = mistakes["actual_move"] == mistakes["best_move"]
+    assert best[:2].all() and not best[2:].all()
+    assert (mistakes.loc[best, "cp_loss"] == 0).all()
+    # Every other move is judged by the search of the position it led to
+    assert (mistakes["actual_eval_cp"][2:-1].to_numpy() == -mistakes["best_eval_cp"][3:].to_numpy()).all()
+
+
+def test_consecutive_rows_reuse_the_last_position(identifier):
+    rows = pd.DataFrame({"fen": _positions(MOVES), "actual_move": MOVES})
+    mistakes = identifier.analyze_multiple(rows)
+
+    # The position after one row is the position before the next, so it is searched once
+    assert len(identifier.searches) == len(MOVES) + 1
+    assert len(set(identifier.searches)) == len(identifier.searches)
+    board = chess.Board(rows["fen"].iloc[-1])
+    board.push_uci(MOVES[-1])
+    assert identifier._last_position[0] == normalize_fen(board.fen())
+    assert mistakes["cp_loss"][:2].eq(0).all()
+    # The same rows as the one-pass walk of the game
+    assert mistakes.equals(identifier.analyze_game(MOVES))
@@ -0,0 +1,46 @@
+import itertools
+
+import chess
+import numpy as np
+import pytest
+
+from common.move_codes import MAX_MOVE_CODES, decode_moves, encode_moves, is_san
+
+
+def test_round_trip(random_games):
+    for moves in random_games:
+        codes = encode_moves(moves)
+        assert codes.dtype == np.uint16
+        assert decode_moves(codes) == moves
+
+
+def test_every_legal_move_is_san(random_games):
+    for moves in random_games[:20]:
+        board = chess.Board()
+        for san in moves:
+            assert all(is_san(board.san(move)) for move in board.legal_moves)
+            board.push_san(san)
+
+
+def test_the_vocabulary_cannot_overflow():
+    files, ranks, squares = "abcdefgh", "12345678", [a + b for a, b in itertools.product("abcdefgh", "12345678")]
+    candidates = itertools.chain(
+        (f"{piece}{file}{rank}{capture}{square}{suffix}" for piece in "NBRQK" for file in ["", *files]
+         for rank in ["", *ranks] for capture in ("", "x") for square in squares for suffix in ("", "+", "#")),
+        (f"{file}{capture}{rank}{promotion}{suffix}" for file in files for capture in ["", *(f"x{to}" for to in files)]
+         for rank in ranks for promotion in ("", "=N", "=B", "=R", "=Q") for suffix in ("", "+", "#")),
+    )
+    assert sum(map(is_san, candidates)) + 12 < MAX_MOVE_CODES  # plus castling, with O or 0
+
+
+@pytest.mark.parametrize("san", ["Ke1e2", "Na1a2", "Bb1b2", "exe5", "axc3", "e8", "e4=Q", "Pe4", "e4 ", "--", "1-0", "hello"])
+def test_strings_that_are_not_san_are_refused(san):
+    assert not is_san(san)
+    with pytest.raises(ValueError):
+        encode_moves(["e4", san])
+
+
+def test_annotation_glyphs_share_the_plain_move_code():
+    codes = encode_moves(["e4", "e4!", "Nf3?!", "Nf3", "O-O!!", "0-0"])
+    assert codes[0] == codes[1] and codes[2] == codes[3]
+    assert decode_moves(codes) == ["e4", "e4", "Nf3", "Nf3", "O-O", "0-0"]
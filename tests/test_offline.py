@@ -0,0 +1,97 @@
+from platforms.offline import OfflineWrapper
+
+PGN = """[Event "Rated blitz game"]
+[Site "https://lichess.org/blitz001"]
+[Date "2024.01.02"]
+[UTCDate "2024.01.02"]
+[UTCTime "10:00:00"]
+[White "someone"]
+[Black "other"]
+[Result "1-0"]
+[TimeControl "180+2"]
+
+1. e4 { [%clk 0:03:00] } 1... e5 { [%clk 0:03:00] } 2. Nf3 { [%clk 0:02:55] } 2... Nc6 { [%clk 0:02:50] } 1-0
+
+[Event "Odd game"]
+[Site "https://lichess.org/odd00001"]
+[Date "2024.01.01"]
+[UTCDate "2024.01.01"]
+[UTCTime "10:00:00"]
+[White "other"]
+[Black "someone"]
+[Result "0-1"]
+[TimeControl "?"]
+
+1. d4 d5 0-1
+"""
+
+
+def test_games_of_unknown_speed_are_skipped(tmp_path):
+    (tmp_path / "games.pgn").write_text(PGN)
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(tmp_path), "processes": 1, "index": False})
+
+    assert {game.speed for game in wrapper.iter_games_by_username("someone")} == {"blitz", "unknown"}
+    player = wrapper.get_games_by_username("someone")
+    assert [game.id for game in player.get_all_games()] == ["blitz001"]
+    # Seconds spent per move: increment added, clock left subtracted
+    assert player.get_game_on_id("blitz001").time_spent == [2.0, 2.0, 7.0, 12.0]
+
+
+def test_the_index_falls_back_to_the_cache_directory(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "games.pgn").write_text(PGN)
+    (data / "games.pgn.idx.sqlite").mkdir()  # stands in for a read-only data directory
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(data), "processes": 1})
+
+    assert [game.id for game in wrapper.iter_games_by_username("someone")] == ["blitz001", "odd00001"]
+    index = wrapper._indexes[data / "games.pgn"]
+    assert index.index_path.parent == tmp_path / "cache" / "chessmate" / "offline_index"
+
+
+def test_a_file_that_cannot_be_indexed_is_scanned(tmp_path, monkeypatch):
+    (tmp_path / "games.pgn").write_text(PGN)
+    (tmp_path / "games.pgn.idx.sqlite").mkdir()
+    (tmp_path / "cache").write_text("")  # not a directory, so no cache copy either
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(tmp_path / "games.pgn"), "processes": 1})
+
+    assert [game.id for game in wrapper.iter_games_by_username("someone")] == ["blitz001", "odd00001"]
+    assert wrapper._indexes[tmp_path / "games.pgn"] is None
+
+
+def test_bulk_imports_leave_the_replay_for_later(tmp_path):
+    (tmp_path / "games.pgn").write_text(PGN)
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(tmp_path), "processes": 1, "index": False})
+
+    table = wrapper.import_table(["someone"])
+    assert not table.positions
+    assert "fen" not in table.to_dataframe()
+
+
+def test_a_game_found_twice_keeps_one_game_id_category(tmp_path):
+    (tmp_path / "a.pgn").write_text(PGN)
+    (tmp_path / "b.pgn").write_text(PGN + "\n" + PGN)
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(tmp_path), "processes": 1, "index": False})
+
+    frame = wrapper.import_table(["someone"]).to_dataframe()
+    assert list(frame["game_id"].cat.categories) == ["blitz001", "odd00001"]
+    assert (frame["game_id"] == "blitz001").sum() == 3 * 4
+
+
+def test_dumps_with_crlf_line_ends_are_split_into_chunks(tmp_path):
+    from platforms.offline_importer import OfflineImporter, find_chunks
+
+    path = tmp_path / "games.pgn"
+    path.write_bytes("\n".join([PGN] * 20).replace("\n", "\r\n").encode())
+    chunks = find_chunks(path, 1024)
+
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == path.stat().st_size
+    data = path.read_bytes()
+    assert all(data[start:].startswith(b"[Event ") for start, _ in chunks)
+    wrapper = OfflineWrapper({"name": "Offline", "path": str(tmp_path), "processes": 1, "index": False})
+    games = list(wrapper.iter_games_by_username("someone"))
+    assert len(games) == 40
+    assert games[0].moves == ["e4", "e5", "Nf3", "Nc6"] and games[0].time_spent == [2.0, 2.0, 7.0, 12.0]
@@ -0,0 +1,110 @@
+import random
+
+import numpy as np
+import pytest
+
+from common.evaluation import MATE_SCORE_CP
+from platforms.pgn_movetext import _parse_with_regex, parse_movetext, parse_movetexts, parse_time_control, time_deltas
+
+
+def _annotated(moves: list[str], rng: random.Random) -> tuple[str, list[float], list[float]]:
+    """Movetext with a random mix of clocks, evals, NAGs, comments and variations, and the values it holds."""
+    parts, clocks, evals = [], [], []
+    for ply, move in enumerate(moves):
+        if ply % 2 == 0:
+            parts.append(f"{ply // 2 + 1}.")
+        elif rng.random() < 0.3:
+            parts.append(f"{ply // 2 + 1}...")
+        parts.append(move)
+        if rng.random() < 0.2:
+            parts.append("$1")
+
+        clock, evaluation, annotations = np.nan, np.nan, []
+        if rng.random() < 0.7:
+            seconds = rng.randrange(0, 3 * 3600)
+            tenths = rng.randrange(10) if rng.random() < 0.5 else 0
+            clock = seconds + tenths / 10
+            text = f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" + (f".{tenths}" if tenths else "")
+            annotations.append(f"[%clk {text}]")
+        if rng.random() < 0.5:
+            if rng.random() < 0.1:
+                mate = rng.choice([-1, 1]) * rng.randrange(1, 20)
+                evaluation = MATE_SCORE_CP - mate if mate > 0 else -MATE_SCORE_CP - mate
+                annotations.append(f"[%eval #{mate}]")
+            else:
+                pawns = rng.randrange(-2000, 2000) / 100
+                evaluation = round(pawns * 100)
+                annotations.append(f"[%eval {pawns:.2f}]")
+        rng.shuffle(annotations)
+        if annotations or rng.random() < 0.1:
+            parts.append("{ " + " ".join(annotations) + (" a (bracketed) note" if rng.random() < 0.2 else "") + " }")
+        if rng.random() < 0.05:
+            parts.append("( 1. Nf3 { [%clk 0:00:01] } ( 1. c4 ) Nf6 )")
+        clocks.append(clock)
+        evals.append(evaluation)
+    parts.append(rng.choice(["1-0", "0-1", "1/2-1/2", "*"]))
+    return " ".join(parts), clocks, evals
+
+
+def test_round_trip_of_random_games(random_games):
+    rng = random.Random(11)
+    texts, expected = [], []
+    for moves in random_games:
+        text, clocks, evals = _annotated(moves, rng)
+        texts.append(text)
+        expected.append((moves, clocks, evals))
+
+    batch = parse_movetexts(texts)
+    assert len(batch.offsets) == len(texts) + 1
+    for index, (moves, clocks, evals) in enumerate(expected):
+        game = batch.game(index)
+        assert game.moves == moves
+        np.testing.assert_allclose(game.clocks, np.asarray(clocks, dtype=np.float32), rtol=0, atol=1e-3)
+        np.testing.assert_array_equal(game.evals, np.asarray(evals, dtype=np.float32))
+
+        # The regex fallback, used for ";" comments, reads the same
+        fallback = _parse_with_regex(texts[index])
+        assert fallback.moves == moves
+        np.testing.assert_allclose(fallback.clocks, game.clocks, rtol=0, atol=1e-3)
+        np.testing.assert_array_equal(fallback.evals, game.evals)
+
+
+def test_line_comments_take_the_fallback():
+    texts = ["1. e4 { [%clk 0:03:00] } e5 ; a line comment (not a variation\n2. Nf3 *", "1. d4 d5 *"]
+    batch = parse_movetexts(texts)
+    assert batch.game(0).moves == ["e4", "e5", "Nf3"]
+    assert batch.game(0).clocks[0] == 180
+    assert batch.game(1).moves == ["d4", "d5"]
+
+
+def test_annotations_stay_with_their_game():
+    batch = parse_movetexts(["1. e4 *", "{ [%clk 0:01:00] } 1. d4 { [%eval 0.3] } *", ""])
+    assert [batch.game(index).moves for index in range(3)] == [["e4"], ["d4"], []]
+    assert np.isnan(batch.game(0).clocks[0]) and np.isnan(batch.game(1).clocks[0])
+    assert batch.game(1).evals[0] == 30
+
+
+def test_non_ascii_comments():
+    game = parse_movetext("1. e4 { Très bien — [%clk 0:02:59.5] } e5 { ♞ } 2. Nf3 *")
+    assert game.moves == ["e4", "e5", "Nf3"]
+    assert game.clocks[0] == pytest.approx(179.5)
+
+
+def test_time_deltas():
+    clocks = np.array([180, 178, 175, np.nan, 170], dtype=np.float32)
+    spent = time_deltas(clocks, initial=180, increment=2)
+    np.testing.assert_array_equal(spent[[0, 1, 2, 4]], [2, 4, 7, 7])
+    assert np.isnan(spent[3])
+    assert np.isnan(time_deltas(clocks)[:2]).all()  # no initial time, so the first moves are unknown
+    assert len(time_deltas(np.empty(0))) == 0
+
+
+@pytest.mark.parametrize("time_control, expected", [
+    ("180+2", (180.0, 2.0)),
+    ("600", (600.0, 0.0)),
+    ("1/259200", (None, 0.0)),
+    ("-", (None, 0.0)),
+    ("", (None, 0.0)),
+])
+def test_parse_time_control(time_control, expected):
+    assert parse_time_control(time_control) == expected
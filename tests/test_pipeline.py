@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from ml.pipeline import Pipeline, Stage
+
+
+def _double(item: int) -> int:
+    if item == 3:
+        raise ValueError("bad item")
+    return item * 2
+
+
+def test_items_flow_through_every_stage():
+    pipeline = Pipeline([Stage("double", lambda item: item * 2, workers=3), Stage("inc", lambda item: item + 1)], queue_size=2)
+    assert sorted(pipeline.run(range(20))) == [item * 2 + 1 for item in range(20)]
+    assert pipeline.timings()["double"]["items"] == 20
+    assert pipeline.failures() == []
+
+
+def test_failed_items_are_reported():
+    pipeline = Pipeline([Stage("double", _double, workers=2)], describe=lambda item: f"item {item}")
+    assert sorted(pipeline.run(range(5))) == [0, 2, 4, 8]
+    assert pipeline.failures() == [{"stage": "double", "item": "item 3", "error": "bad item"}]
+    assert pipeline.timings()["double"]["errors"] == 1
+
+
+def test_source_errors_reach_the_consumer():
+    def source():
+        yield 1
+        raise RuntimeError("fetch failed")
+
+    with pytest.raises(RuntimeError, match="fetch failed"):
+        list(Pipeline([Stage("same", lambda item: item)]).run(source()))
+
+
+def test_early_exit_does_not_wait_for_a_busy_worker():
+    release = threading.Event()
+
+    def slow(item: int) -> int:
+        if item > 0:
+            release.wait(10)  # a long engine search
+        return item
+
+    pipeline = Pipeline([Stage("slow", slow, workers=2)], join_timeout=0.2)
+    results = pipeline.run(range(10))
+    assert next(results) == 0
+
+    began = time.monotonic()
+    results.close()  # the consumer went away, e.g. an SSE client disconnected
+    assert time.monotonic() - began < 2
+    release.set()
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from common.game import Game
+from common.player import Player
+from utils.metrics import GAMES_SKIPPED
+
+
+def _game(game_id: str, speed: str, platform: str = "Lichess") -> Game:
+    return Game(
+        game_id, datetime(2024, 1, 1, tzinfo=timezone.utc), platform, speed, "C20 King's Pawn Game",
+        "white", ["e4", "e5", "Nf3"], [], [], "white",
+    )
+
+
+def test_games_are_bucketed_by_speed():
+    player = Player("someone")
+    player.add_games([_game("a", "blitz"), _game("b", "rapid"), _game("c", "blitz")])
+
+    assert [game.id for game in player.get_games_on_speed("blitz")] == ["a", "c"]
+    assert [game.id for game in player.get_games_on_speed("rapid")] == ["b"]
+    assert player.get_games_on_speed("bullet") == []
+    assert [game.id for game in player.get_all_games()] == ["a", "b", "c"]  # in insertion order
+    assert player.get_game_on_id("b").speed == "rapid"
+    with pytest.raises(KeyError):
+        player.get_game_on_id("missing")
+
+
+def test_replacing_a_game_moves_it_to_its_new_speed():
+    player = Player("someone")
+    player.add_game(_game("a", "blitz"))
+    player.add_game(_game("a", "rapid"))
+
+    assert player.get_games_on_speed("blitz") == []
+    assert [game.id for game in player.get_games_on_speed("rapid")] == ["a"]
+    assert len(player.get_all_games()) == 1
+
+
+def test_unknown_speeds_are_skipped_and_counted():
+    player = Player("someone")
+    before = GAMES_SKIPPED.value(platform="ChessCom"), GAMES_SKIPPED.value(platform="Offline")
+
+    skipped = player.add_games([
+        _game("a", "daily", platform="ChessCom"),
+        _game("b", "blitz", platform="ChessCom"),
+        _game("c", "daily", platform="ChessCom"),
+        _game("d", "unknown", platform="Offline"),
+    ])
+
+    assert skipped == 3
+    assert [game.id for game in player.get_all_games()] == ["b"]
+    assert GAMES_SKIPPED.value(platform="ChessCom") == before[0] + 2
+    assert GAMES_SKIPPED.value(platform="Offline") == before[1] + 1
+    with pytest.raises(ValueError):
+        player.add_game(_game("e", "daily"))
+
+
+def test_the_move_table_is_built_on_first_use_and_follows_insertion_order():
+    player = Player("someone")
+    player.add_games([_game("a", "rapid"), _game("b", "blitz")])
+    assert player._moves is None  # the moves are only held by the games until asked for
+
+    assert list(player.get_all_games_df()["game_id"].unique()) == ["a", "b"]
+    player.add_game(_game("c", "bullet"))
+    assert list(player.get_all_games_df()["game_id"].unique()) == ["a", "b", "c"]
+    player.add_game(_game("a", "blitz"))
+    assert len(player.get_all_games_df()) == 9
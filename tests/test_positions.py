@@ -0,0 +1,72 @@
+import chess
+import chess.polyglot
+import numpy as np
+
+from common.positions import PACKED_BOARD_BYTES, PIECES, packed_boards, replay, unpack_bitboards
+
+_CASTLING_SQUARES = (chess.H1, chess.A1, chess.H8, chess.A8)
+
+
+def _expected_bitboards(board: chess.Board) -> list[int]:
+    return [int(board.pieces(chess.Piece.from_symbol(symbol).piece_type, symbol.isupper())) for symbol in PIECES]
+
+
+def test_replay_matches_python_chess(random_games):
+    for moves in random_games:
+        positions = replay(moves)
+        assert len(positions.fens) == len(moves)
+        bitboards, white_to_move = unpack_bitboards(positions.boards)
+
+        board = chess.Board()
+        for ply, san in enumerate(moves):
+            assert positions.fens[ply] == board.fen()
+            assert int(positions.zobrist[ply]) == chess.polyglot.zobrist_hash(board)
+            assert bitboards[ply].tolist() == _expected_bitboards(board)
+            assert white_to_move[ply] == (board.turn == chess.WHITE)
+
+            packed = positions.boards[ply]
+            assert packed[32] == (0 if board.ep_square is None else board.ep_square + 1)
+            rights = board.clean_castling_rights()
+            assert (packed[33] >> 1) & 0x0F == sum(bool(rights & chess.BB_SQUARES[square]) << bit
+                                                  for bit, square in enumerate(_CASTLING_SQUARES))
+
+            move = board.parse_san(san)
+            assert positions.moves_uci[ply] == move.uci()
+            board.push(move)
+
+
+def test_en_passant_and_castling_change_the_hash():
+    # After 1. e4 a6 2. e5 d5 white may capture en passant; the hash must include that file
+    moves = ["e4", "a6", "e5", "d5", "exd6", "Nf6", "Nf3", "e6", "Be2", "Be7", "O-O"]
+    positions = replay(moves)
+    board = chess.Board()
+    for ply, san in enumerate(moves):
+        assert int(positions.zobrist[ply]) == chess.polyglot.zobrist_hash(board)
+        board.push_san(san)
+    assert len(set(positions.zobrist.tolist())) == len(positions.zobrist)
+
+
+def test_replay_from_a_fen_and_stop_at_an_illegal_move():
+    fen = "r3k2r/pppq1ppp/2n5/3pp3/3PP3/2N5/PPPQ1PPP/R3K2R w KQkq - 0 8"
+    positions = replay(["exd5", "Qxd5", "Kd2", "e4"], starting_fen=fen)  # d2 is taken by the queen
+    assert positions.moves_uci == ["e4d5", "d7d5"]
+
+    board = chess.Board(fen)
+    for ply, move in enumerate(positions.moves_uci):
+        assert positions.fens[ply] == board.fen()
+        assert int(positions.zobrist[ply]) == chess.polyglot.zobrist_hash(board)
+        board.push_uci(move)
+
+
+def test_packed_boards_survive_a_bytes_column():
+    positions = replay(["e4", "e5", "Nf3", "Nc6", "Bb5"])
+    column = positions.boards.view(f"S{PACKED_BOARD_BYTES}")[:, 0]  # as stored in a DataFrame
+    assert all(len(value) == PACKED_BOARD_BYTES for value in column)  # the flag byte keeps trailing bytes
+    np.testing.assert_array_equal(packed_boards(list(column)), positions.boards)
+
+
+def test_empty_game():
+    positions = replay([])
+    assert positions.fens == [] and positions.boards.shape == (0, PACKED_BOARD_BYTES)
+    bitboards, white_to_move = unpack_bitboards(positions.boards)
+    assert bitboards.shape == (0, len(PIECES)) and len(white_to_move) == 0
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from utils.profiling import SamplingProfiler, _run_threads, in_run
+
+
+def _busy(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_a_scoped_profile_leaves_out_threads_of_other_runs():
+    stop = threading.Event()
+    other_job = threading.Thread(target=_busy, args=(stop,), name="analyse-evaluate-0", daemon=True)
+    other_job.start()
+
+    profiler = SamplingProfiler(interval=0.002, scoped=True).start()
+    own = threading.Thread(target=in_run(_busy), args=(stop,), name="analyse-classify-0", daemon=True)
+    own.start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    own.join()
+    other_job.join()
+
+    groups = {group for group, _ in profiler.samples}
+    assert "classify" in groups
+    assert "evaluate" not in groups
+    # Once the profiler has stopped, threads started from here no longer join its run
+    # (idents of finished threads are reused, so ask the late thread itself)
+    joined = []
+    late = threading.Thread(target=in_run(lambda: joined.append(threading.get_ident() in _run_threads)), daemon=True)
+    late.start()
+    late.join()
+    assert joined == [False]
+
+
+def test_an_unscoped_profile_samples_every_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,), name="analyse-evaluate-0", daemon=True)
+    worker.start()
+    profiler = SamplingProfiler(interval=0.002).start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert "evaluate" in {group for group, _ in profiler.samples}
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _loaded(module: str, candidates: tuple[str, ...]) -> list[str]:
+    """Which of `candidates` importing `module` loads, in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(*[name for name in {candidates!r} if name in sys.modules])"],
+        cwd=PROJECT_ROOT / "src", capture_output=True, text=True, check=True,
+    )
+    return result.stdout.split()
+
+
+def test_app_import_stays_light():
+    assert _loaded("app", ("numpy", "pandas", "sklearn", "chess", "ml.dispatcher_app")) == []
+
+
+def test_dispatcher_import_leaves_pandas_and_sklearn_for_later():
+    assert _loaded("ml.dispatcher_app", ("pandas", "sklearn", "ml.cluster_analysis.cluster_analysis")) == []